@@ -4,6 +4,15 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from app.db import db
+from app.cache import identity_cache
+from app.choices import course_choices
+from app.passwords import password_hasher
+from app.fragments import fragment_cache
+from app.events import event_hub
+from app.profiling import profiler
+from app.metrics import metrics
+from app.replicas import replica_router
+from app.sqlite import sqlite_profile, serial_writer
 #from flask_sqlalchemy import SQLAlchemy
 
 
@@ -12,27 +21,59 @@ migrate = Migrate()
 login = LoginManager()
 
 
-def create_app():
+def create_app(config_class='config.Config'):
     app = Flask(__name__)
-    app.config.from_object('config.Config')
+    app.config.from_object(config_class)
 
     db.init_app(app)
     migrate.init_app(app, db)
     login.init_app(app)
     login.login_view = 'auth.login'
+    # API and event stream clients get a 401, not the login page
+    login.blueprint_login_views.update(api=None, events=None)
+    identity_cache.init_app(app)
+    course_choices.init_app(app)
+    password_hasher.init_app(app)
+    fragment_cache.init_app(app)
+    event_hub.init_app(app)
+    profiler.init_app(app)
+    metrics.init_app(app)
+    replica_router.init_app(app)
+    sqlite_profile.init_app(app)
+    serial_writer.init_app(app)
 
     from app.routes.main import main
     from app.routes.auth import auth
+    from app.routes.uploads import uploads
+    from app.routes.api import api_bp
+    from app.routes.events import events
+    from app.routes.metrics import metrics_bp
 
     app.register_blueprint(main)
     app.register_blueprint(auth)
+    app.register_blueprint(uploads)
+    app.register_blueprint(api_bp)
+    if app.config['EVENTS_ENABLED']:
+        app.register_blueprint(events)
+    if app.config['METRICS_ENABLED']:
+        app.register_blueprint(metrics_bp)
+
+    from app import tasks  # noqa: F401 registers the background tasks
+
+    from app.cli import storage_cli, roster_cli, passwords_cli, jobs_cli, bench_cli
+
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(roster_cli)
+    app.cli.add_command(passwords_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(bench_cli)
 
     from app.models import User
 
     @login.user_loader
     def load_user(user_id):
-        """Load user by ID."""
-        return User.query.get(int(user_id))
+        """Load user by ID, served from the identity cache when possible."""
+        return identity_cache.load(User, user_id)
 
 
     return app
\ No newline at end of file
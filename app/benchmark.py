@@ -0,0 +1,349 @@
+#!/usr/bin/python3
+"""
+Benchmark harness for the SodLat Edu Solution project.
+
+Drives the login, dashboard and submission endpoints as the users of a
+seeded school (see app.seed) and reports throughput, p50/p95/p99 latency
+and SQL statements per request for each scenario.
+
+Requests go either straight through the application in this process or,
+with a base URL, over HTTP to a running server. Over HTTP query counts are
+read from the Server-Timing header, so they are only reported when the
+server runs with PROFILING_ENABLED.
+
+Results can be saved as a JSON baseline and later runs compared with it:
+a scenario regresses when its p95 grows by more than the tolerance or it
+issues more than one extra statement per request.
+
+``measure_concurrent_writes`` separately compares the SQLite modes of
+app.sqlite on a scratch database file.
+"""
+
+import http.cookiejar
+import json
+import math
+import random
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from app import create_app
+from app.db import db
+from app.models import User, Assignment, AssignmentSubmission, student_courses
+from app.seed import seed_school
+from app.sqlite import commit_write, serial_writer
+
+
+Scenario = namedtuple('Scenario', ['name', 'role', 'authenticated', 'build'])
+
+BenchUser = namedtuple('BenchUser', ['id', 'username', 'assignment_ids'])
+
+ScenarioResult = namedtuple('ScenarioResult', [
+    'name', 'requests', 'errors', 'throughput', 'p50', 'p95', 'p99', 'queries'
+])
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Scenario('login', 'student', False, lambda user, rng, password: (
+        'POST', '/login', {'username_or_email': user.username, 'password': password}
+    )),
+    Scenario('student_dashboard', 'student', True, lambda user, rng, password: (
+        'GET', '/student_dashboard', None
+    )),
+    Scenario('parent_dashboard', 'parent', True, lambda user, rng, password: (
+        'GET', '/parent_dashboard', None
+    )),
+    Scenario('teacher_dashboard', 'teacher', True, lambda user, rng, password: (
+        'GET', '/teacher_dashboard', None
+    )),
+    Scenario('submit', 'student', True, lambda user, rng, password: (
+        'POST', f'/submit_assignment/{rng.choice(user.assignment_ids)}', {'submission_content': 'Benchmark answer.'}
+    )),
+)}
+
+WriteResult = namedtuple('WriteResult', ['mode', 'writes', 'errors', 'throughput', 'p50', 'p95', 'p99'])
+
+# Settings of each SQLite mode compared by measure_concurrent_writes
+WRITE_MODES = {
+    'default': {'SQLITE_PRAGMAS': {}, 'DB_SERIAL_WRITER': False},
+    'wal': {'DB_SERIAL_WRITER': False},
+    'wal+writer': {'DB_SERIAL_WRITER': True},
+}
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+_CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def load_users(role, prefix='seed', limit=100):
+    """Seeded users with a role, students with the assignments of their courses."""
+    users = User.query.filter(
+        User.username_normalized.like(f'{prefix.lower()}-%'), User.role == role
+    ).order_by(User.id).limit(limit).all()
+    assignments = {}
+    if role == 'student' and users:
+        rows = db.session.query(student_courses.c.student_id, Assignment.id).join(
+            Assignment, Assignment.course_id == student_courses.c.course_id
+        ).filter(student_courses.c.student_id.in_([user.id for user in users]))
+        for student_id, assignment_id in rows:
+            assignments.setdefault(student_id, []).append(assignment_id)
+    return [BenchUser(user.id, user.username, assignments.get(user.id, [])) for user in users]
+
+
+class InProcessDriver:
+    """Dispatches requests through the application without a server."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+        self._csrf = app.config.get('WTF_CSRF_ENABLED', True)
+        # The forms are posted without first fetching a token
+        app.config['WTF_CSRF_ENABLED'] = False
+        event.listen(db.get_engine(app), 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.queries = getattr(self._local, 'queries', 0) + 1
+
+    def prepare(self, users):
+        pass
+
+    def request(self, user, method, path, data, authenticated):
+        """Return the status code, seconds taken and statements executed."""
+        self._local.queries = 0
+        started = time.perf_counter()
+        with self.app.test_request_context(path, method=method, data=data):
+            if authenticated:
+                # Loaded by the user loader as for a real session cookie
+                session['_user_id'] = str(user.id)
+                session['_fresh'] = True
+            response = self.app.full_dispatch_request()
+            response.close()
+        db.session.remove()
+        return response.status_code, time.perf_counter() - started, self._local.queries
+
+    def close(self):
+        event.remove(db.get_engine(self.app), 'before_cursor_execute', self._count)
+        self.app.config['WTF_CSRF_ENABLED'] = self._csrf
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """Sends requests to a running server, logging each user in once."""
+
+    def __init__(self, base_url, password):
+        self.base_url = base_url.rstrip('/')
+        self.password = password
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _open(self, opener, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            response = opener.open(request)
+        except urllib.error.HTTPError as e:
+            response = e
+        with response:
+            return response.status, response.headers, response.read().decode('utf-8', 'replace')
+
+    def _session(self, user=None):
+        """An opener with its own cookies and the CSRF token of its session."""
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+        _, _, page = self._open(opener, 'GET', '/login')
+        match = _CSRF_TOKEN.search(page)
+        token = match.group(1) if match else None
+        if user is not None:
+            self._open(opener, 'POST', '/login', {
+                'username_or_email': user.username, 'password': self.password, 'csrf_token': token
+            })
+        return opener, token
+
+    def prepare(self, users):
+        """Log users in ahead of time so the logins do not count against throughput."""
+        for user in users:
+            if user.id not in self._sessions:
+                self._sessions[user.id] = self._session(user)
+
+    def request(self, user, method, path, data, authenticated):
+        """Return the status code, seconds taken and statements executed, if reported."""
+        if authenticated:
+            with self._lock:
+                state = self._sessions.get(user.id)
+            if state is None:
+                state = self._session(user)
+                with self._lock:
+                    self._sessions[user.id] = state
+        else:
+            state = self._session()
+        opener, token = state
+        if data is not None and token:
+            data = dict(data, csrf_token=token)
+        started = time.perf_counter()
+        status, headers, _ = self._open(opener, method, path, data)
+        elapsed = time.perf_counter() - started
+        match = _SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+        return status, elapsed, int(match.group(1)) if match else None
+
+    def close(self):
+        self._sessions.clear()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+def run_scenario(driver, scenario, users, password, requests=100, concurrency=1, seed=0):
+    """
+    Send requests for scenario, spread over users, with concurrency in flight.
+
+    Responses with a 4xx or 5xx status count as errors. Latencies are in
+    milliseconds and queries is the mean number of statements per request.
+    """
+    rng = random.Random(seed)
+    if scenario.name == 'submit':
+        users = [user for user in users if user.assignment_ids]
+    if not users:
+        raise LookupError(f'No seeded {scenario.role} to run {scenario.name} as.')
+    calls = [(user, *scenario.build(user, rng, password)) for user in (rng.choice(users) for _ in range(requests))]
+
+    def call(args):
+        user, method, path, data = args
+        return driver.request(user, method, path, data, scenario.authenticated)
+
+    if scenario.authenticated:
+        driver.prepare({user.id: user for user, *_ in calls}.values())
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(call, calls))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for _, elapsed, _ in outcomes)
+    queries = [count for _, _, count in outcomes if count is not None]
+    return ScenarioResult(
+        name=scenario.name,
+        requests=len(outcomes),
+        errors=sum(1 for status, _, _ in outcomes if status >= 400),
+        throughput=len(outcomes) / wall if wall else 0.0,
+        p50=percentile(latencies, 0.50),
+        p95=percentile(latencies, 0.95),
+        p99=percentile(latencies, 0.99),
+        queries=sum(queries) / len(queries) if queries else None
+    )
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as baseline_file:
+        json.dump({result.name: result._asdict() for result in results}, baseline_file, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path) as baseline_file:
+        return {name: ScenarioResult(**values) for name, values in json.load(baseline_file).items()}
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Describe how results regressed against baseline.
+
+    :param tolerance: Allowed relative growth of the p95 latency.
+    :return: A list of messages, empty when nothing regressed.
+    """
+    regressions = []
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None:
+            continue
+        if result.p95 > before.p95 * (1 + tolerance):
+            regressions.append(f'{result.name}: p95 {result.p95:.1f} ms, baseline {before.p95:.1f} ms')
+        if result.queries is not None and before.queries is not None and result.queries > before.queries + 1:
+            regressions.append(f'{result.name}: {result.queries:.1f} queries per request, baseline {before.queries:.1f}')
+        if result.errors > before.errors:
+            regressions.append(f'{result.name}: {result.errors} errors, baseline {before.errors}')
+    return regressions
+
+
+def measure_concurrent_writes(config, mode, threads=8, writes=400):
+    """
+    Insert submissions from concurrent threads into a scratch SQLite file.
+
+    :param config: Mapping of the settings to start from, e.g. app.config.
+    :param mode: Key of WRITE_MODES.
+    :return: A WriteResult; errors are writes that failed, e.g. with
+             "database is locked", and latencies are in milliseconds.
+    """
+    folder = tempfile.mkdtemp()
+    settings = {name: value for name, value in config.items() if name.isupper()}
+    settings.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(folder, 'writes.db'), SQLALCHEMY_BINDS={},
+        DATABASE_REPLICAS=[], METRICS_DIR=None, PROFILING_ENABLED=False, JOBS_EAGER=True
+    )
+    settings.update(WRITE_MODES[mode])
+    app = create_app(type('WriteBenchConfig', (), settings))
+    # The scoped session is per thread, not per app; drop the caller's one
+    db.session.remove()
+    try:
+        with app.app_context():
+            db.create_all()
+            seed_school(students=threads, students_per_course=threads, courses_per_student=1,
+                        assignments_per_course=1, submission_rate=0, parent_rate=0, prefix='writes')
+            student_ids = [user_id for user_id, in db.session.query(User.id).filter_by(is_student=True)]
+            assignment_id = db.session.query(Assignment.id).scalar()
+            db.session.remove()
+
+        latencies = []
+        errors = [0]
+        errors_lock = threading.Lock()
+
+        def work(student_id, count):
+            with app.app_context():
+                for _ in range(count):
+                    started = time.perf_counter()
+                    try:
+                        commit_write(lambda: db.session.add(AssignmentSubmission(
+                            submission_content='Benchmark answer.', student_id=student_id, assignment_id=assignment_id
+                        )))
+                    except OperationalError:
+                        db.session.rollback()
+                        with errors_lock:
+                            errors[0] += 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+                db.session.remove()
+
+        workers = [threading.Thread(target=work, args=(student_id, writes // threads)) for student_id in student_ids]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        wall = time.perf_counter() - started
+    finally:
+        serial_writer.stop()
+        with app.app_context():
+            db.session.remove()
+            db.get_engine(app).dispose()
+        shutil.rmtree(folder)
+
+    latencies.sort()
+    written = len(latencies) - errors[0]
+    return WriteResult(
+        mode=mode, writes=written, errors=errors[0], throughput=written / wall if wall else 0.0,
+        p50=percentile(latencies, 0.50), p95=percentile(latencies, 0.95), p99=percentile(latencies, 0.99)
+    )
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+"""
+Caching helpers for the SodLat Edu Solution project.
+
+Backends are plain objects exposing ``get(key)``, ``set(key, value, ttl)``
+and ``delete(key)``. ``LocalCache`` is the per-process default and the
+stand-in used by the tests; a shared backend (e.g. one wrapping a Redis
+client) can be plugged in through configuration with an import string.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from werkzeug.utils import import_string
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.db import db
+
+
+class LocalCache:
+    """Thread-safe in-memory LRU cache with per-entry expiry."""
+
+    def __init__(self, maxsize=1024, default_ttl=300):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entry if full."""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove key from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def make_backend(backend, maxsize, ttl):
+    """
+    Build a cache backend from a configuration value.
+
+    :param backend: None for a LocalCache, an import string naming a backend
+                    class or factory, or an already constructed backend.
+    """
+    if backend is None:
+        return LocalCache(maxsize=maxsize, default_ttl=ttl)
+    if isinstance(backend, str):
+        return import_string(backend)(maxsize=maxsize, default_ttl=ttl)
+    return backend
+
+
+class IdentityCache:
+    """
+    Cache of authenticated user principals keyed by user ID.
+
+    Only the column values of a User are cached, so entries are cheap to
+    serialise for a shared backend. Credentials (``excluded`` columns) are
+    never copied into the cache. On a hit the row is rebuilt and attached
+    to the current session without a database round trip; the excluded
+    columns and relationships still lazy-load as usual. A committed
+    password change drops the user's entry.
+
+    Invalidation only reaches other workers through a shared backend, so
+    the per-process default keeps entries for a few seconds only: long
+    enough to absorb a burst of requests, short enough that a revoked
+    role stops working almost at once everywhere.
+    """
+
+    excluded = frozenset(['password_hash'])
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_BACKEND', None)
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 1024)
+        app.config.setdefault('IDENTITY_CACHE_TTL', 5)
+        self.ttl = app.config['IDENTITY_CACHE_TTL']
+        self.backend = make_backend(
+            app.config['IDENTITY_CACHE_BACKEND'], app.config['IDENTITY_CACHE_SIZE'], self.ttl
+        )
+
+    @staticmethod
+    def key(user_id):
+        return f'identity:{int(user_id)}'
+
+    def load(self, model, user_id):
+        """
+        Return the user with the given ID, from the cache when possible.
+
+        :param model: The mapped user class.
+        :param user_id: The ID stored in the Flask-Login session.
+        """
+        if self.backend is None or not self.ttl:
+            return model.query.get(int(user_id))
+
+        data = self.backend.get(self.key(user_id))
+        if data is not None:
+            user = model(**data)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+        user = model.query.get(int(user_id))
+        if user is not None:
+            data = {
+                attr.key: getattr(user, attr.key)
+                for attr in inspect(model).column_attrs if attr.key not in self.excluded
+            }
+            self.backend.set(self.key(user_id), data, self.ttl)
+        return user
+
+    def invalidate(self, *user_ids):
+        """Drop the cached principals of the given users."""
+        if self.backend is None:
+            return
+        for user_id in user_ids:
+            if user_id is not None:
+                self.backend.delete(self.key(user_id))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_password_changes(session, flush_context):
+    for obj in session.dirty:
+        state = inspect(obj)
+        if 'password_hash' in state.attrs and state.attrs.password_hash.history.has_changes():
+            session.info.setdefault('password_changed', set()).add(state.identity[0])
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_password_changes(session):
+    identity_cache.invalidate(*session.info.pop('password_changed', ()))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_password_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('password_changed', None)
+
+
+identity_cache = IdentityCache()
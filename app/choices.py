@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+"""
+Choice providers for form select fields in the SodLat Edu Solution project.
+
+Course pickers only ever offer the current teacher's courses. The list is
+loaded once per request and shared by every form on the page. With
+COURSE_CHOICES_CACHE_BACKEND set it is also kept in a cross-request cache,
+invalidated when a teacher's courses change; the cache is off otherwise,
+since invalidating a per-process cache would leave the other workers
+offering the old courses until COURSE_CHOICES_CACHE_TTL expires.
+"""
+
+from flask import g, has_app_context
+from flask_login import current_user
+from app.cache import make_backend
+from app.db import db
+from app.models import Course
+
+
+class CourseChoices:
+    """(id, name) course choices per teacher, memoised per request and cached across requests."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COURSE_CHOICES_CACHE_BACKEND', None)
+        app.config.setdefault('COURSE_CHOICES_CACHE_SIZE', 256)
+        app.config.setdefault('COURSE_CHOICES_CACHE_TTL', 600)
+        self.ttl = app.config['COURSE_CHOICES_CACHE_TTL']
+        # No per-process default, see the module docstring
+        self.backend = make_backend(
+            app.config['COURSE_CHOICES_CACHE_BACKEND'], app.config['COURSE_CHOICES_CACHE_SIZE'], self.ttl
+        ) if app.config['COURSE_CHOICES_CACHE_BACKEND'] else None
+
+    @staticmethod
+    def key(teacher_id):
+        return f'course_choices:{int(teacher_id)}'
+
+    @staticmethod
+    def _memo():
+        return g.setdefault('_course_choices', {}) if has_app_context() else {}
+
+    def for_teacher(self, teacher_id):
+        """Return the [(id, name)] courses of a teacher, ordered by name."""
+        memo = self._memo()
+        if teacher_id in memo:
+            return memo[teacher_id]
+
+        choices = self.backend.get(self.key(teacher_id)) if self.backend is not None and self.ttl else None
+        if choices is None:
+            choices = [tuple(row) for row in db.session.query(Course.id, Course.course).filter_by(
+                teacher_id=teacher_id
+            ).order_by(Course.course, Course.id)]
+            if self.backend is not None and self.ttl:
+                self.backend.set(self.key(teacher_id), choices, self.ttl)
+        memo[teacher_id] = choices
+        return choices
+
+    def for_current_user(self):
+        """Return the course choices of the logged in teacher, or none for anyone else."""
+        if not current_user.is_authenticated or not current_user.is_teacher:
+            return []
+        return self.for_teacher(current_user.id)
+
+    def invalidate(self, *teacher_ids):
+        """Forget the cached choices of the given teachers."""
+        memo = self._memo()
+        for teacher_id in teacher_ids:
+            if teacher_id is None:
+                continue
+            memo.pop(teacher_id, None)
+            if self.backend is not None:
+                self.backend.delete(self.key(teacher_id))
+
+
+course_choices = CourseChoices()
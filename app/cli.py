@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+"""
+Command line tools for the SodLat Edu Solution project.
+
+Registered on the application by create_app and run through ``flask``,
+e.g. ``flask storage gc``.
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+from app.db import db
+from app.benchmark import (
+    SCENARIOS, WRITE_MODES, HttpDriver, InProcessDriver, compare, load_baseline, load_users,
+    measure_concurrent_writes, run_scenario, save_baseline
+)
+from app.jobs import Worker, enqueue
+from app.models import User, AssignmentSubmission, Job, normalize_identifier
+from app.passwords import make_policy
+from app.roster import RosterError, import_roster
+from app.seed import SeedError, seed_school
+from app.storage import get_blob_store, register_blob, recount_references, collect_garbage
+from app.uploads import purge_stale_uploads
+
+
+storage_cli = AppGroup('storage', help='Manage stored submission files.')
+
+
+@storage_cli.command('gc')
+@click.option('--grace', type=int, default=None,
+              help='Only remove entries untouched for this many seconds.')
+@click.option('--recount/--no-recount', default=True,
+              help='Recompute reference counts from the submissions first.')
+def storage_gc(grace, recount):
+    """Delete unreferenced files and abandoned chunked uploads."""
+    if grace is None:
+        grace = current_app.config['BLOB_GC_GRACE_SECONDS']
+    if recount:
+        click.echo(f'Reference counts corrected: {recount_references()}')
+    removed, orphans = collect_garbage(get_blob_store(), grace=grace)
+    click.echo(f'Unreferenced blobs removed: {removed}')
+    click.echo(f'Orphan files removed: {orphans}')
+    stale = purge_stale_uploads(current_app.config['UPLOAD_FOLDER'], grace)
+    click.echo(f'Abandoned uploads removed: {stale}')
+
+
+@storage_cli.command('import-legacy')
+@click.option('--batch-size', type=int, default=200)
+def storage_import_legacy(batch_size):
+    """Move files saved before content addressing into the blob store."""
+    store = get_blob_store()
+    folder = current_app.config['UPLOAD_FOLDER']
+    imported = missing = 0
+    last_id = 0
+    while True:
+        submissions = AssignmentSubmission.query.filter(
+            AssignmentSubmission.id > last_id,
+            AssignmentSubmission.submission_file.isnot(None),
+            AssignmentSubmission.file_digest.is_(None)
+        ).order_by(AssignmentSubmission.id).limit(batch_size).all()
+        if not submissions:
+            break
+        for submission in submissions:
+            last_id = submission.id
+            path = os.path.join(folder, submission.submission_file)
+            if not os.path.isfile(path):
+                missing += 1
+                continue
+            with open(path, 'rb') as legacy_file:
+                digest, size = store.put_stream(legacy_file)
+            register_blob(digest, size)
+            submission.file_digest = digest
+            imported += 1
+        db.session.commit()
+    click.echo(f'Imported: {imported}, missing on disk: {missing}')
+    click.echo('The original files were left in place; remove them once backups are verified.')
+
+
+roster_cli = AppGroup('roster', help='Bulk user management.')
+
+
+@roster_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--teacher', required=True, help='Username of the teacher owning the courses.')
+@click.option('--chunk-size', type=int, default=None)
+@click.option('--workers', type=int, default=None, help='Password hashing processes.')
+def roster_import(path, teacher, chunk_size, workers):
+    """Create students and parents from a CSV or XLSX roster."""
+    owner = User.query.filter_by(username_normalized=normalize_identifier(teacher), is_teacher=True).first()
+    if owner is None:
+        raise click.ClickException(f'No teacher named {teacher}.')
+    with open(path, 'rb') as roster_file:
+        try:
+            report = import_roster(
+                roster_file, path, owner.id,
+                chunk_size=chunk_size or current_app.config['ROSTER_CHUNK_SIZE'],
+                workers=workers if workers is not None else current_app.config['ROSTER_HASH_WORKERS']
+            )
+        except RosterError as e:
+            raise click.ClickException(str(e))
+    for error in report.errors:
+        click.echo(f'line {error.line} ({error.username}): {error.message}', err=True)
+    click.echo(f'Users created: {report.created}, enrolments: {report.enrolled}, rows skipped: {len(report.errors)}')
+
+
+# Helper function timing concurrent password verifications
+def measure_verifications(policy, password_hash, seconds, threads):
+    """Verify password_hash on the given number of threads and return verifications per second."""
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            policy.verify(password_hash, 'benchmark-password')
+            counts[index] += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+passwords_cli = AppGroup('passwords', help='Password hashing tools.')
+
+
+@passwords_cli.command('benchmark')
+@click.option('--method', 'methods', multiple=True,
+              help='Werkzeug method to measure; repeatable. Defaults to the configured one.')
+@click.option('--seconds', type=float, default=2.0, help='Time spent on each measurement.')
+@click.option('--threads', type=int, default=None, help='Concurrent logins; defaults to one per CPU.')
+def passwords_benchmark(methods, seconds, threads):
+    """Report login verifications per second for each hashing policy."""
+    threads = threads or os.cpu_count() or 1
+    config = current_app.config
+    policies = [make_policy(config['PASSWORD_POLICY'], method, config['PASSWORD_SALT_LENGTH'])
+                for method in methods or (config['PASSWORD_HASH_METHOD'],)]
+
+    click.echo(f'{"policy":<40} {"1 thread/s":>12} {f"{threads} threads/s":>14} {"per core/s":>11}')
+    for policy in policies:
+        password_hash = policy.hash('benchmark-password')
+        single = measure_verifications(policy, password_hash, seconds, 1)
+        parallel = measure_verifications(policy, password_hash, seconds, threads)
+        per_core = parallel / min(threads, os.cpu_count() or 1)
+        click.echo(f'{policy!r:<40} {single:>12.1f} {parallel:>14.1f} {per_core:>11.1f}')
+
+
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+
+
+@jobs_cli.command('worker')
+@click.option('--concurrency', type=int, default=None, help='Jobs run at once; defaults to JOBS_CONCURRENCY.')
+@click.option('--once', is_flag=True, help='Exit when no job is runnable instead of polling.')
+def jobs_worker(concurrency, once):
+    """Run queued jobs until interrupted."""
+    worker = Worker(current_app._get_current_object(), concurrency=concurrency)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    click.echo(f'Worker {worker.worker_id} running {worker.concurrency} jobs at a time')
+    try:
+        count = worker.run(once=once)
+    except KeyboardInterrupt:
+        worker.stop()
+        raise click.Abort()
+    click.echo(f'Jobs run: {count}')
+
+
+@jobs_cli.command('enqueue')
+@click.argument('name')
+@click.option('--payload', default='{}', help='JSON object of keyword arguments for the task.')
+@click.option('--delay', type=int, default=0, help='Seconds before the job may run.')
+def jobs_enqueue(name, payload, delay):
+    """Queue a job by task name, e.g. from cron."""
+    try:
+        job = enqueue(name, delay=delay, **json.loads(payload))
+    except (LookupError, ValueError, TypeError) as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f'Queued job {job.id}' if job is not None else 'Ran eagerly')
+
+
+@jobs_cli.command('status')
+@click.option('--failed', 'show_failed', type=int, default=10, help='Number of recent failures to list.')
+def jobs_status(show_failed):
+    """Show job counts by status and the latest failures."""
+    for status, count in db.session.query(Job.status, func.count(Job.id)).group_by(Job.status).order_by(Job.status):
+        click.echo(f'{status:<8} {count}')
+    for job in Job.query.filter_by(status='failed').order_by(Job.finished_at.desc()).limit(show_failed):
+        click.echo(f'failed job {job.id} ({job.name}, {job.attempts} attempts): {job.last_error}', err=True)
+
+
+bench_cli = AppGroup('bench', help='Synthetic data and load benchmarks.')
+
+
+@bench_cli.command('seed')
+@click.option('--students', type=int, default=1000)
+@click.option('--students-per-course', type=int, default=30, help='Average class size.')
+@click.option('--courses-per-student', type=int, default=5)
+@click.option('--courses-per-teacher', type=int, default=3)
+@click.option('--assignments-per-course', type=int, default=8)
+@click.option('--submission-rate', type=float, default=0.5, help='Share of assignments submitted.')
+@click.option('--parent-rate', type=float, default=0.8, help='Share of students with a parent account.')
+@click.option('--password', default='password', help='Password of every generated user.')
+@click.option('--prefix', default='seed', help='Prefix of the generated usernames.')
+@click.option('--chunk-size', type=int, default=1000, help='Students written per transaction.')
+@click.option('--seed', 'random_seed', type=int, default=0, help='Random seed, for repeatable schools.')
+def bench_seed(students, students_per_course, courses_per_student, courses_per_teacher, assignments_per_course,
+               submission_rate, parent_rate, password, prefix, chunk_size, random_seed):
+    """Bulk insert a synthetic school."""
+    started = time.perf_counter()
+    try:
+        report = seed_school(
+            students=students, students_per_course=students_per_course, courses_per_student=courses_per_student,
+            courses_per_teacher=courses_per_teacher, assignments_per_course=assignments_per_course,
+            submission_rate=submission_rate, parent_rate=parent_rate, password=password, prefix=prefix,
+            chunk_size=chunk_size, seed=random_seed,
+            progress=lambda written: click.echo(f'Students written: {written}', err=True)
+        )
+    except SeedError as e:
+        raise click.ClickException(str(e))
+    for name, count in report._asdict().items():
+        click.echo(f'{name:<12} {count}')
+    click.echo(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+
+@bench_cli.command('run')
+@click.option('--scenario', 'scenarios', multiple=True, type=click.Choice(sorted(SCENARIOS)),
+              help='Scenario to run; repeatable. Defaults to all of them.')
+@click.option('--requests', type=int, default=200, help='Requests per scenario.')
+@click.option('--concurrency', type=int, default=1, help='Requests in flight at once.')
+@click.option('--url', default=None, help='Base URL of a running server; runs in process when omitted.')
+@click.option('--prefix', default='seed', help='Prefix of the seeded usernames.')
+@click.option('--password', default='password', help='Password of the seeded users.')
+@click.option('--users', type=int, default=100, help='Seeded users of each role to spread requests over.')
+@click.option('--baseline', type=click.Path(dir_okay=False), default=None, help='JSON baseline to compare with.')
+@click.option('--save-baseline', 'save', is_flag=True, help='Write the results to --baseline instead of comparing.')
+@click.option('--tolerance', type=float, default=0.25, help='Allowed relative growth of p95 latency.')
+def bench_run(scenarios, requests, concurrency, url, prefix, password, users, baseline, save, tolerance):
+    """Measure throughput, latency percentiles and queries per request."""
+    if save and not baseline:
+        raise click.UsageError('--save-baseline needs --baseline.')
+    driver = HttpDriver(url, password) if url else InProcessDriver(current_app._get_current_object())
+    results = []
+    click.echo(f'{"scenario":<18} {"requests":>8} {"errors":>6} {"req/s":>8} '
+               f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>7}')
+    try:
+        for name in scenarios or SCENARIOS:
+            scenario = SCENARIOS[name]
+            try:
+                result = run_scenario(driver, scenario, load_users(scenario.role, prefix, users), password,
+                                      requests=requests, concurrency=concurrency)
+            except LookupError as e:
+                raise click.ClickException(f'{e} Run `flask bench seed` first.')
+            queries = f'{result.queries:.1f}' if result.queries is not None else '-'
+            click.echo(f'{result.name:<18} {result.requests:>8} {result.errors:>6} {result.throughput:>8.1f} '
+                       f'{result.p50:>8.1f} {result.p95:>8.1f} {result.p99:>8.1f} {queries:>7}')
+            results.append(result)
+    finally:
+        driver.close()
+
+    if save:
+        save_baseline(baseline, results)
+        click.echo(f'Baseline written to {baseline}')
+    elif baseline:
+        regressions = compare(results, load_baseline(baseline), tolerance)
+        for message in regressions:
+            click.echo(f'regression: {message}', err=True)
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} regressions against {baseline}')
+        click.echo(f'No regressions against {baseline}')
+
+
+@bench_cli.command('writes')
+@click.option('--mode', 'modes', multiple=True, type=click.Choice(list(WRITE_MODES)),
+              help='SQLite mode to measure; repeatable. Defaults to all of them.')
+@click.option('--threads', type=int, default=8, help='Concurrent writers.')
+@click.option('--writes', type=int, default=400, help='Submissions inserted per mode.')
+def bench_writes(modes, threads, writes):
+    """Compare concurrent write throughput of the SQLite modes on a scratch file."""
+    config = dict(current_app.config)
+    click.echo(f'{"mode":<12} {"writes":>7} {"errors":>6} {"writes/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for mode in modes or WRITE_MODES:
+        result = measure_concurrent_writes(config, mode, threads=threads, writes=writes)
+        click.echo(f'{result.mode:<12} {result.writes:>7} {result.errors:>6} {result.throughput:>9.1f} '
+                   f'{result.p50:>8.1f} {result.p95:>8.1f} {result.p99:>8.1f}')
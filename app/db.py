@@ -1,3 +1,28 @@
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+from sqlalchemy.sql.dml import UpdateBase
+from app.replicas import current_replica
 
-db = SQLAlchemy()
\ No newline at end of file
+
+class RoutingSession(SignallingSession):
+    """Session reading from the request's replica, see app.replicas."""
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = current_replica()
+        if (
+            replica is not None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and (mapper is None or mapper.persist_selectable.info.get('bind_key') is None)
+        ):
+            return get_state(self.app).db.get_engine(self.app, bind=replica)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+db = RoutingSQLAlchemy()
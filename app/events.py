@@ -0,0 +1,200 @@
+#!/usr/bin/python3
+"""
+Live dashboard events for the SodLat Edu Solution project.
+
+New assignments are published on the channel of their course and new or
+changed progress reports on the channel of their student, once the
+transaction that wrote them commits. The /events stream subscribes a
+student or parent to the channels of the courses and students they can
+see, so open dashboards learn about changes without polling.
+
+Brokers expose ``subscribe(channels, maxsize)`` returning a Subscription
+and ``publish(channel, event)``. ``LocalBroker`` only reaches streams
+served by the same process; deployments with several workers should plug
+in a shared one (e.g. wrapping Redis pub/sub) through EVENTS_BROKER.
+
+Every open stream holds a connection for up to EVENTS_MAX_DURATION, so
+the feature stays off unless EVENTS_ENABLED is set on a deployment served
+by an asynchronous worker class.
+"""
+
+import itertools
+import queue
+import threading
+from collections import defaultdict, namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+from app.models import Assignment, Progress
+
+
+Event = namedtuple('Event', ['id', 'kind', 'data'])
+
+_event_ids = itertools.count(1)
+
+
+class Subscription:
+    """
+    Bounded queue of events for one stream.
+
+    A slow client never holds up publishers: once its queue is full further
+    events are dropped and the subscription is marked as overflowed, so the
+    stream can tell the client to reload instead.
+    """
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Return the next event, or None if none arrived within timeout seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process publish/subscribe between the threads of one worker."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, maxsize=100):
+        subscription = Subscription(self, channels, maxsize)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+def make_broker(broker):
+    """
+    Build a broker from a configuration value.
+
+    :param broker: None for a LocalBroker, an import string naming a broker
+                   class or factory, or an already constructed broker.
+    """
+    if broker is None:
+        return LocalBroker()
+    if isinstance(broker, str):
+        return import_string(broker)()
+    return broker
+
+
+class EventHub:
+    """Publishes committed changes to the configured broker."""
+
+    def __init__(self, app=None):
+        self.broker = LocalBroker()
+        self.queue_size = 100
+        self.enabled = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENTS_ENABLED', False)
+        app.config.setdefault('EVENTS_BROKER', None)
+        app.config.setdefault('EVENTS_QUEUE_SIZE', 100)
+        app.config.setdefault('EVENTS_KEEPALIVE', 15)
+        app.config.setdefault('EVENTS_MAX_DURATION', 300)
+        self.enabled = app.config['EVENTS_ENABLED']
+        if not self.enabled:
+            return
+        self.broker = make_broker(app.config['EVENTS_BROKER'])
+        self.queue_size = app.config['EVENTS_QUEUE_SIZE']
+
+    def subscribe(self, channels):
+        return self.broker.subscribe(channels, self.queue_size)
+
+    def publish(self, channel, kind, data):
+        self.broker.publish(channel, Event(next(_event_ids), kind, data))
+
+
+def course_channel(course_id):
+    return f'course:{course_id}'
+
+
+def student_channel(student_id):
+    return f'student:{student_id}'
+
+
+def queue_event(session, channel, kind, data):
+    """Publish an event once the session's current transaction commits."""
+    session.info.setdefault('pending_events', []).append((channel, kind, data))
+
+
+# Helper function to describe a new assignment
+def assignment_event(assignment):
+    return course_channel(assignment.course_id), 'assignment', {
+        'id': assignment.id,
+        'course_id': assignment.course_id,
+        'title': assignment.title,
+        'due_date': assignment.due_date.isoformat() if assignment.due_date else None,
+    }
+
+
+# Helper function to describe a new or changed progress report
+def progress_event(progress_id, student_id, course_id, grade):
+    return student_channel(student_id), 'progress', {
+        'id': progress_id,
+        'student_id': student_id,
+        'course_id': course_id,
+        'grade': grade,
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_events(session, flush_context):
+    if not event_hub.enabled:
+        return
+    for obj in session.new:
+        if isinstance(obj, Assignment):
+            queue_event(session, *assignment_event(obj))
+        elif isinstance(obj, Progress):
+            queue_event(session, *progress_event(obj.id, obj.student_id, obj.course_id, obj.grade))
+    for obj in session.dirty:
+        if isinstance(obj, Progress) and session.is_modified(obj, include_collections=False):
+            queue_event(session, *progress_event(obj.id, obj.student_id, obj.course_id, obj.grade))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_events(session):
+    for channel, kind, data in session.info.pop('pending_events', ()):
+        event_hub.publish(channel, kind, data)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_events(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('pending_events', None)
+
+
+event_hub = EventHub()
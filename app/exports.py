@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""
+Streaming exports for the SodLat Edu Solution project.
+
+Archives are produced as generators of byte chunks: each member is
+compressed and handed to the client as soon as it is written, so no temp
+file is created and memory use does not grow with the size of the export.
+"""
+
+import io
+import os
+import zipfile
+from sqlalchemy.orm import joinedload
+from werkzeug.utils import secure_filename
+from app.models import AssignmentSubmission
+from app.uploads import BUFFER_SIZE
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink collecting what ZipFile writes between drains."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Yield what was written since the last drain, if anything."""
+        if self._chunks:
+            data = b''.join(self._chunks)
+            self._chunks.clear()
+            yield data
+
+
+def submission_folder(submission):
+    """Stable per-student folder name inside the archive."""
+    return secure_filename(submission.student.username) or f'student-{submission.student_id}'
+
+
+def stream_submissions_zip(assignment_id, store, upload_folder=None, batch_size=100):
+    """
+    Yield a ZIP archive of every submission of an assignment.
+
+    Each submission contributes ``<student>/<id>-submission.txt`` with the
+    text the student entered and ``<student>/<id>-<file name>`` with the
+    uploaded file, if any. Files are stored uncompressed since PDFs, Office
+    documents and media are compressed already.
+
+    :param assignment_id: ID of the assignment to export.
+    :param store: BlobStore holding the submission files.
+    :param upload_folder: Folder of files saved before content addressing.
+    """
+    sink = _ZipStream()
+    submissions = AssignmentSubmission.query.options(
+        joinedload(AssignmentSubmission.student)
+    ).filter_by(assignment_id=assignment_id).order_by(AssignmentSubmission.id).yield_per(batch_size)
+
+    with zipfile.ZipFile(sink, mode='w') as archive:
+        for submission in submissions:
+            prefix = f'{submission_folder(submission)}/{submission.id}-'
+            date_time = submission.submission_date.timetuple()[:6]
+
+            if submission.submission_content:
+                info = zipfile.ZipInfo(prefix + 'submission.txt', date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, submission.submission_content)
+                yield from sink.drain()
+
+            if not submission.submission_file:
+                continue
+            if submission.file_digest:
+                path = store.path(submission.file_digest)
+            else:
+                path = os.path.join(upload_folder or '', secure_filename(submission.submission_file))
+            if not os.path.isfile(path):
+                info = zipfile.ZipInfo(prefix + 'MISSING.txt', date_time)
+                archive.writestr(info, f'The file {submission.submission_file} could not be found.\n')
+                yield from sink.drain()
+                continue
+
+            info = zipfile.ZipInfo(prefix + secure_filename(submission.submission_file), date_time)
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = os.path.getsize(path)
+            with open(path, 'rb') as source, archive.open(info, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as member:
+                while True:
+                    block = source.read(BUFFER_SIZE)
+                    if not block:
+                        break
+                    member.write(block)
+                    yield from sink.drain()
+            yield from sink.drain()
+
+    # The central directory is written when the archive is closed
+    yield from sink.drain()
@@ -4,12 +4,79 @@ Forms module for handling user input in the SodLat Edu Solution project.
 """
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, SelectField, TextAreaField, DateTimeField, BooleanField, IntegerField
-from wtforms.validators import DataRequired, Email, EqualTo, ValidationError
-from flask_wtf.file import FileAllowed, FileField
-from app.models import User, Course
+from flask_login import current_user
+from wtforms import widgets, Form, StringField, PasswordField, SubmitField, SelectField, TextAreaField, DateTimeField, BooleanField, IntegerField, HiddenField, FieldList, FormField
+from wtforms.fields.choices import SelectFieldBase
+from wtforms.validators import DataRequired, Email, EqualTo, ValidationError, Optional, Length, NumberRange
+from flask_wtf.file import FileAllowed, FileField, FileRequired
+from app.choices import course_choices
+from app.db import db
+from app.models import User, Course, normalize_identifier
 from datetime import date
-from wtforms_sqlalchemy.fields import QuerySelectField
+
+
+class CourseSelectField(SelectFieldBase):
+    """
+    Select field for one of the current teacher's courses.
+
+    Choices come from course_choices, so they are loaded at most once per
+    request however many forms use them, and only when the field is
+    rendered. A submitted ID is checked with a primary key lookup; the
+    field's data is the selected Course.
+    """
+    widget = widgets.Select()
+
+    def __init__(self, label=None, validators=None, **kwargs):
+        super().__init__(label, validators, **kwargs)
+        self._course_id = None
+        self._data = None
+
+    @property
+    def data(self):
+        if self._course_id is not None:
+            self._data = Course.query.get(self._course_id)
+            self._course_id = None
+        return self._data
+
+    @data.setter
+    def data(self, course):
+        self._course_id = None
+        self._data = course
+
+    def selected_id(self):
+        if self._course_id is not None:
+            return self._course_id
+        return self._data.id if self._data is not None else None
+
+    def iter_choices(self):
+        selected = self.selected_id()
+        for course_id, name in course_choices.for_current_user():
+            yield (course_id, name, course_id == selected, {})
+
+    def process_formdata(self, valuelist):
+        if valuelist and valuelist[0]:
+            try:
+                self._course_id = int(valuelist[0])
+            except ValueError:
+                raise ValueError(self.gettext('Not a valid choice.'))
+
+    def pre_validate(self, form):
+        if self.selected_id() is None:
+            return
+        course = self.data
+        if course is None or not current_user.is_authenticated or course.teacher_id != current_user.id:
+            raise ValidationError(self.gettext('Not a valid choice.'))
+
+
+# Helper functions probing the normalized identity indexes
+def username_taken(username):
+    """Return the ID of the user holding this username in any case, or None."""
+    return db.session.query(User.id).filter_by(username_normalized=normalize_identifier(username)).scalar()
+
+
+def email_taken(email):
+    """Return the ID of the user holding this email in any case, or None."""
+    return db.session.query(User.id).filter_by(email_normalized=normalize_identifier(email)).scalar()
 
 
 class LoginForm(FlaskForm):
@@ -31,20 +98,21 @@ class RegistrationForm(FlaskForm):
     submit = SubmitField('Register')
 
     def validate_username(self, username):
-        """Validate that the username is unique."""
-        user = User.query.filter_by(username=username.data).first()
-        if user:
+        """Validate that the username is unique, ignoring case."""
+        if '@' in username.data:
+            raise ValidationError('Usernames cannot contain @.')
+        if username_taken(username.data):
             raise ValidationError('Username is already taken.')
 
     def validate_email(self, email):
-        """Validate that the email is unique."""
-        user = User.query.filter_by(email=email.data).first()
-        if user:
+        """Validate that the email is unique, ignoring case."""
+        if email_taken(email.data):
             raise ValidationError('Email is already registered.')
 
 
 class UserForm(FlaskForm):
     """Form for creating or updating users."""
+    id = HiddenField('User ID', validators=[DataRequired()])
     username = StringField('Username', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
     is_teacher = BooleanField('Teacher')
@@ -55,16 +123,26 @@ class UserForm(FlaskForm):
         EqualTo('password', message='Passwords must match.')])
     submit = SubmitField('Submit')
 
+    @property
+    def user_id(self):
+        """ID of the user being edited, or None if missing or malformed."""
+        try:
+            return int(self.id.data)
+        except (TypeError, ValueError):
+            return None
+
     def validate_username(self, username):
         """Validate that the username is unique."""
-        user = User.query.filter_by(username=username.data).first()
-        if user and user.id != self.user_id:
+        if '@' in username.data:
+            raise ValidationError('Usernames cannot contain @.')
+        user_id = username_taken(username.data)
+        if user_id and user_id != self.user_id:
             raise ValidationError('Username is already taken.')
 
     def validate_email(self, email):
-        """Validate that the email is unique."""
-        user = User.query.filter_by(email=email.data).first()
-        if user:
+        """Validate that the email is unique, other than the edited user's own."""
+        user_id = email_taken(email.data)
+        if user_id and user_id != self.user_id:
             raise ValidationError('Email is already registered.')
 
 
@@ -80,7 +158,7 @@ class AssignmentForm(FlaskForm):
     title = StringField('Title', validators=[DataRequired()])
     description = TextAreaField('Description', validators=[DataRequired()])
     due_date = DateTimeField('Due Date', format='%Y-%m-%d', validators=[DataRequired()], render_kw={"type": "date"})
-    course_id = QuerySelectField('Course', query_factory=lambda: Course.query.all(), get_label='course', allow_blank=False, validators=[DataRequired()])
+    course_id = CourseSelectField('Course', validators=[DataRequired()])
     submit = SubmitField('Submit')
 
     def validate_due_date(self, due_date):
@@ -95,8 +173,17 @@ class AssignmentSubmissionForm(FlaskForm):
     submission_file = FileField('Upload File', validators=[
         FileAllowed(['pdf', 'doc', 'docx'], 'PDF or Word documents only!')
     ])
+    upload_id = HiddenField('Chunked Upload')
     submit = SubmitField('Submit')
 
+class RosterImportForm(FlaskForm):
+    """Form for teachers to import a roster of students and parents."""
+    roster_file = FileField('Roster File', validators=[
+        FileRequired(), FileAllowed(['csv', 'xlsx'], 'CSV or XLSX files only!')
+    ])
+    submit = SubmitField('Import')
+
+
 class LinkParentForm(FlaskForm):
     """Form for linking a student to a parent."""
     student_username = StringField('Student Username', validators=[DataRequired()])
@@ -104,7 +191,7 @@ class LinkParentForm(FlaskForm):
 
     def validate_student_username(self, student_username):
         """Validate that the parent username exists."""
-        student = User.query.filter_by(username=student_username.data).first()
+        student = User.query.filter_by(username_normalized=normalize_identifier(student_username.data)).first()
         if not student:
             raise ValidationError('No matching student found')
 
@@ -112,7 +199,7 @@ class LinkParentForm(FlaskForm):
 class ProgressForm(FlaskForm):
     """Form for tracking student progress."""
     student_name = StringField('Student Name', validators=[DataRequired()])
-    course_id = QuerySelectField('Course', query_factory=lambda: Course.query.all(), get_label='course', validators=[DataRequired()])
+    course_id = CourseSelectField('Course', validators=[DataRequired()])
     grade = StringField('Grade', validators=[DataRequired()])
     days_present = IntegerField('Days Present', validators=[DataRequired()])
     days_absent = IntegerField('Days Absent', validators=[DataRequired()])
@@ -121,7 +208,7 @@ class ProgressForm(FlaskForm):
 
     def validate_student_name(self, student_name):
         """Validate that the student username exists."""
-        student = User.query.filter_by(username=student_name.data).first()
+        student = User.query.filter_by(username_normalized=normalize_identifier(student_name.data)).first()
         if not student:
             raise ValidationError('No matching student found.')
 
@@ -131,16 +218,35 @@ class ProgressForm(FlaskForm):
             raise ValidationError('Attendance values must be positive.')
         
 
+class GradebookEntryForm(Form):
+    """One student row of the gradebook grid; CSRF is handled by the enclosing form."""
+    student_name = StringField('Student Name', validators=[Optional()])
+    grade = StringField('Grade', validators=[Optional(), Length(max=10)])
+    days_present = IntegerField('Days Present', validators=[Optional(), NumberRange(min=0)])
+    days_absent = IntegerField('Days Absent', validators=[Optional(), NumberRange(min=0)])
+    overall_performance = TextAreaField('Overall Performance', validators=[Optional()])
+
+    def is_blank(self):
+        """True when the row records nothing."""
+        return not any(field.data not in (None, '') for field in self if field.short_name != 'student_name')
+
+
+class GradebookForm(FlaskForm):
+    """Form for grading a whole course in one submission."""
+    entries = FieldList(FormField(GradebookEntryForm))
+    submit = SubmitField('Save Gradebook')
+
+
 class AttendanceForm(FlaskForm):
     #Form for recording student attendance.
     student_name = StringField('Student Name', validators=[DataRequired()])
-    course_id = QuerySelectField('Course', query_factory=lambda: Course.query.all(), get_label='course', validators=[DataRequired()])
+    course_id = CourseSelectField('Course', validators=[DataRequired()])
     days_present = IntegerField('Days Present', validators=[DataRequired()])
     days_absent = IntegerField('Days Absent', validators=[DataRequired()])
     submit = SubmitField('Submit Attendance')
 
     def validate_student_name(self, student_name):
         #Validate that the student username exists.
-        student = User.query.filter_by(username=student_name.data).first()
+        student = User.query.filter_by(username_normalized=normalize_identifier(student_name.data)).first()
         if not student:
             raise ValidationError('No matching student found.')
@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+"""
+Template fragment caching for the SodLat Edu Solution project.
+
+Fragments are keyed by the version tokens of what they show. Committing a
+change replaces the tokens it touches, so every fragment built from the
+old data is simply never asked for again and ages out of the LRU. Used
+from templates as::
+
+    {% call cache_fragment('student-progress', current_user.id,
+                           depends=['Progress', 'Course', 'user:' ~ current_user.id]) %}
+        ...
+    {% endcall %}
+
+Students, their submissions and their progress reports change all the
+time, so flushed changes to them only replace the tokens of the student
+(``user:<id>``) and of the student's parent (``parent:<id>``); a
+submission peak leaves everyone else's fragments alone. Other changes,
+and bulk writes recorded with mark_changed, replace the token of the
+entity type.
+
+Combined with LazyReadModel, a hit skips both rendering and the queries
+that would have fed it.
+
+The cache is off unless FRAGMENT_CACHE_BACKEND is set: tokens must be
+shared by every worker, or one would keep serving a student's dashboard
+from before the student's submission until FRAGMENT_CACHE_TTL expires.
+"""
+
+import uuid
+from flask import g
+from markupsafe import Markup
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.cache import make_backend
+from app.models import User
+
+
+# Model classes whose commits bump a version, by version name
+TRACKED_ENTITIES = {'User', 'Course', 'Assignment', 'Progress', 'AssignmentSubmission'}
+
+# Tracked models whose rows belong to one user, by the attribute naming the
+# user; flushing them bumps that user's versions rather than the type's
+USER_OWNED = {'User': 'id', 'Progress': 'student_id', 'AssignmentSubmission': 'student_id'}
+
+HOLE_MARKER = '<!--fragment-hole:{}-->'
+
+
+class FragmentCache:
+    """Versioned cache of rendered template fragments."""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_BACKEND', None)
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', 2048)
+        app.config.setdefault('FRAGMENT_CACHE_TTL', 60)
+        self.ttl = app.config['FRAGMENT_CACHE_TTL']
+        # No per-process default, see the module docstring
+        self.backend = make_backend(
+            app.config['FRAGMENT_CACHE_BACKEND'], app.config['FRAGMENT_CACHE_SIZE'], self.ttl
+        ) if app.config['FRAGMENT_CACHE_BACKEND'] else None
+        app.jinja_env.globals.update(cache_fragment=self.render, fragment_hole=fragment_hole)
+
+    def version(self, name):
+        """Return the current version token of an entity type or user, creating one if needed."""
+        key = f'version:{name}'
+        token = self.backend.get(key)
+        if token is None:
+            token = uuid.uuid4().hex
+            self.backend.set(key, token, 0)
+        return token
+
+    def bump(self, *names):
+        """Give the named entity types or users new versions, orphaning fragments built on them."""
+        if self.backend is None:
+            return
+        for name in names:
+            self.backend.set(f'version:{name}', uuid.uuid4().hex, 0)
+
+    def key(self, name, parts, depends):
+        versions = ':'.join(self.version(entity) for entity in sorted(depends))
+        return f'fragment:{name}:{":".join(str(part) for part in parts)}:{versions}'
+
+    def render(self, name, *parts, depends=(), ttl=None, holes=None, caller=None):
+        """
+        Return the cached body of a ``{% call %}`` block, rendering it on a miss.
+
+        :param name: Fragment name.
+        :param parts: Values identifying this copy, e.g. the user ID.
+        :param depends: Entity types shown in the fragment, and the
+                        ``user:<id>`` or ``parent:<id>`` whose rows it shows.
+        :param holes: {name: markup} substituted for fragment_hole(name) after
+                      the lookup, for per-request values such as CSRF tokens.
+        """
+        if self.backend is None or not self.ttl or g.get('bypass_fragment_cache'):
+            html = str(caller())
+        else:
+            key = self.key(name, parts, depends)
+            html = self.backend.get(key)
+            if html is None:
+                html = str(caller())
+                self.backend.set(key, html, self.ttl if ttl is None else ttl)
+        for hole, value in (holes or {}).items():
+            html = html.replace(HOLE_MARKER.format(hole), str(value))
+        return Markup(html)
+
+
+def bypass_fragment_cache():
+    """Render every fragment of this request afresh without storing it, e.g. to show form errors."""
+    g.bypass_fragment_cache = True
+
+
+def fragment_hole(name):
+    """Placeholder inside a cached fragment, filled on every request through holes."""
+    return Markup(HOLE_MARKER.format(name))
+
+
+class LazyReadModel:
+    """Defers a read-model loader until a template first reads one of its fields."""
+
+    def __init__(self, loader, *args):
+        self._loader = loader
+        self._args = args
+        self._model = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._model is None:
+            self._model = self._loader(*self._args)
+        return getattr(self._model, name)
+
+
+def mark_changed(session, *names):
+    """Record entity types changed by Core or bulk statements the ORM events do not see."""
+    session.info.setdefault('changed_entities', set()).update(names)
+
+
+def mark_users_changed(session, user_ids, parent_ids=()):
+    """Record changes to the rows of some users, which also show on their parents' dashboards."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids or fragment_cache.backend is None:
+        return
+    parents = session.connection().execute(
+        select(User.parent_id).where(User.id.in_(sorted(user_ids)), User.parent_id.isnot(None))
+    ).scalars()
+    parent_ids = {parent_id for parent_id in parent_ids if parent_id is not None} | set(parents)
+    mark_changed(session, *(f'user:{user_id}' for user_id in user_ids),
+                 *(f'parent:{parent_id}' for parent_id in parent_ids))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    if fragment_cache.backend is None:
+        return
+    changed, user_ids, parent_ids = set(), set(), set()
+    for obj in session.new | session.dirty | session.deleted:
+        name = type(obj).__name__
+        if name not in TRACKED_ENTITIES:
+            continue
+        if name not in USER_OWNED:
+            changed.add(name)
+            continue
+        user_ids.add(getattr(obj, USER_OWNED[name]))
+        if name == 'User':
+            # Unlinking or deleting a child changes the old parent's dashboard too
+            parent_ids.update(inspect(obj).attrs.parent_id.history.deleted or ())
+            if obj in session.deleted:
+                parent_ids.add(obj.parent_id)
+            if obj.is_teacher:
+                # Teacher names show on their students' and parents' pages
+                changed.add(name)
+    mark_changed(session, *changed)
+    mark_users_changed(session, user_ids, parent_ids)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _collect_bulk_changes(context):
+    name = context.mapper.class_.__name__
+    if name in TRACKED_ENTITIES:
+        mark_changed(context.session, name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_versions(session):
+    changed = session.info.pop('changed_entities', None)
+    if changed:
+        fragment_cache.bump(*changed)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_changes(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('changed_entities', None)
+
+
+fragment_cache = FragmentCache()
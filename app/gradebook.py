@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+"""
+Gradebook grid for the SodLat Edu Solution project.
+
+A teacher grades a whole course in one submission. Student names are
+resolved in a single query and Progress rows are upserted in bulk inside
+one transaction, so saving the grid costs the same few queries whether
+the class has three students or thirty.
+"""
+
+from collections import namedtuple
+from app.db import db
+from app.events import queue_event, progress_event
+from app.fragments import mark_users_changed
+from app.models import User, Progress, student_courses, allocate_versions, normalize_identifier
+
+
+GRADE_FIELDS = ('grade', 'days_present', 'days_absent', 'overall_performance')
+
+GradebookResult = namedtuple('GradebookResult', ['created', 'updated', 'errors'])
+
+
+def latest_progress(course_id, student_ids=None):
+    """
+    Return {student_id: Progress} with the most recent report per student.
+
+    Older rows may hold more than one report per student and course; the
+    gradebook always edits the newest one.
+    """
+    query = Progress.query.filter_by(course_id=course_id)
+    if student_ids is not None:
+        query = query.filter(Progress.student_id.in_(student_ids))
+    return {progress.student_id: progress for progress in query.order_by(Progress.id)}
+
+
+def load_gradebook(course_id, blank_rows=3):
+    """
+    Build the initial rows of the grid for a course.
+
+    One row per enrolled student or student already graded in the course,
+    prefilled with their latest report, followed by blank rows for adding
+    students by username.
+
+    :return: List of dicts suitable as GradebookForm entries data.
+    """
+    enrolled = db.session.query(User.id, User.username).join(
+        student_courses, student_courses.c.student_id == User.id
+    ).filter(student_courses.c.course_id == course_id)
+    graded = db.session.query(User.id, User.username).join(
+        Progress, Progress.student_id == User.id
+    ).filter(Progress.course_id == course_id)
+    students = sorted(enrolled.union(graded), key=lambda student: student.username)
+
+    progress = latest_progress(course_id)
+    rows = []
+    for student_id, username in students:
+        row = {'student_name': username}
+        if student_id in progress:
+            row.update({name: getattr(progress[student_id], name) for name in GRADE_FIELDS})
+        rows.append(row)
+    rows.extend({'student_name': ''} for _ in range(blank_rows))
+    return rows
+
+
+def save_gradebook(course, teacher_id, entries):
+    """
+    Upsert the Progress rows of a submitted grid.
+
+    Nothing is written if any named student cannot be found; the caller
+    gets every problem at once instead.
+
+    :param course: Course being graded.
+    :param teacher_id: Teacher recorded on new reports.
+    :param entries: Iterable of GradebookEntryForm.
+    :return: GradebookResult with counts and a {row index: message} dict.
+    """
+    rows = {}
+    errors = {}
+    for index, entry in enumerate(entries):
+        # Usernames are matched ignoring case, as at login
+        name = normalize_identifier(entry.student_name.data or '')
+        if not name:
+            if not entry.is_blank():
+                errors[index] = 'Enter the student username.'
+            continue
+        if name in rows:
+            errors[index] = 'Student appears more than once.'
+            continue
+        values = {field: getattr(entry, field).data for field in GRADE_FIELDS}
+        rows[name] = (index, {field: None if value == '' else value for field, value in values.items()})
+
+    students = dict(db.session.query(User.username_normalized, User.id).filter(
+        User.username_normalized.in_(list(rows)), User.role == 'student'
+    )) if rows else {}
+    for name, (index, _) in rows.items():
+        if name not in students:
+            errors[index] = 'Student not found.'
+    if errors:
+        return GradebookResult(0, 0, errors)
+
+    existing = latest_progress(course.id, list(students.values()))
+    inserts, updates, changed_students = [], [], []
+    # Bulk writes skip the flush, so their live events are queued by hand
+    for name, (index, values) in rows.items():
+        student_id = students[name]
+        progress = existing.get(student_id)
+        if progress is None:
+            if any(value is not None for value in values.values()):
+                inserts.append(dict(values, student_id=student_id, course_id=course.id, teacher_id=teacher_id))
+                changed_students.append(student_id)
+                queue_event(db.session, *progress_event(None, student_id, course.id, values['grade']))
+        elif any(getattr(progress, field) != value for field, value in values.items()):
+            updates.append(dict(values, id=progress.id))
+            changed_students.append(student_id)
+            queue_event(db.session, *progress_event(progress.id, student_id, course.id, values['grade']))
+
+    # Bulk mappings skip the flush that stamps row versions
+    if inserts or updates:
+        versions = allocate_versions(db.session.connection(), Progress.__table__, len(inserts) + len(updates))
+        for mapping, version in zip(inserts + updates, versions):
+            mapping['version'] = version
+
+    # executemany for each kind, committed together
+    if inserts:
+        db.session.bulk_insert_mappings(Progress, inserts)
+    if updates:
+        db.session.bulk_update_mappings(Progress, updates)
+    # Bulk mappings skip the flush events the fragment cache listens to
+    mark_users_changed(db.session, changed_students)
+    db.session.commit()
+    return GradebookResult(len(inserts), len(updates), {})
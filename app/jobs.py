@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+"""
+Background jobs for the SodLat Edu Solution project.
+
+Routes enqueue slow side effects as rows of the ``job`` table, inside
+their own transaction, and ``flask jobs worker`` runs them on a bounded
+thread pool. Failed jobs are retried with exponential backoff until
+their attempts run out. A job whose worker died is requeued once its
+lock is older than JOBS_LOCK_TIMEOUT, so tasks must be safe to run twice.
+
+Tasks are plain functions registered under a name::
+
+    @task('uploads.complete')
+    def complete_upload(upload_id, owner_id):
+        ...
+
+    enqueue('uploads.complete', upload_id=upload.upload_id, owner_id=current_user.id)
+
+With JOBS_EAGER set, the default, enqueue runs the task straight away
+inside the caller's request instead. Deployments that turn it off must
+also run ``flask jobs worker``, otherwise queued jobs wait forever.
+"""
+
+import json
+import logging
+import os
+import random
+import socket
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from flask import current_app
+from app.db import db
+from app.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+Task = namedtuple('Task', ['fn', 'max_attempts'])
+
+TASKS = {}
+
+
+def task(name, max_attempts=None):
+    """Register a function as the task run for jobs called name."""
+    def decorator(fn):
+        TASKS[name] = Task(fn, max_attempts)
+        return fn
+    return decorator
+
+
+def enqueue(name, delay=0, **payload):
+    """
+    Add a job to the current session; it is queued when the caller commits.
+
+    :param name: Registered task name.
+    :param delay: Seconds to wait before the job may run.
+    :param payload: JSON serialisable keyword arguments for the task.
+    :return: The Job, or None if it ran eagerly.
+    """
+    if name not in TASKS:
+        raise LookupError(f'No task named {name}.')
+    if current_app.config['JOBS_EAGER']:
+        TASKS[name].fn(**payload)
+        return None
+    job = Job(
+        name=name,
+        payload=json.dumps(payload),
+        max_attempts=TASKS[name].max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts, base, cap):
+    """Seconds to wait before retry number attempts, doubling each time with jitter."""
+    delay = min(base * 2 ** (attempts - 1), cap)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim_jobs(worker_id, limit, lock_timeout):
+    """
+    Lock up to limit runnable jobs for worker_id.
+
+    Each job is taken with a conditional UPDATE, so two workers racing for
+    the same row cannot both win it on any database.
+
+    :return: IDs of the claimed jobs.
+    """
+    now = datetime.utcnow()
+    stale = Job.query.filter(Job.status == 'running', Job.locked_at < now - timedelta(seconds=lock_timeout))
+    stale.filter(Job.attempts >= Job.max_attempts).update(
+        {'status': 'failed', 'last_error': 'Worker lost while running the job.', 'finished_at': now},
+        synchronize_session=False
+    )
+    stale.update({'status': 'queued', 'locked_by': None}, synchronize_session=False)
+
+    candidates = db.session.query(Job.id).filter(
+        Job.status == 'queued', Job.run_at <= now
+    ).order_by(Job.run_at, Job.id).limit(limit).all()
+    claimed = []
+    for job_id, in candidates:
+        taken = Job.query.filter_by(id=job_id, status='queued').update({
+            'status': 'running', 'locked_by': worker_id, 'locked_at': now, 'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        if taken:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+
+def run_job(job_id):
+    """Run a claimed job and record the outcome, scheduling a retry on failure."""
+    config = current_app.config
+    job = Job.query.get(job_id)
+    try:
+        if job.name not in TASKS:
+            raise LookupError(f'No task named {job.name}.')
+        TASKS[job.name].fn(**json.loads(job.payload))
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Job %s (%s) failed on attempt %s', job_id, job.name, job.attempts)
+        job = Job.query.get(job_id)
+        job.last_error = f'{type(e).__name__}: {e}'
+        job.locked_by = job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(
+                seconds=backoff(job.attempts, config['JOBS_BACKOFF_BASE'], config['JOBS_BACKOFF_MAX'])
+            )
+    else:
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        job.locked_by = job.locked_at = None
+    db.session.commit()
+
+
+class Worker:
+    """Claims jobs and runs at most concurrency of them at a time."""
+
+    def __init__(self, app, concurrency=None, poll_interval=None):
+        self.app = app
+        self.concurrency = concurrency or app.config['JOBS_CONCURRENCY']
+        self.poll_interval = poll_interval if poll_interval is not None else app.config['JOBS_POLL_INTERVAL']
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{id(self):x}'
+        self.stopping = threading.Event()
+
+    def stop(self):
+        """Stop claiming jobs; the ones already running are finished."""
+        self.stopping.set()
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                run_job(job_id)
+            except Exception:
+                # The job stays running and is requeued after JOBS_LOCK_TIMEOUT
+                logger.exception('Could not record the outcome of job %s', job_id)
+
+    def run(self, once=False):
+        """
+        Work until stop() is called.
+
+        :param once: Return as soon as no job is runnable, e.g. from cron.
+        :return: The number of jobs run.
+        """
+        count = 0
+        running = set()
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='job') as pool:
+            while not self.stopping.is_set():
+                running = {future for future in running if not future.done()}
+                claimed = []
+                if len(running) < self.concurrency:
+                    with self.app.app_context():
+                        claimed = claim_jobs(
+                            self.worker_id, self.concurrency - len(running), self.app.config['JOBS_LOCK_TIMEOUT']
+                        )
+                running.update(pool.submit(self._run, job_id) for job_id in claimed)
+                count += len(claimed)
+                if once and not claimed and not running:
+                    break
+                if claimed and len(running) < self.concurrency:
+                    continue  # more jobs may be runnable right away
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self.stopping.wait(self.poll_interval)
+        return count
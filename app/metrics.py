@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+"""
+Operational metrics for the SodLat Edu Solution project.
+
+Counters and histograms are recorded in a shard owned by the calling
+thread, so recording never takes a lock; shards are only summed when the
+metrics are read. ``/metrics`` serves the totals in the Prometheus text
+format: requests and latency per endpoint, SQLAlchemy pool usage, bytes
+received by chunked uploads and login attempts by outcome. Rates such as
+upload bytes per second are left to the scraper (``rate()``).
+
+Each worker process is separate, so with METRICS_DIR set every process
+writes its totals to ``<pid>.json`` in that directory every
+METRICS_FLUSH_INTERVAL seconds, and a scrape answered by any worker sums
+the files of all of them. Counters of exited workers are kept so totals
+never go backwards; their gauges are dropped. Empty the directory when
+the server is (re)deployed.
+"""
+
+import atexit
+import bisect
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import partial
+from flask import current_app, g, request
+from app.db import db
+
+
+Metric = namedtuple('Metric', ['name', 'kind', 'help', 'buckets'])
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Shard:
+    """Counters and histograms written by one thread only."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+def _labels(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metrics:
+    """Lock-free recording, per-process totals and cross-process aggregation."""
+
+    def __init__(self, app=None):
+        self.registry = {}
+        self.collectors = []
+        self.directory = None
+        self.flush_interval = 5
+        self.pid = None
+        self.enabled = True
+        self._local = threading.local()
+        self._shards = []
+        self._retired = Shard()
+        self._shards_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', False)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 5)
+        app.config.setdefault('METRICS_TOKEN', None)
+        self.enabled = app.config['METRICS_ENABLED']
+        if not self.enabled:
+            return
+        self.directory = app.config['METRICS_DIR']
+        self.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.unregister(self.flush)
+            atexit.register(self.flush)
+
+        self.counter('http_requests_total', 'Requests handled, by endpoint, method and status.')
+        self.histogram('http_request_duration_seconds', 'Time taken to answer a request, by endpoint.')
+        self.counter('upload_bytes_total', 'Bytes of upload chunks stored.')
+        self.counter('logins_total', 'Login attempts, by result.')
+        self.gauge('db_pool_checked_out', 'Database connections currently checked out, by worker.')
+        self.gauge('db_pool_overflow', 'Connections opened beyond the pool size, by worker.')
+        self.collectors = [partial(pool_gauges, app)]
+
+        app.before_request(_start_timer)
+        app.after_request(self._record_request)
+
+    def counter(self, name, help):
+        self.registry[name] = Metric(name, 'counter', help, None)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.registry[name] = Metric(name, 'histogram', help, tuple(buckets))
+
+    def gauge(self, name, help):
+        self.registry[name] = Metric(name, 'gauge', help, None)
+
+    def current_pid(self):
+        # Looked up on use, since workers are forked after the app is created
+        return self.pid or os.getpid()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = Shard()
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def inc(self, name, amount=1, **labels):
+        """Add amount to the counter name."""
+        if not self.enabled:
+            return
+        counters = self._shard().counters
+        key = (name, _labels(labels))
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Record value in the histogram name."""
+        if not self.enabled:
+            return
+        histograms = self._shard().histograms
+        key = (name, _labels(labels))
+        entry = histograms.get(key)
+        if entry is None:
+            buckets = self.registry[name].buckets
+            entry = histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.registry[name].buckets, value)] += 1
+        entry[1] += value
+
+    def reset(self):
+        with self._shards_lock:
+            self._local = threading.local()
+            self._shards = []
+            self._retired = Shard()
+
+    def _record_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            self.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+            self.observe('http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return response
+
+    def collect(self):
+        """Totals of this process as a JSON serialisable dictionary."""
+        totals = Shard()
+        with self._shards_lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    # Fold the shards of finished threads so they do not pile up
+                    _merge(self._retired, shard)
+            self._shards = live
+            _merge(totals, self._retired)
+            for _, shard in live:
+                _merge(totals, shard)
+        gauges = []
+        for collector in self.collectors:
+            gauges.extend(collector())
+        return {
+            'pid': self.current_pid(),
+            'counters': [[name, labels, value] for (name, labels), value in totals.counters.items()],
+            'histograms': [
+                [name, labels, counts, total] for (name, labels), (counts, total) in totals.histograms.items()
+            ],
+            'gauges': [[name, _labels(labels), value] for name, labels, value in gauges],
+        }
+
+    def flush(self):
+        """Write the totals of this process to METRICS_DIR."""
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f'{self.current_pid()}.json')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as metrics_file:
+            json.dump(self.collect(), metrics_file)
+        os.replace(tmp_path, path)
+
+    def snapshots(self):
+        """Totals of every process, read from METRICS_DIR when set."""
+        if not self.directory:
+            return [self.collect()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as metrics_file:
+                    snapshot = json.load(metrics_file)
+            except (OSError, ValueError):
+                continue
+            if snapshot['pid'] != self.current_pid() and not _process_alive(snapshot['pid']):
+                snapshot['gauges'] = []
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        totals = Shard()
+        gauges = {}
+        for snapshot in self.snapshots():
+            shard = Shard()
+            shard.counters = {(name, tuple(map(tuple, labels))): value for name, labels, value in snapshot['counters']}
+            shard.histograms = {
+                (name, tuple(map(tuple, labels))): [counts, total]
+                for name, labels, counts, total in snapshot['histograms']
+            }
+            _merge(totals, shard)
+            for name, labels, value in snapshot['gauges']:
+                gauges[name, tuple(map(tuple, labels)) + (('pid', str(snapshot['pid'])),)] = value
+
+        samples = {name: {} for name in self.registry}
+        for source in (totals.counters, totals.histograms, gauges):
+            for (name, labels), value in source.items():
+                if name in samples:
+                    samples[name][labels] = value
+
+        lines = []
+        for name, metric in self.registry.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labels, value in sorted(samples[name].items()):
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = (('le', _format_value(bound)),)
+                    lines.append(f'{name}_bucket{_format_labels(labels + le)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(target, shard):
+    # Copies first: the owning thread may be adding keys meanwhile
+    for key, value in shard.counters.copy().items():
+        target.counters[key] = target.counters.get(key, 0) + value
+    for key, (counts, total) in shard.histograms.copy().items():
+        merged = target.histograms.setdefault(key, [[0] * len(counts), 0.0])
+        merged[0] = [a + b for a, b in zip(merged[0], counts)]
+        merged[1] += total
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Helper function to report connection pool usage
+def pool_gauges(app):
+    """Checked out and overflow connections of each engine with a QueuePool."""
+    binds = [None] + list(app.config.get('SQLALCHEMY_BINDS') or ())
+    gauges = []
+    for bind in binds:
+        pool = db.get_engine(app, bind).pool
+        if not hasattr(pool, 'checkedout'):
+            continue  # SQLite in-memory and file pools do not count connections
+        labels = {'bind': bind or 'default'}
+        gauges.append(('db_pool_checked_out', labels, pool.checkedout()))
+        gauges.append(('db_pool_overflow', labels, max(pool.overflow(), 0)))
+    return gauges
+
+
+def metrics_authorized():
+    """True if the request may read the metrics, per METRICS_TOKEN."""
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        return True
+    supplied = request.headers.get('Authorization', '').encode()
+    return hmac.compare_digest(supplied, f'Bearer {token}'.encode())
+
+
+metrics = Metrics()
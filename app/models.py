@@ -1,25 +1,44 @@
 #!/usr/bin/python3
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, validates
 from app.db import db
+from app.passwords import password_hasher
 
 
 # Association table for many-to-many relationship between students and courses
 student_courses = db.Table('student_courses',
-    db.Column('student_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('course_id', db.Integer, db.ForeignKey('course.id'))
+    db.Column('student_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('course_id', db.Integer, db.ForeignKey('course.id'), primary_key=True, index=True)
 )
 
+# One counter per versioned table, handing out its row versions
+change_counter = db.Table('change_counter',
+    db.Column('name', db.String(64), primary_key=True),
+    db.Column('value', db.BigInteger, nullable=False, default=0)
+)
+
+
+def normalize_identifier(value):
+    """Canonical form of a username or email used for lookups and uniqueness."""
+    return value.strip().lower() if value is not None else None
+
 
 class User(UserMixin, db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
-    parent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    role = db.Column(db.String(50), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    # Lowercased copies kept in step by normalize_identity; every lookup by
+    # username or email goes through these unique indexes.
+    username_normalized = db.Column(db.String(150), unique=True, nullable=False, index=True)
+    email_normalized = db.Column(db.String(120), unique=True, nullable=False, index=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    role = db.Column(db.String(50), nullable=False, index=True)
 
     
     # Relationships
@@ -35,34 +54,119 @@ class User(UserMixin, db.Model):
     is_parent = db.Column(db.Boolean, default=False)
     is_student = db.Column(db.Boolean, default=False)
     
-    # Password methods
+    @validates('username', 'email')
+    def normalize_identity(self, key, value):
+        setattr(self, f'{key}_normalized', normalize_identifier(value))
+        return value
+
+    @classmethod
+    def find_by_identifier(cls, identifier):
+        """
+        Return the user with this username or email, ignoring case.
+
+        Usernames cannot contain '@', so one unique index probe suffices.
+        """
+        value = normalize_identifier(identifier)
+        if '@' in value:
+            return cls.query.filter_by(email_normalized=value).first()
+        return cls.query.filter_by(username_normalized=value).first()
+
+    # Password methods, following the configured hashing policy
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def validate_parent_id(self, parent_id):
         """Prevents circular parent-child relationships."""
         if parent_id is None:
             return parent_id
-        parent = User.query.get(parent_id)
-        while parent:
-            if parent.id == self.id:
-                raise ValueError("Circular parent-child relationship detected.")
-            parent = parent.parent
+        if self.id is not None and User.is_ancestor(self.id, parent_id):
+            raise ValueError("Circular parent-child relationship detected.")
         return parent_id
 
+    # Family tree queries. Each runs as one recursive CTE over (id,
+    # parent_id); UNION rather than UNION ALL discards rows already seen, so
+    # the recursion ends even if the data already contains a cycle.
+    @staticmethod
+    def _family_cte(user_id, upwards):
+        user = User.__table__
+        tree = db.select(user.c.id, user.c.parent_id).where(user.c.id == user_id).cte('family', recursive=True)
+        link = user.c.id == tree.c.parent_id if upwards else user.c.parent_id == tree.c.id
+        return tree.union(db.select(user.c.id, user.c.parent_id).join(tree, link))
+
+    @classmethod
+    def is_ancestor(cls, ancestor_id, user_id):
+        """True if ancestor_id is user_id itself or any of its parents, grandparents, etc."""
+        tree = cls._family_cte(user_id, upwards=True)
+        return db.session.query(db.select(tree.c.id).where(tree.c.id == ancestor_id).exists()).scalar()
+
+    @classmethod
+    def ancestors(cls, user_id):
+        """Return the parent, grandparent, etc. of a user, nearest first."""
+        tree = cls._family_cte(user_id, upwards=True)
+        users = {user.id: user for user in cls.query.join(tree, tree.c.id == cls.id)}
+        chain = []
+        seen = {user_id}
+        current = users.get(user_id)
+        while current is not None and current.parent_id in users and current.parent_id not in seen:
+            current = users[current.parent_id]
+            seen.add(current.id)
+            chain.append(current)
+        return chain
+
+    @classmethod
+    def descendants(cls, user_id):
+        """
+        Return the children, grandchildren, etc. of a user.
+
+        :return: List of (user, depth) in breadth-first order, children at depth 1.
+        """
+        tree = cls._family_cte(user_id, upwards=False)
+        children = defaultdict(list)
+        for user in cls.query.join(tree, tree.c.id == cls.id).order_by(cls.username):
+            children[user.parent_id].append(user)
+
+        result = []
+        seen = {user_id}
+        level = [user_id]
+        depth = 0
+        while level:
+            depth += 1
+            next_level = []
+            for parent_id in level:
+                for child in children.get(parent_id, ()):
+                    if child.id not in seen:
+                        seen.add(child.id)
+                        result.append((child, depth))
+                        next_level.append(child.id)
+            level = next_level
+        return result
+
     def __repr__(self):
         return f"User('{self.username}', '{self.email}')"
 
 
-class Course(db.Model):
+class Versioned:
+    """
+    Adds an indexed updated_at and a version that grows with every insert or
+    update, so clients can ask for the rows changed since a version they saw.
+
+    Versions are stamped on flush; Core and bulk writes must take them from
+    allocate_versions themselves. Deleted rows are not reported, and a row
+    may commit after rows with higher versions, see settled_before.
+    """
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+
+
+class Course(Versioned, db.Model):
     __tablename__ = 'course'
     id = db.Column(db.Integer, primary_key=True)
     course = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
 
     # Relationships
     progress = db.relationship('Progress', back_populates='course', cascade='all, delete')
@@ -73,13 +177,13 @@ class Course(db.Model):
         return f"Course('{self.course}')"
 
 
-class Assignment(db.Model):
+class Assignment(Versioned, db.Model):
     __tablename__ = 'assignment'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     due_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
     
     # Relationships
     course = db.relationship('Course', back_populates='assignments')
@@ -89,28 +193,98 @@ class Assignment(db.Model):
         return f"Assignment('{self.title}')"
 
 
-class AssignmentSubmission(db.Model):
+class AssignmentSubmission(Versioned, db.Model):
     __tablename__ = 'assignment_submission'
+    __table_args__ = (
+        db.Index('ix_assignment_submission_student_id_assignment_id', 'student_id', 'assignment_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     submission_content = db.Column(db.Text, nullable=True)
-    submission_file = db.Column(db.String(200), nullable=True)  # File path or URL
+    submission_file = db.Column(db.String(200), nullable=True)  # Original file name
+    # Stored content; active_history keeps the old digest for reference counting
+    file_digest = db.column_property(
+        db.Column(db.String(64), db.ForeignKey('blob.digest'), nullable=True, index=True), active_history=True
+    )
     submission_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False, index=True)
     
     # Relationships
     student = db.relationship('User', backref='assignment_submissions', foreign_keys=[student_id])
     assignment = db.relationship('Assignment', back_populates='submissions')
+    blob = db.relationship('Blob')
 
     def __repr__(self):
         return f"AssignmentSubmission('{self.student_id}', '{self.assignment_id}')"
 
 
-class Progress(db.Model):
+class Blob(db.Model):
+    """A stored submission file, shared by every submission with the same content."""
+    __tablename__ = 'blob'
+    digest = db.Column(db.String(64), primary_key=True)  # sha256 of the content
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    last_referenced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"Blob('{self.digest}', {self.ref_count})"
+
+
+class Job(db.Model):
+    """A deferred task, run by ``flask jobs worker`` outside the request."""
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done or failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"Job('{self.name}', '{self.status}')"
+
+
+def _change_ref_count(connection, digest, delta):
+    if digest is not None:
+        connection.execute(
+            Blob.__table__.update().where(Blob.digest == digest).values(ref_count=Blob.ref_count + delta)
+        )
+
+
+@event.listens_for(AssignmentSubmission, 'after_insert')
+def _submission_inserted(mapper, connection, target):
+    _change_ref_count(connection, target.file_digest, 1)
+
+
+@event.listens_for(AssignmentSubmission, 'after_delete')
+def _submission_deleted(mapper, connection, target):
+    _change_ref_count(connection, target.file_digest, -1)
+
+
+@event.listens_for(AssignmentSubmission, 'after_update')
+def _submission_updated(mapper, connection, target):
+    history = db.inspect(target).attrs.file_digest.history
+    if history.has_changes():
+        for digest in history.deleted:
+            _change_ref_count(connection, digest, -1)
+        for digest in history.added:
+            _change_ref_count(connection, digest, 1)
+
+
+class Progress(Versioned, db.Model):
     __tablename__ = 'progress'
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     grade = db.Column(db.String(10), nullable=True)
     days_present = db.Column(db.Integer, nullable=True)
@@ -123,4 +297,63 @@ class Progress(db.Model):
     teacher = db.relationship('User', backref='teacher_progress', foreign_keys=[teacher_id])
 
     def __repr__(self):
-        return f"Progress('{self.student_id}', '{self.course_id}')"
\ No newline at end of file
+        return f"Progress('{self.student_id}', '{self.course_id}')"
+
+
+def allocate_versions(connection, table, count):
+    """
+    Reserve count consecutive versions for a table.
+
+    SQLite lets one transaction write at a time, so the counter is bumped
+    in the caller's transaction. Elsewhere it is bumped and committed on a
+    connection of its own, so concurrent writers only wait for that one
+    statement rather than for each other's whole transactions. Versions
+    may then commit out of order; readers only hand out cursors past rows
+    stamped before settled_before().
+
+    :return: range of the reserved versions.
+    """
+    name = getattr(table, 'name', table)
+    if connection.dialect.name == 'sqlite':
+        return _bump_counter(connection, name, count)
+    with connection.engine.begin() as counter_connection:
+        return _bump_counter(counter_connection, name, count)
+
+
+def _bump_counter(connection, name, count):
+    updated = connection.execute(
+        change_counter.update().where(change_counter.c.name == name).values(value=change_counter.c.value + count)
+    )
+    if not updated.rowcount:
+        connection.execute(change_counter.insert().values(name=name, value=count))
+    last = connection.execute(select(change_counter.c.value).where(change_counter.c.name == name)).scalar()
+    return range(last - count + 1, last + 1)
+
+
+def settled_before():
+    """
+    Time before which every stamped row has committed or rolled back.
+
+    Write transactions are assumed to last less than
+    VERSION_SETTLE_SECONDS, so a row still invisible now has a later
+    updated_at than this, and a cursor made only of versions stamped
+    before it never skips a row.
+    """
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get('VERSION_SETTLE_SECONDS', 10))
+
+
+@event.listens_for(Session, 'before_flush')
+def _stamp_versions(session, flush_context, instances):
+    changed = defaultdict(list)
+    for obj in session.new:
+        if isinstance(obj, Versioned):
+            changed[obj.__table__].append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Versioned) and session.is_modified(obj, include_collections=False):
+            changed[obj.__table__].append(obj)
+    if not changed:
+        return
+    connection = session.connection()
+    for table, objs in changed.items():
+        for obj, version in zip(objs, allocate_versions(connection, table, len(objs))):
+            obj.version = version
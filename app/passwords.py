@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+"""
+Password hashing for the SodLat Edu Solution project.
+
+The algorithm and cost come from configuration through a policy object,
+hashes made under older settings are upgraded when their owner next logs
+in, and the CPU-bound work runs on a bounded pool so a burst of logins
+cannot run more hashes at once than there are workers for it.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+from werkzeug.utils import import_string
+
+
+class WerkzeugPolicy:
+    """
+    Hash with werkzeug.security.
+
+    :param method: Werkzeug method string, e.g. ``pbkdf2:sha256:600000``.
+    :param salt_length: Length of the random salt.
+    """
+
+    def __init__(self, method='pbkdf2:sha256', salt_length=16):
+        if method.startswith('pbkdf2:') and method.count(':') == 1:
+            method = f'{method}:{DEFAULT_PBKDF2_ITERATIONS}'
+        self.method = method
+        self.salt_length = salt_length
+
+    def hash(self, password):
+        return generate_password_hash(password, method=self.method, salt_length=self.salt_length)
+
+    def verify(self, password_hash, password):
+        return check_password_hash(password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different method or salt length."""
+        method, _, rest = password_hash.partition('$')
+        salt = rest.partition('$')[0]
+        return method != self.method or len(salt) != self.salt_length
+
+    def __repr__(self):
+        return f'WerkzeugPolicy({self.method!r})'
+
+
+class PasswordHasher:
+    """Applies the configured policy, running hashes on a bounded thread pool."""
+
+    def __init__(self, app=None):
+        self.policy = WerkzeugPolicy()
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_POLICY', None)
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', None)
+        self.policy = make_policy(
+            app.config['PASSWORD_POLICY'], app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_SALT_LENGTH']
+        )
+
+        # hashlib releases the GIL while hashing, so threads run in parallel;
+        # the pool size caps how many cores logins can take at once.
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or os.cpu_count() or 1, thread_name_prefix='password-hash'
+        ) if workers != 0 else None
+
+    def _run(self, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        return self.executor.submit(fn, *args).result()
+
+    def hash(self, password):
+        return self._run(self.policy.hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(self.policy.verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return self.policy.needs_rehash(password_hash)
+
+
+def make_policy(policy, method, salt_length):
+    """
+    Build a hashing policy from configuration.
+
+    :param policy: None for WerkzeugPolicy, or an import string naming a
+                   class taking the same arguments and providing hash,
+                   verify and needs_rehash.
+    """
+    if policy is None:
+        return WerkzeugPolicy(method, salt_length)
+    if isinstance(policy, str):
+        return import_string(policy)(method, salt_length)
+    return policy
+
+
+password_hasher = PasswordHasher()
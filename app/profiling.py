@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+"""
+Request profiling for the SodLat Edu Solution project.
+
+With PROFILING_ENABLED set, every request records the SQL statements it
+runs and how long they took, the time spent rendering templates and its
+total latency. The totals are sent back in a ``Server-Timing`` header
+(shown by the browser's network panel), accumulated per endpoint for
+``profiler.snapshot()``, and requests slower than PROFILING_SLOW_REQUEST_MS
+are logged together with their SQL.
+
+When profiling is off nothing is hooked into the app, so requests pay no
+overhead at all.
+"""
+
+import logging
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    """Timings collected while one request is handled."""
+
+    def __init__(self, max_statements):
+        self.started = time.perf_counter()
+        self.max_statements = max_statements
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.statements = []
+
+    def record_query(self, statement, elapsed):
+        self.query_count += 1
+        self.db_time += elapsed
+        if len(self.statements) < self.max_statements:
+            self.statements.append((elapsed, statement))
+
+
+class EndpointStats:
+    """Running totals for one endpoint."""
+
+    __slots__ = ('requests', 'total_time', 'db_time', 'template_time', 'query_count', 'slowest')
+
+    def __init__(self):
+        self.requests = 0
+        self.total_time = 0.0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.query_count = 0
+        self.slowest = 0.0
+
+    def add(self, profile, total):
+        self.requests += 1
+        self.total_time += total
+        self.db_time += profile.db_time
+        self.template_time += profile.template_time
+        self.query_count += profile.query_count
+        self.slowest = max(self.slowest, total)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def current_profile():
+    """The profile of the request being handled, or None."""
+    if has_request_context():
+        return g.get('request_profile')
+    return None
+
+
+class TimedTemplate(Template):
+    """Jinja template adding its render time to the current request profile."""
+
+    def render(self, *args, **kwargs):
+        profile = current_profile()
+        if profile is None:
+            return super().render(*args, **kwargs)
+        # Templates rendered from inside another one are already timed by it
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - started
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        conn.info.setdefault('profiling_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    started = conn.info.get('profiling_started')
+    if profile is not None and started:
+        profile.record_query(statement, time.perf_counter() - started.pop())
+
+
+class Profiler:
+    """Hooks request, SQL and template timing into an app when enabled."""
+
+    _listening = False
+
+    def __init__(self, app=None):
+        self.stats = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILING_ENABLED', False)
+        app.config.setdefault('PROFILING_SERVER_TIMING', True)
+        app.config.setdefault('PROFILING_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('PROFILING_MAX_STATEMENTS', 50)
+        if not app.config['PROFILING_ENABLED']:
+            return
+
+        # Listening on the Engine class also covers engines of other binds
+        if not Profiler._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            Profiler._listening = True
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.request_profile = RequestProfile(current_app.config['PROFILING_MAX_STATEMENTS'])
+
+    def _finish(self, response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        total = time.perf_counter() - profile.started
+        endpoint = request.endpoint or 'unmatched'
+        with self._lock:
+            self.stats.setdefault(endpoint, EndpointStats()).add(profile, total)
+
+        config = current_app.config
+        if config['PROFILING_SERVER_TIMING']:
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} queries"',
+                f'tpl;dur={profile.template_time * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        if total * 1000 >= config['PROFILING_SLOW_REQUEST_MS']:
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms total, %.0f ms in %d queries, %.0f ms rendering\n%s',
+                request.method, request.path, endpoint, total * 1000, profile.db_time * 1000,
+                profile.query_count, profile.template_time * 1000,
+                '\n'.join(f'  {elapsed * 1000:.1f} ms  {statement}' for elapsed, statement in profile.statements)
+            )
+        return response
+
+    def snapshot(self):
+        """Per-endpoint totals recorded so far, as plain dictionaries."""
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self.stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+
+
+profiler = Profiler()
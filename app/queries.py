@@ -0,0 +1,205 @@
+#!/usr/bin/python3
+"""
+Read-model queries for the SodLat Edu Solution dashboards.
+
+Each loader fetches everything a dashboard renders in a fixed number of
+batched queries, so the page cost does not grow with the number of
+children, courses or progress reports shown.
+"""
+
+from collections import namedtuple
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import joinedload, selectinload
+from app.db import db
+from app.models import (
+    User, Course, Assignment, AssignmentSubmission, Progress, student_courses, normalize_identifier, settled_before
+)
+
+
+# One flattened row of the parent dashboard progress table
+ProgressRow = namedtuple('ProgressRow', [
+    'student_id', 'student_name', 'course', 'teacher', 'grade',
+    'days_present', 'days_absent', 'overall_performance'
+])
+
+ParentDashboard = namedtuple('ParentDashboard', ['children', 'progress', 'progress_data'])
+
+StudentDashboard = namedtuple('StudentDashboard', ['enrolled_courses', 'assignments', 'submissions', 'progress'])
+
+TeacherDashboard = namedtuple('TeacherDashboard', ['courses'])
+
+UserPage = namedtuple('UserPage', ['users', 'next_cursor'])
+
+ChangePage = namedtuple('ChangePage', ['rows', 'cursor', 'more'])
+
+
+def load_parent_dashboard(parent_id):
+    """
+    Load the linked children of a parent and all of their progress reports.
+
+    Issues exactly two queries: one for the children and one for their
+    progress rows, with each row's course and course teacher joined in.
+
+    :param parent_id: ID of the parent user.
+    :return: ParentDashboard with the children, a {child_id: [Progress]}
+             mapping and the flattened rows rendered by the template.
+    """
+    children = User.query.filter_by(parent_id=parent_id, is_student=True).order_by(User.username).all()
+    progress = {child.id: [] for child in children}
+    if not children:
+        return ParentDashboard(children, progress, [])
+
+    reports = Progress.query.options(
+        joinedload(Progress.course).joinedload(Course.teacher)
+    ).filter(
+        Progress.student_id.in_(list(progress))
+    ).order_by(Progress.student_id, Progress.id).all()
+
+    for report in reports:
+        progress[report.student_id].append(report)
+
+    progress_data = [
+        ProgressRow(
+            student_id=child.id,
+            student_name=child.username,
+            course=report.course.course,
+            teacher=report.course.teacher.username,
+            grade=report.grade,
+            days_present=report.days_present,
+            days_absent=report.days_absent,
+            overall_performance=report.overall_performance
+        )
+        for child in children
+        for report in progress[child.id]
+    ]
+    return ParentDashboard(children, progress, progress_data)
+
+
+def load_student_dashboard(student_id):
+    """
+    Load the courses, assignments and progress reports shown to a student.
+
+    Issues at most three queries: enrolled courses, the assignments of those
+    courses with the student's latest submission date joined in, and the
+    student's progress reports with their course.
+
+    :param student_id: ID of the student user.
+    :return: StudentDashboard with the enrolled courses, assignments ordered
+             by due date, a {assignment_id: submission_date} mapping of what
+             the student has already handed in, and the progress reports.
+    """
+    enrolled_courses = Course.query.join(
+        student_courses, student_courses.c.course_id == Course.id
+    ).filter(
+        student_courses.c.student_id == student_id
+    ).order_by(Course.course).all()
+
+    assignments = []
+    submissions = {}
+    if enrolled_courses:
+        latest = db.session.query(
+            AssignmentSubmission.assignment_id,
+            func.max(AssignmentSubmission.submission_date).label('submitted_at')
+        ).filter(
+            AssignmentSubmission.student_id == student_id
+        ).group_by(AssignmentSubmission.assignment_id).subquery()
+
+        rows = db.session.query(Assignment, latest.c.submitted_at).outerjoin(
+            latest, latest.c.assignment_id == Assignment.id
+        ).filter(
+            Assignment.course_id.in_([course.id for course in enrolled_courses])
+        ).order_by(Assignment.due_date, Assignment.id).all()
+
+        for assignment, submitted_at in rows:
+            assignments.append(assignment)
+            if submitted_at is not None:
+                submissions[assignment.id] = submitted_at
+
+    progress = Progress.query.options(
+        joinedload(Progress.course)
+    ).filter_by(student_id=student_id).order_by(Progress.id).all()
+
+    return StudentDashboard(enrolled_courses, assignments, submissions, progress)
+
+
+def load_teacher_dashboard(teacher_id):
+    """
+    Load the courses of a teacher with their assignments.
+
+    Issues two queries: the courses, then the assignments of all of them.
+
+    :param teacher_id: ID of the teacher user.
+    :return: TeacherDashboard with the courses in creation order.
+    """
+    courses = Course.query.options(
+        selectinload(Course.assignments)
+    ).filter_by(teacher_id=teacher_id).order_by(Course.id).all()
+    return TeacherDashboard(courses)
+
+
+def prefix_range(column, prefix):
+    """
+    Match values starting with prefix as a range, so the column index is used.
+
+    Unlike LIKE, the comparison needs no escaping and is served by an index
+    range scan on every database.
+    """
+    upper = prefix[:-1] + chr(min(ord(prefix[-1]) + 1, 0x10FFFF))
+    return and_(column >= prefix, column < upper)
+
+
+def list_users(roles, search=None, after=None, limit=50):
+    """
+    Return one page of users ordered by username, ignoring case.
+
+    Pages are addressed by keyset rather than offset: the cursor is the last
+    username of the previous page, so every page costs the same single
+    index range query however deep into the list it is.
+
+    :param roles: Roles to include, e.g. ('parent', 'student').
+    :param search: Optional prefix of the username or email, in any case.
+    :param after: Cursor returned with the previous page.
+    :param limit: Page size.
+    :return: UserPage with the users and the cursor of the next page, or
+             None on the last page.
+    """
+    query = db.session.query(User.id, User.username, User.email, User.role).filter(User.role.in_(roles))
+    if search:
+        search = normalize_identifier(search)
+        query = query.filter(or_(
+            prefix_range(User.username_normalized, search), prefix_range(User.email_normalized, search)
+        ))
+    if after:
+        query = query.filter(User.username_normalized > normalize_identifier(after))
+    users = query.order_by(User.username_normalized).limit(limit + 1).all()
+
+    next_cursor = normalize_identifier(users[limit - 1].username) if len(users) > limit else None
+    return UserPage(users[:limit], next_cursor)
+
+
+def changes_since(model, cursor=0, limit=500, query=None):
+    """
+    Return the rows of a versioned model inserted or updated after cursor.
+
+    Served by the index on the version column, so a client that is up to
+    date costs one empty index lookup instead of a full scan. The last page
+    only moves the cursor past rows stamped before settled_before(), so
+    rows still committing with lower versions are not skipped; the newest
+    rows may therefore come again on the next call.
+
+    :param model: Versioned model class, e.g. Progress.
+    :param cursor: Highest version already seen; 0 for everything.
+    :param limit: Page size.
+    :param query: Optional query over the model limiting which rows are
+                  visible; defaults to all of them.
+    :return: ChangePage with the rows ordered by version, the cursor to pass
+             next time and whether more rows are waiting.
+    """
+    query = model.query if query is None else query
+    rows = query.filter(model.version > cursor).order_by(model.version).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if more:
+        return ChangePage(rows, rows[-1].version, more)
+    settled = settled_before()
+    return ChangePage(rows, max([row.version for row in rows if row.updated_at < settled], default=cursor), more)
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""
+Query plan checks for the SodLat Edu Solution project.
+
+Records the SQL statements issued while a block runs and replays each of
+them through SQLite's ``EXPLAIN QUERY PLAN`` to find filters that fall back
+to scanning a whole table instead of searching an index.
+"""
+
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+CapturedStatement = namedtuple('CapturedStatement', ['statement', 'parameters'])
+
+FullScan = namedtuple('FullScan', ['table', 'detail', 'statement'])
+
+# "FROM user AS user_1" / "JOIN student_courses" -> alias and table names
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+AS\s+"?(\w+)"?)?', re.IGNORECASE)
+
+# A plain table scan: "SCAN user_1" (SQLite >= 3.36) or "SCAN TABLE user" (older)
+_TABLE_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(?: AS (\w+))?$')
+
+
+@contextmanager
+def capture_statements(engine):
+    """
+    Record every statement executed on engine inside the block.
+
+    Bulk statements run through executemany are skipped since they are
+    inserts with no plan worth checking.
+    """
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            captured.append(CapturedStatement(statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(engine, statement, parameters=()):
+    """Return the detail lines of SQLite's query plan for statement."""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def find_full_scans(engine, captured, tables, allow=()):
+    """
+    Explain each captured read and report plain scans of real tables.
+
+    :param engine: SQLite engine the statements ran on.
+    :param captured: Statements recorded by capture_statements().
+    :param tables: Names of the tables in the schema; scans of subqueries
+                   and other derived tables are not reported.
+    :param allow: Table names whose full scans are expected.
+    :return: A list of FullScan tuples, empty when every filter uses an index.
+    """
+    scans = []
+    seen = set()
+    for statement, parameters in captured:
+        if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            continue
+        if statement in seen:
+            continue
+        seen.add(statement)
+
+        aliases = {}
+        for table, alias in _TABLE_REF.findall(statement):
+            aliases[alias or table] = table
+
+        for detail in explain(engine, statement, parameters):
+            match = _TABLE_SCAN.match(detail)
+            if not match:
+                continue
+            table = aliases.get(match.group(1), match.group(1))
+            if table in tables and table not in allow:
+                scans.append(FullScan(table, detail, statement))
+    return scans
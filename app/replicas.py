@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""
+Read replica routing for the SodLat Edu Solution project.
+
+Replicas are ordinary SQLALCHEMY_BINDS entries listed in DATABASE_REPLICAS.
+During a GET, HEAD or OPTIONS request the session reads from one of them,
+picked once per request; everything else goes to the primary: other
+methods, flushes, INSERT/UPDATE/DELETE statements, the job worker and the
+CLI.
+
+Replicas lag behind the primary, so a client whose request committed a
+write gets a cookie keeping its reads on the primary for
+DATABASE_STICKY_SECONDS, long enough for the write to have replicated;
+the rest of the request that wrote reads from the primary as well.
+The cookie only ever makes reads more consistent, so it is not signed.
+
+A GET that writes through bulk mappings or a raw connection, which the
+session cannot tell from a read, should do so inside ``use_primary()``.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+READ_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class ReplicaRouter:
+    """Picks the replica serving each read-only request."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DATABASE_REPLICAS', [])
+        app.config.setdefault('DATABASE_STICKY_SECONDS', 10)
+        app.config.setdefault('DATABASE_STICKY_COOKIE', 'db_primary_until')
+        unknown = set(app.config['DATABASE_REPLICAS']) - set(app.config.get('SQLALCHEMY_BINDS') or ())
+        if unknown:
+            raise ValueError(f'DATABASE_REPLICAS names binds missing from SQLALCHEMY_BINDS: {sorted(unknown)}')
+        if app.config['DATABASE_REPLICAS']:
+            app.before_request(self._pick_replica)
+            app.after_request(self._stick_to_primary)
+
+    def _pick_replica(self):
+        config = current_app.config
+        if request.method not in READ_METHODS:
+            return
+        sticky_until = request.cookies.get(config['DATABASE_STICKY_COOKIE'], 0, type=float)
+        if sticky_until > time.time():
+            return
+        g.replica_bind = random.choice(config['DATABASE_REPLICAS'])
+
+    def _stick_to_primary(self, response):
+        if g.pop('wrote_primary', False):
+            seconds = current_app.config['DATABASE_STICKY_SECONDS']
+            response.set_cookie(
+                current_app.config['DATABASE_STICKY_COOKIE'], str(int(time.time() + seconds)),
+                max_age=seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+def current_replica():
+    """Bind key of the replica serving the current request, or None for the primary."""
+    if has_request_context():
+        return g.get('replica_bind')
+    return None
+
+
+@contextmanager
+def use_primary():
+    """Send every statement in the block to the primary, even during a GET."""
+    replica = g.pop('replica_bind', None) if has_request_context() else None
+    try:
+        yield
+    finally:
+        if replica is not None:
+            g.replica_bind = replica
+
+
+def note_primary_write():
+    """Keep the current client on the primary after a write committed on its behalf."""
+    if has_request_context():
+        g.wrote_primary = True
+        # The rest of the request reads its own write too
+        g.pop('replica_bind', None)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_flush(session, flush_context):
+    session.info['wrote_primary'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote_primary'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _remember_write(session):
+    if session.info.pop('wrote_primary', False):
+        note_primary_write()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_write(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('wrote_primary', None)
+
+
+replica_router = ReplicaRouter()
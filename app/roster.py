@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+"""
+Bulk roster import for the SodLat Edu Solution project.
+
+Reads a CSV or XLSX roster row by row, validates every row against the
+existing usernames and emails loaded once up front, hashes passwords in a
+process pool and inserts users and enrolments with executemany in chunked
+transactions. Problems are collected per row instead of aborting the run.
+
+Roster columns: ``username``, ``email``, ``role`` (student or parent),
+``password`` and optionally ``courses``, a ``;`` separated list of course
+IDs the student should be enrolled in.
+"""
+
+import csv
+import io
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from email_validator import validate_email, EmailNotValidError
+from sqlalchemy.exc import SQLAlchemyError
+from app.db import db
+from app.fragments import mark_changed
+from app.models import User, Course, student_courses, normalize_identifier
+from app.passwords import password_hasher
+
+try:
+    import openpyxl
+except ImportError:  # XLSX support is optional
+    openpyxl = None
+
+
+COLUMNS = ('username', 'email', 'role', 'password', 'courses')
+ROLES = ('student', 'parent')
+
+RowError = namedtuple('RowError', ['line', 'username', 'message'])
+
+RosterReport = namedtuple('RosterReport', ['created', 'enrolled', 'errors'])
+
+
+class RosterError(ValueError):
+    """Raised when a roster file cannot be read at all."""
+
+
+def read_roster(stream, filename):
+    """
+    Yield (line number, row dict) for each data row of a roster file.
+
+    :param stream: Binary file object positioned at the start of the file.
+    :param filename: Name of the uploaded file, used to pick the format.
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        if not reader.fieldnames or 'username' not in [name.strip().lower() for name in reader.fieldnames]:
+            raise RosterError('The roster must have a header row with a username column.')
+        for row in reader:
+            yield reader.line_num, {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+    elif extension == 'xlsx':
+        if openpyxl is None:
+            raise RosterError('XLSX rosters need the openpyxl package; upload a CSV file instead.')
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+        if 'username' not in header:
+            raise RosterError('The roster must have a header row with a username column.')
+        for line, values in enumerate(rows, start=2):
+            yield line, {key: str(value).strip() if value is not None else '' for key, value in zip(header, values)}
+        workbook.close()
+    else:
+        raise RosterError('Rosters must be CSV or XLSX files.')
+
+
+def _hash_passwords(passwords, pool):
+    hash_password = password_hasher.policy.hash
+    if pool is None:
+        return [hash_password(password) for password in passwords]
+    return list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // 32)))
+
+
+class RosterImporter:
+    """Validates roster rows and writes them in chunks for one teacher."""
+
+    def __init__(self, teacher_id, chunk_size=500, workers=None):
+        """
+        :param teacher_id: Teacher doing the import; enrolments are limited to their courses.
+        :param chunk_size: Number of users inserted per transaction.
+        :param workers: Password hashing processes; 0 hashes in this process,
+                        None uses one per CPU.
+        """
+        self.teacher_id = teacher_id
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.created = 0
+        self.enrolled = 0
+        self.errors = []
+
+        # One query each for everything validation needs
+        self.usernames = set()
+        self.emails = set()
+        for username, email in db.session.query(User.username_normalized, User.email_normalized):
+            self.usernames.add(username)
+            self.emails.add(email)
+        self.course_ids = {course_id for course_id, in db.session.query(Course.id).filter_by(teacher_id=teacher_id)}
+
+    def validate(self, line, row):
+        """Return a cleaned row ready for insertion, or record a RowError and return None."""
+        username = row.get('username', '')
+        email = row.get('email', '')
+        role = row.get('role', '').lower() or 'student'
+        password = row.get('password', '')
+
+        def error(message):
+            self.errors.append(RowError(line, username, message))
+
+        if not username or not email or not password:
+            return error('username, email and password are required.')
+        if role not in ROLES:
+            return error(f'Role must be one of: {", ".join(ROLES)}.')
+        try:
+            email = validate_email(email, check_deliverability=False).normalized
+        except EmailNotValidError as e:
+            return error(f'Invalid email: {e}')
+        if '@' in username:
+            return error('Usernames cannot contain @.')
+        if normalize_identifier(username) in self.usernames:
+            return error('Username is already taken.')
+        if normalize_identifier(email) in self.emails:
+            return error('Email is already registered.')
+
+        course_ids = set()
+        for value in filter(None, (part.strip() for part in row.get('courses', '').split(';'))):
+            if not value.isdigit() or int(value) not in self.course_ids:
+                return error(f'Unknown course {value!r}; only your own courses can be used.')
+            course_ids.add(int(value))
+        if course_ids and role != 'student':
+            return error('Only students can be enrolled in courses.')
+
+        # Reserve the identity so later rows in the same file are checked against it
+        self.usernames.add(normalize_identifier(username))
+        self.emails.add(normalize_identifier(email))
+        return {'line': line, 'username': username, 'email': email, 'role': role,
+                'password': password, 'course_ids': course_ids}
+
+    def run(self, rows):
+        """
+        Import (line, row) pairs as produced by read_roster.
+
+        :return: RosterReport with the number of users created, enrolments
+                 made and the list of RowError.
+        """
+        pool = ProcessPoolExecutor(self.workers) if self.workers != 0 else None
+        try:
+            chunk = []
+            for line, row in rows:
+                if not any(row.values()):
+                    continue
+                cleaned = self.validate(line, row)
+                if cleaned:
+                    chunk.append(cleaned)
+                if len(chunk) >= self.chunk_size:
+                    self.write(chunk, pool)
+                    chunk = []
+            if chunk:
+                self.write(chunk, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.errors.sort()
+        return RosterReport(self.created, self.enrolled, self.errors)
+
+    def write(self, chunk, pool):
+        """Insert one chunk of users and their enrolments in a single transaction."""
+        hashes = _hash_passwords([row['password'] for row in chunk], pool)
+        users = [{
+            'username': row['username'],
+            'username_normalized': normalize_identifier(row['username']),
+            'email': row['email'],
+            'email_normalized': normalize_identifier(row['email']),
+            'password_hash': password_hash,
+            'role': row['role'],
+            'is_teacher': False,
+            'is_parent': row['role'] == 'parent',
+            'is_student': row['role'] == 'student',
+        } for row, password_hash in zip(chunk, hashes)]
+        try:
+            db.session.execute(User.__table__.insert(), users)
+            ids = dict(db.session.query(User.username, User.id).filter(
+                User.username.in_([row['username'] for row in chunk])
+            ))
+            enrolments = [{'student_id': ids[row['username']], 'course_id': course_id}
+                          for row in chunk for course_id in sorted(row['course_ids'])]
+            if enrolments:
+                db.session.execute(student_courses.insert(), enrolments)
+            # Core inserts skip the flush events the fragment cache listens to
+            mark_changed(db.session, 'User')
+            db.session.commit()
+        except SQLAlchemyError:
+            # Most likely a concurrent registration took one of the names;
+            # fall back to one transaction per row to isolate it.
+            db.session.rollback()
+            if len(chunk) == 1:
+                self.errors.append(RowError(chunk[0]['line'], chunk[0]['username'], 'Could not be saved.'))
+                return
+            for row, user in zip(chunk, users):
+                self._write_one(row, user)
+            return
+        self.created += len(chunk)
+        self.enrolled += len(enrolments)
+
+    def _write_one(self, row, user):
+        try:
+            result = db.session.execute(User.__table__.insert(), user)
+            student_id = result.inserted_primary_key[0]
+            if row['course_ids']:
+                db.session.execute(student_courses.insert(), [
+                    {'student_id': student_id, 'course_id': course_id} for course_id in sorted(row['course_ids'])
+                ])
+            mark_changed(db.session, 'User')
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            self.errors.append(RowError(row['line'], row['username'], 'Username or email is already registered.'))
+            return
+        self.created += 1
+        self.enrolled += len(row['course_ids'])
+
+
+def import_roster(stream, filename, teacher_id, chunk_size=500, workers=None):
+    """
+    Import a roster file for a teacher.
+
+    :raises RosterError: If the file format is not supported or has no header.
+    :return: RosterReport.
+    """
+    importer = RosterImporter(teacher_id, chunk_size=chunk_size, workers=workers)
+    return importer.run(read_roster(stream, filename))
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+"""
+Read-only JSON API for the SodLat Edu Solution project.
+
+Serves the data behind the dashboards to polling clients under /api/v1.
+Every list is scoped to the logged in user and answered as
+``{"fields": [...], "rows": [[...], ...]}`` with no whitespace, so field
+names are sent once per response rather than once per row.
+
+Responses carry an ETag; a request whose If-None-Match still matches gets
+an empty 304 before anything is serialised. For versioned models the ETag
+comes from one aggregate over the version index and the IDs of the
+courses and students the user may see, so an unchanged list is answered
+without loading its rows, and ``?since=<cursor>`` returns only the rows
+changed after the ``cursor`` of an earlier response.
+"""
+
+import hashlib
+import json
+from datetime import date
+from flask import Blueprint, Response, make_response, request
+from flask_login import current_user, login_required
+from flask_restful import Api, Resource, abort
+from sqlalchemy import case, func
+from werkzeug.http import quote_etag
+from app.db import db
+from app.models import User, Course, Assignment, Progress, student_courses, settled_before
+
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+api = Api(api_bp)
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    """Compact JSON: no indentation or spaces after separators."""
+    response = make_response(json.dumps(data, separators=(',', ':'), default=_json_default), code)
+    response.headers.extend(headers or {})
+    return response
+
+
+# Helper function to scope queries to the current user
+def visible_student_ids():
+    """Subquery of the students whose records the current user may read, or None for teachers."""
+    if current_user.is_parent:
+        return db.session.query(User.id).filter_by(parent_id=current_user.id, is_student=True)
+    if current_user.is_student:
+        return db.session.query(User.id).filter_by(id=current_user.id)
+    return None
+
+
+# Helper function to scope queries to the current user
+def visible_course_ids():
+    """Subquery of the courses the current user teaches, attends or has a child in."""
+    if current_user.is_teacher:
+        return db.session.query(Course.id).filter_by(teacher_id=current_user.id)
+    return db.session.query(student_courses.c.course_id).filter(
+        student_courses.c.student_id.in_(visible_student_ids())
+    )
+
+
+class VersionedList(Resource):
+    """
+    A list endpoint answering conditional GETs.
+
+    Subclasses set ``fields`` and implement query() returning rows with
+    those columns in that order. With ``model`` set to a Versioned model,
+    the ETag and ``?since=`` use its version column.
+    """
+
+    method_decorators = [login_required]
+    fields = ()
+    model = None
+
+    def query(self):
+        """Return the query of the rows to list, with ``fields`` as its columns; implemented by subclasses."""
+
+    def scope(self):
+        """
+        Digest of the courses and students visible to the current user.
+
+        Part of versioned ETags: enrolments and parent links carry no
+        version, so a changed scope could otherwise leave the count and
+        highest version of the list as they were.
+        """
+        students = visible_student_ids()
+        ids = [sorted(course_id for course_id, in visible_course_ids())]
+        if students is not None:
+            ids.append(sorted(student_id for student_id, in students))
+        return hashlib.sha1(repr(ids).encode()).hexdigest()[:16]
+
+    def digest(self, rows):
+        """Digest of the raw row values, taken before any serialisation."""
+        return hashlib.sha1(repr([tuple(row) for row in rows]).encode()).hexdigest()
+
+    def get(self):
+        query = self.query()
+        rows = None
+        cursor = None
+        if self.model is None:
+            rows = query.all()
+            etag = self.digest(rows)
+        else:
+            since = request.args.get('since', 0, type=int)
+            if since:
+                query = query.filter(self.model.version > since).order_by(None).order_by(self.model.version)
+            # The count notices deletes, the highest version inserts and
+            # updates; the cursor stops at rows that may still be committing
+            count, latest, settled = query.order_by(None).with_entities(
+                func.count(), func.max(self.model.version),
+                func.max(case((self.model.updated_at < settled_before(), self.model.version)))
+            ).one()
+            cursor = max(settled or 0, since)
+            etag = f'{current_user.id}-{since}-{count}-{latest or since}-{self.scope()}'
+
+        headers = {'ETag': quote_etag(etag), 'Cache-Control': 'private, no-cache'}
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        if rows is None:
+            rows = query.all()
+        payload = {'fields': self.fields, 'rows': [list(row) for row in rows]}
+        if cursor is not None:
+            payload['cursor'] = cursor
+        return payload, 200, headers
+
+
+class CourseList(VersionedList):
+    fields = ('id', 'course', 'description', 'teacher_id', 'updated_at', 'version')
+    model = Course
+
+    def query(self):
+        return db.session.query(
+            Course.id, Course.course, Course.description, Course.teacher_id, Course.updated_at, Course.version
+        ).filter(
+            Course.id.in_(visible_course_ids())
+        ).order_by(Course.id)
+
+
+class AssignmentList(VersionedList):
+    fields = ('id', 'course_id', 'title', 'description', 'due_date', 'updated_at', 'version')
+    model = Assignment
+
+    def query(self):
+        query = db.session.query(
+            Assignment.id, Assignment.course_id, Assignment.title, Assignment.description, Assignment.due_date,
+            Assignment.updated_at, Assignment.version
+        ).filter(Assignment.course_id.in_(visible_course_ids()))
+        course_id = request.args.get('course_id', type=int)
+        if course_id is not None:
+            query = query.filter(Assignment.course_id == course_id)
+        return query.order_by(Assignment.due_date, Assignment.id)
+
+
+class ProgressList(VersionedList):
+    fields = ('id', 'student_id', 'course_id', 'grade', 'days_present', 'days_absent', 'overall_performance',
+              'updated_at', 'version')
+    model = Progress
+
+    def query(self):
+        query = db.session.query(
+            Progress.id, Progress.student_id, Progress.course_id, Progress.grade,
+            Progress.days_present, Progress.days_absent, Progress.overall_performance,
+            Progress.updated_at, Progress.version
+        )
+        students = visible_student_ids()
+        if students is None:
+            query = query.filter(Progress.course_id.in_(visible_course_ids()))
+        else:
+            query = query.filter(Progress.student_id.in_(students))
+        return query.order_by(Progress.id)
+
+
+class ChildList(VersionedList):
+    fields = ('id', 'username', 'email')
+
+    def query(self):
+        if not current_user.is_parent:
+            abort(403, message='Only parents have linked children.')
+        return db.session.query(User.id, User.username, User.email).filter_by(
+            parent_id=current_user.id, is_student=True
+        ).order_by(User.username)
+
+
+api.add_resource(CourseList, '/courses')
+api.add_resource(AssignmentList, '/assignments')
+api.add_resource(ProgressList, '/progress')
+api.add_resource(ChildList, '/children')
@@ -1,16 +1,59 @@
 #!/usr/bin/python3
 
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, login_required
 from flask import Blueprint
+from sqlalchemy.exc import SQLAlchemyError
 from app.forms import LoginForm, RegistrationForm
 from app.models import User
 from app.db import db
+from app.cache import identity_cache
+from app.passwords import password_hasher
+from app.metrics import metrics
 
 
 auth = Blueprint('auth', __name__)
 
 
+# Helper function to upgrade a hash made under older hashing settings
+def upgrade_password_hash(user, password):
+    """
+    Replace the user's hash with one made under the current policy.
+
+    Runs on the hashing pool (inline when there is none) while the login
+    response goes out, so the login does not pay for a second hash. The
+    update only applies if the stored hash is still the one just verified,
+    so a concurrent password change is never overwritten; a failure is
+    harmless as the old hash keeps working.
+
+    :return: The Future of the background upgrade, or None if it ran inline.
+    """
+    app = current_app._get_current_object()
+    user_id, old_hash = user.id, user.password_hash
+
+    def upgrade():
+        try:
+            User.query.filter_by(id=user_id, password_hash=old_hash).update(
+                {'password_hash': password_hasher.policy.hash(password)}, synchronize_session=False
+            )
+            db.session.commit()
+            identity_cache.invalidate(user_id)
+        except SQLAlchemyError:
+            db.session.rollback()
+
+    def upgrade_in_background():
+        with app.app_context():
+            try:
+                upgrade()
+            finally:
+                db.session.remove()
+
+    if password_hasher.executor is None:
+        upgrade()
+        return None
+    return password_hasher.executor.submit(upgrade_in_background)
+
+
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
     """
@@ -20,12 +63,12 @@ def login():
     """
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter(
-            (User.username == form.username_or_email.data) |
-            (User.email == form.username_or_email.data)
-        ).first()
+        user = User.find_by_identifier(form.username_or_email.data)
         if user and user.check_password(form.password.data):
+            if password_hasher.needs_rehash(user.password_hash):
+                upgrade_password_hash(user, form.password.data)
             login_user(user, remember=form.remember_me.data)
+            metrics.inc('logins_total', result='success')
             flash(f'Welcome, {user.username}!', 'success')
 
             # Redirect based on user role
@@ -39,6 +82,7 @@ def login():
                 return redirect(url_for('main.index'))
 
         else:
+            metrics.inc('logins_total', result='failure')
             flash('Invalid username/email or password.', 'danger')
     return render_template('login.html', title='Login', form=form)
 
@@ -71,6 +115,7 @@ def register():
         try:
             db.session.add(user)
             db.session.commit()
+            identity_cache.invalidate(user.id)
             flash('Your account has been created! You can now log in.', 'success')
             return redirect(url_for('auth.login'))
         except Exception as e:
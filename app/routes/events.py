@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""
+Server-Sent Events stream for the SodLat Edu Solution dashboards.
+
+The stream holds no database session or app context while it waits, only
+a bounded queue, so under a cooperative server (e.g. gunicorn with gevent
+workers) an idle connection costs a greenlet rather than a worker. Streams
+end after EVENTS_MAX_DURATION and browsers reconnect on their own.
+"""
+
+import json
+import time
+from flask import Blueprint, Response, current_app
+from flask_login import login_required
+from app.events import event_hub, course_channel, student_channel
+from app.routes.api import visible_course_ids, visible_student_ids
+
+
+events = Blueprint('events', __name__)
+
+
+# Helper function to pick the channels a user may follow
+def user_channels():
+    channels = [course_channel(course_id) for course_id, in visible_course_ids().distinct()]
+    students = visible_student_ids()
+    if students is not None:
+        channels += [student_channel(student_id) for student_id, in students]
+    return channels
+
+
+def event_stream(channels, keepalive, max_duration):
+    """
+    Yield SSE messages for channels until the queue overflows or max_duration passes.
+
+    Subscribes on the first iteration, so a response that is never read
+    leaves nothing behind.
+    """
+    deadline = time.monotonic() + max_duration
+    subscription = event_hub.subscribe(channels)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if subscription.overflowed:
+                # Events were dropped; the page has to be reloaded to catch up
+                yield 'event: resync\ndata: {}\n\n'
+                return
+            event = subscription.get(min(keepalive, remaining))
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            yield f'id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data, separators=(",", ":"))}\n\n'
+    finally:
+        subscription.close()
+
+
+@events.route('/events')
+@login_required
+def stream():
+    return Response(
+        event_stream(user_channels(), current_app.config['EVENTS_KEEPALIVE'], current_app.config['EVENTS_MAX_DURATION']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
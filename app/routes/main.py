@@ -3,29 +3,91 @@
 Main route module for the SodLat Edu Solution project.
 """
 
-import os
+import mimetypes
 from flask import (
-    Blueprint, render_template, url_for, flash, redirect, request, current_app
+    Blueprint, render_template, url_for, flash, redirect, request, current_app, abort, jsonify, send_file,
+    send_from_directory, stream_with_context
 )
 from flask_login import (
     current_user, login_required
 )
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 from werkzeug.utils import secure_filename
 from functools import wraps
 from app.db import db
+from app.cache import identity_cache
+from app.choices import course_choices
 from app.forms import (
-    CourseForm, AssignmentForm, ProgressForm, UserForm, LinkParentForm, AttendanceForm, AssignmentSubmissionForm
+    CourseForm, AssignmentForm, ProgressForm, UserForm, LinkParentForm, AttendanceForm, AssignmentSubmissionForm,
+    RosterImportForm, GradebookForm
 )
-from app.models import User, Course, Assignment, Progress, AssignmentSubmission
+from app.models import User, Course, Assignment, Progress, AssignmentSubmission, normalize_identifier
+from app.queries import load_parent_dashboard, load_student_dashboard, load_teacher_dashboard, list_users
+from app.fragments import LazyReadModel, bypass_fragment_cache
+from app.exports import stream_submissions_zip
+from app.gradebook import load_gradebook, save_gradebook
+from app.roster import COLUMNS as ROSTER_COLUMNS, RosterError, import_roster
+from app.sqlite import commit_write
+from app.storage import get_blob_store, register_blob
+from app.uploads import ChunkedUpload
 
 # Helper function for file uploads
 def save_assignment_file(submission_file):
-    """Helper function to save the uploaded assignment file."""
-    filename = secure_filename(submission_file.filename)
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-    submission_file.save(file_path)
-    return filename
+    """
+    Helper function to store the uploaded assignment file by content; returns its name, digest and size.
+
+    The caller registers the blob in the transaction adding the submission.
+    """
+    digest, size = get_blob_store().put_stream(submission_file.stream)
+    return secure_filename(submission_file.filename), digest, size
+
+# Types browsers can display inline; everything else is sent as an attachment
+INLINE_MIMETYPES = ('application/pdf', 'image/', 'video/')
+
+def send_submission_file(submission):
+    """
+    Helper function to send a submission file with ETag, conditional and Range support.
+
+    With SEND_FILE_ACCEL_PREFIX set, the transfer is handed to the front-end
+    server through X-Accel-Redirect; USE_X_SENDFILE is honoured by send_file.
+    """
+    filename = submission.submission_file
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    as_attachment = not mimetype.startswith(INLINE_MIMETYPES)
+
+    if submission.file_digest is None:
+        # Saved before content addressing, still in the flat upload folder
+        response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, mimetype=mimetype,
+                                       as_attachment=as_attachment, download_name=filename)
+    else:
+        store = get_blob_store()
+        if not store.exists(submission.file_digest):
+            abort(404)
+        accel_prefix = current_app.config.get('SEND_FILE_ACCEL_PREFIX')
+        if accel_prefix:
+            response = current_app.response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{store.relative_path(submission.file_digest)}"
+            response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline', filename=filename)
+            response.set_etag(submission.file_digest)
+            response.make_conditional(request)
+        else:
+            response = send_file(store.path(submission.file_digest), mimetype=mimetype, as_attachment=as_attachment,
+                                 download_name=filename, etag=submission.file_digest, conditional=True)
+
+    # Revalidate every time so access checks apply, but let browsers reuse their copy on 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+def can_view_submission(user, submission):
+    """Students see their own submissions, parents their children's, teachers those of their courses."""
+    return (
+        submission.student_id == user.id
+        or (user.is_teacher and submission.assignment.course.teacher_id == user.id)
+        or (user.is_parent and submission.student.parent_id == user.id)
+    )
 
 # Define the blueprint for the main routes
 main = Blueprint('main', __name__)
@@ -78,27 +140,31 @@ def parent_dashboard():
 
     if link_child_form.validate_on_submit():
         try:
-            child = User.query.filter_by(username=link_child_form.student_username.data, role='student').first()
+            child = User.query.filter_by(
+                username_normalized=normalize_identifier(link_child_form.student_username.data), role='student'
+            ).first()
             if child and child.parent_id is None:
-                child.parent_id = current_user.id
+                child.parent_id = child.validate_parent_id(current_user.id)
                 db.session.commit()
+                identity_cache.invalidate(child.id)
                 flash('Child linked successfully.', 'success')
                 return redirect(url_for('main.parent_dashboard'))
             else:
                 flash('Child not found or already linked.', 'danger')
+        except ValueError as e:
+            flash(str(e), 'danger')
         except SQLAlchemyError as e:
             db.session.rollback()
             flash(f'An error occurred: {e}', 'danger')
 
-    # Fetch linked children and their progress
-    children = User.query.filter_by(parent_id=current_user.id, is_student=True).all()
-    progress = {child.id: Progress.query.filter_by(student_id=child.id).all() for child in children}
+    # Linked children and their progress in a fixed number of queries,
+    # loaded only if the cached fragment has to be rendered again
+    dashboard = LazyReadModel(load_parent_dashboard, current_user.id)
 
     return render_template(
         'parent_dashboard.html',
         link_child_form=link_child_form,
-        children=children,
-        progress=progress
+        dashboard=dashboard
     )
 
 @main.route('/teacher_dashboard', methods=['GET', 'POST'])
@@ -114,9 +180,9 @@ def teacher_dashboard():
     # Handle course creation
     if course_form.validate_on_submit() and 'create_course' in request.form:
         try:
-            new_course = Course(course=course_form.course_name.data, description=course_form.description.data, teacher_id=current_user.id)
-            db.session.add(new_course)
-            db.session.commit()
+            name, description, teacher_id = course_form.course.data, course_form.description.data, current_user.id
+            commit_write(lambda: db.session.add(Course(course=name, description=description, teacher_id=teacher_id)))
+            course_choices.invalidate(current_user.id)
             flash('Course created successfully.', 'success')
             return redirect(url_for('main.teacher_dashboard'))
         except SQLAlchemyError:
@@ -130,14 +196,13 @@ def teacher_dashboard():
             if not course or course.teacher_id != current_user.id:
                 flash('Invalid course selected.', 'danger')
             else:
-                new_assignment = Assignment(
+                new_assignment = dict(
                     title=assignment_form.title.data,
                     description=assignment_form.description.data,
                     due_date=assignment_form.due_date.data,
                     course_id=course.id
                 )
-                db.session.add(new_assignment)
-                db.session.commit()
+                commit_write(lambda: db.session.add(Assignment(**new_assignment)))
                 flash('Assignment created successfully.', 'success')
                 return redirect(url_for('main.teacher_dashboard'))
         except SQLAlchemyError:
@@ -146,22 +211,24 @@ def teacher_dashboard():
 
     # Handle progress creation
     if progress_form.validate_on_submit() and 'create_progress' in request.form:
-        student = User.query.filter_by(username=progress_form.student_name.data, role='student').first()
+        student = User.query.filter_by(
+            username_normalized=normalize_identifier(progress_form.student_name.data), role='student'
+        ).first()
         course = progress_form.course_id.data
         if not student:
             flash('Student not found.', 'danger')
         else:
             try:
-                new_progress = Progress(
+                new_progress = dict(
                     student_id=student.id,
                     course_id=course.id,
                     grade=progress_form.grade.data,
                     days_present=progress_form.days_present.data,
                     days_absent=progress_form.days_absent.data,
-                    overall_performance=progress_form.overall_performance.data
+                    overall_performance=progress_form.overall_performance.data,
+                    teacher_id=current_user.id
                 )
-                db.session.add(new_progress)
-                db.session.commit()
+                commit_write(lambda: db.session.add(Progress(**new_progress)))
                 flash('Progress recorded successfully.', 'success')
                 return redirect(url_for('main.teacher_dashboard'))
             except SQLAlchemyError:
@@ -181,6 +248,7 @@ def teacher_dashboard():
             user.role = 'teacher' if user.is_teacher else 'parent' if user.is_parent else 'student'
             try:
                 db.session.commit()
+                identity_cache.invalidate(user.id)
                 flash('User updated successfully.', 'success')
                 return redirect(url_for('main.teacher_dashboard'))
             except SQLAlchemyError:
@@ -189,41 +257,34 @@ def teacher_dashboard():
         else:
             flash('User not found.', 'danger')
 
-    # Retrieve courses and users
-    courses = Course.query.filter_by(teacher_id=current_user.id).all()
-    users = User.query.filter(User.role.in_(['parent', 'student'])).all()
+    # Courses with their assignments, loaded on a fragment cache miss; the
+    # user list is fetched page by page from teacher_users
+    dashboard = LazyReadModel(load_teacher_dashboard, current_user.id)
 
     return render_template(
         'teacher_dashboard.html',
         title='Teacher Dashboard',
-        courses=courses,
+        dashboard=dashboard,
         assignment_form=assignment_form,
         course_form=course_form,
         progress_form=progress_form,
         attendance_form=attendance_form,
-        user_form=user_form,
-        users=users
+        user_form=user_form
     )
 
 @main.route('/student_dashboard', methods=['GET', 'POST'])
 @login_required
 @roles_required('is_student')
 def student_dashboard():
-    # Get all courses the student is enrolled in
-    enrolled_courses = current_user.enrolled_courses
-
-    # Fetch assignments for all enrolled courses
-    assignments = Assignment.query.filter(Assignment.course_id.in_([course.id for course in enrolled_courses])).all()
-
-    # Fetch progress reports for the student
-    progress = Progress.query.filter_by(student_id=current_user.id).all()
+    # Enrolled courses, their assignments and progress reports in a fixed
+    # number of queries, loaded on a fragment cache miss
+    dashboard = LazyReadModel(load_student_dashboard, current_user.id)
 
     return render_template(
         'student_dashboard.html',
         title='Student Dashboard',
-        enrolled_courses=enrolled_courses,
-        assignments=assignments,
-        progress=progress
+        form=AssignmentSubmissionForm(),
+        dashboard=dashboard
     )
 
 
@@ -235,16 +296,35 @@ def submit_assignment(assignment_id):
     form = AssignmentSubmissionForm()
 
     if form.validate_on_submit():
+        upload = None
+        if form.upload_id.data:
+            upload = ChunkedUpload.load(current_app.config['UPLOAD_FOLDER'], form.upload_id.data, current_user.id)
+            if upload is None or not upload.manifest['result']:
+                flash('The uploaded file could not be found. Please upload it again.', 'danger')
+                return redirect(url_for('main.student_dashboard'))
         try:
-            filename = save_assignment_file(form.submission_file.data) if form.submission_file.data else None
-            new_submission = AssignmentSubmission(
-                submission_content=form.submission_content.data,
-                submission_file=filename,
-                student_id=current_user.id,
-                assignment_id=assignment.id
-            )
-            db.session.add(new_submission)
-            db.session.commit()
+            filename = digest = size = None
+            if upload:
+                result = upload.manifest['result']
+                filename, digest, size = result['filename'], result['sha256'], result['size']
+            elif form.submission_file.data:
+                filename, digest, size = save_assignment_file(form.submission_file.data)
+            content, student_id = form.submission_content.data, current_user.id
+
+            def save():
+                if digest:
+                    register_blob(digest, size)
+                db.session.add(AssignmentSubmission(
+                    submission_content=content,
+                    submission_file=filename,
+                    file_digest=digest,
+                    student_id=student_id,
+                    assignment_id=assignment_id
+                ))
+
+            commit_write(save)
+            if upload:
+                upload.discard()
             flash('Assignment submitted successfully.', 'success')
             return redirect(url_for('main.student_dashboard'))
         except SQLAlchemyError:
@@ -252,16 +332,150 @@ def submit_assignment(assignment_id):
             flash('An error occurred while submitting the assignment.', 'danger')
 
     # Since this form is part of the student dashboard, I render the student_dashboard template directly
-    enrolled_courses = current_user.enrolled_courses
-    assignments = Assignment.query.filter(Assignment.course_id.in_([course.id for course in enrolled_courses])).all()
-    progress = Progress.query.filter_by(student_id=current_user.id).all()
+    # The fragments would show the submitted form, so they are not cached
+    bypass_fragment_cache()
+    dashboard = LazyReadModel(load_student_dashboard, current_user.id)
 
     return render_template(
         'student_dashboard.html',
         title='Student Dashboard',
         form=form,
         assignment=assignment,
-        enrolled_courses=enrolled_courses,
-        assignments=assignments,
-        progress=progress
+        dashboard=dashboard
+    )
+
+
+@main.route('/teacher_dashboard/users')
+@login_required
+@roles_required('is_teacher')
+def teacher_users():
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+    page = list_users(
+        ('parent', 'student'),
+        search=request.args.get('q', '').strip() or None,
+        after=request.args.get('after') or None,
+        limit=limit
+    )
+    return jsonify(
+        users=[user._asdict() for user in page.users],
+        next=page.next_cursor
+    )
+
+
+@main.route('/teacher_dashboard/roster', methods=['GET', 'POST'])
+@login_required
+@roles_required('is_teacher')
+def roster_import():
+    form = RosterImportForm()
+    report = None
+    if form.validate_on_submit():
+        roster_file = form.roster_file.data
+        try:
+            report = import_roster(
+                roster_file.stream, roster_file.filename, current_user.id,
+                chunk_size=current_app.config['ROSTER_CHUNK_SIZE'],
+                workers=current_app.config['ROSTER_HASH_WORKERS']
+            )
+        except RosterError as e:
+            flash(str(e), 'danger')
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            flash(f'Error importing roster: {str(e)}', 'danger')
+        else:
+            category = 'warning' if report.errors else 'success'
+            flash(f'{report.created} users created, {report.enrolled} enrolments added, '
+                  f'{len(report.errors)} rows skipped.', category)
+
+    return render_template(
+        'roster_import.html',
+        title='Import Roster',
+        form=form,
+        columns=ROSTER_COLUMNS,
+        report=report
+    )
+
+
+@main.route('/courses/<int:course_id>/gradebook', methods=['GET', 'POST'])
+@login_required
+@roles_required('is_teacher')
+def gradebook(course_id):
+    course = Course.query.get_or_404(course_id)
+    if course.teacher_id != current_user.id:
+        abort(404)
+
+    if request.method == 'POST':
+        form = GradebookForm()
+        if form.validate_on_submit():
+            try:
+                result = save_gradebook(course, current_user.id, form.entries)
+            except SQLAlchemyError:
+                db.session.rollback()
+                flash('An error occurred while saving the gradebook.', 'danger')
+            else:
+                if not result.errors:
+                    flash(f'Gradebook saved: {result.created} added, {result.updated} updated.', 'success')
+                    return redirect(url_for('main.gradebook', course_id=course.id))
+                for index, message in result.errors.items():
+                    form.entries[index].student_name.errors.append(message)
+                flash('Nothing was saved; fix the highlighted rows.', 'danger')
+    else:
+        form = GradebookForm(data={'entries': load_gradebook(course.id)})
+
+    return render_template(
+        'gradebook.html',
+        title='Gradebook',
+        course=course,
+        form=form
+    )
+
+
+@main.route('/assignments/<int:assignment_id>/submissions')
+@login_required
+@roles_required('is_teacher')
+def assignment_submissions(assignment_id):
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
+    if assignment.course.teacher_id != current_user.id:
+        abort(404)
+
+    submissions = AssignmentSubmission.query.options(
+        joinedload(AssignmentSubmission.student)
+    ).filter_by(assignment_id=assignment.id).order_by(AssignmentSubmission.submission_date).all()
+
+    return render_template(
+        'assignment_submissions.html',
+        title='Submissions',
+        assignment=assignment,
+        submissions=submissions
     )
+
+
+@main.route('/assignments/<int:assignment_id>/submissions.zip')
+@login_required
+@roles_required('is_teacher')
+def export_submissions(assignment_id):
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
+    if assignment.course.teacher_id != current_user.id:
+        abort(404)
+
+    # Streamed member by member; nothing is buffered beyond one file block
+    archive = stream_submissions_zip(assignment.id, get_blob_store(), current_app.config['UPLOAD_FOLDER'])
+    response = current_app.response_class(stream_with_context(archive), mimetype='application/zip')
+    filename = secure_filename(f'{assignment.course.course}-{assignment.title}-submissions.zip')
+    response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+
+@main.route('/submissions/<int:submission_id>/file')
+@login_required
+def download_submission(submission_id):
+    submission = AssignmentSubmission.query.options(
+        joinedload(AssignmentSubmission.assignment).joinedload(Assignment.course),
+        joinedload(AssignmentSubmission.student)
+    ).filter_by(id=submission_id).first_or_404()
+
+    # Unauthorised users get the same answer as for a missing file
+    if not submission.submission_file or not can_view_submission(current_user, submission):
+        abort(404)
+    return send_submission_file(submission)
@@ -0,0 +1,21 @@
+#!/usr/bin/python3
+"""
+Prometheus metrics endpoint for the SodLat Edu Solution project.
+
+Only registered with METRICS_ENABLED. Scrapers authenticate with
+``Authorization: Bearer <METRICS_TOKEN>`` when a token is configured; the
+endpoint is open otherwise, so keep it off the public network.
+"""
+
+from flask import Blueprint, Response, abort
+from app.metrics import metrics, metrics_authorized
+
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics')
+def export_metrics():
+    if not metrics_authorized():
+        abort(401)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
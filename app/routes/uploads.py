@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+"""
+Chunked upload routes for the SodLat Edu Solution project.
+
+JSON endpoints used by the student dashboard to send large submission
+files in resumable chunks before submitting the assignment form.
+"""
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy.exc import SQLAlchemyError
+from app.db import db
+from app.jobs import enqueue
+from app.metrics import metrics
+from app.routes.main import roles_required
+from app.uploads import ChunkedUpload, UploadError
+
+
+uploads = Blueprint('uploads', __name__, url_prefix='/uploads')
+
+
+def get_upload_or_404(upload_id):
+    upload = ChunkedUpload.load(current_app.config['UPLOAD_FOLDER'], upload_id, current_user.id)
+    if upload is None:
+        return None, (jsonify(error='Upload not found.'), 404)
+    return upload, None
+
+
+def upload_status(upload):
+    return {
+        'upload_id': upload.upload_id,
+        'filename': upload.manifest['filename'],
+        'size': upload.manifest['size'],
+        'chunk_size': upload.manifest['chunk_size'],
+        'chunks': upload.manifest['chunks'],
+        'received': upload.received(),
+        'result': upload.manifest['result'],
+        'error': upload.manifest.get('error'),
+    }
+
+
+@uploads.route('', methods=['POST'])
+@login_required
+@roles_required('is_student')
+def create_upload():
+    """
+    Open a chunked upload.
+
+    Expects a JSON body with ``filename``, ``size`` and optionally the
+    ``sha256`` of the whole file.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = ChunkedUpload.create(
+            current_app.config['UPLOAD_FOLDER'],
+            owner_id=current_user.id,
+            filename=data.get('filename'),
+            size=data.get('size'),
+            chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'],
+            max_size=current_app.config['UPLOAD_MAX_FILE_SIZE'],
+            allowed_extensions=current_app.config['UPLOAD_ALLOWED_EXTENSIONS'],
+            sha256=data.get('sha256')
+        )
+    except UploadError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(upload_status(upload)), 201
+
+
+@uploads.route('/<upload_id>', methods=['GET'])
+@login_required
+@roles_required('is_student')
+def show_upload(upload_id):
+    """Report which chunks have been received, so an interrupted client can resume."""
+    upload, error = get_upload_or_404(upload_id)
+    if error:
+        return error
+    return jsonify(upload_status(upload))
+
+
+@uploads.route('/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+@roles_required('is_student')
+def put_chunk(upload_id, index):
+    """
+    Store one chunk sent as the raw request body.
+
+    An ``X-Chunk-Sha256`` header, when present, is checked against the data.
+    """
+    upload, error = get_upload_or_404(upload_id)
+    if error:
+        return error
+    try:
+        sha256 = upload.write_chunk(index, request.stream, request.headers.get('X-Chunk-Sha256'))
+    except UploadError as e:
+        return jsonify(error=str(e)), 400
+    metrics.inc('upload_bytes_total', upload.expected_chunk_size(index))
+    return jsonify(index=index, sha256=sha256)
+
+
+@uploads.route('/<upload_id>/complete', methods=['POST'])
+@login_required
+@roles_required('is_student')
+def complete_upload(upload_id):
+    """
+    Queue the assembly of the received chunks into the final file.
+
+    Answers 202 while the job is pending; the client polls the upload
+    until it reports a result or an error.
+    """
+    upload, error = get_upload_or_404(upload_id)
+    if error:
+        return error
+    if not upload.manifest['result'] and not upload.manifest.get('queued'):
+        missing = upload.missing()
+        if missing:
+            return jsonify(error=f'Missing chunks: {missing[:20]}'), 400
+        upload.manifest['queued'] = True
+        upload.manifest['error'] = None
+        upload.save_manifest()
+        try:
+            enqueue('uploads.complete', upload_id=upload.upload_id, owner_id=current_user.id)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            upload.manifest['queued'] = False
+            upload.save_manifest()
+            return jsonify(error='The upload could not be queued. Please try again.'), 503
+        except Exception:
+            # Only an eagerly run task gets here; never leave the upload queued
+            db.session.rollback()
+            current_app.logger.exception('Could not complete upload %s', upload.upload_id)
+            upload.manifest['queued'] = False
+            upload.manifest['error'] = 'The file could not be assembled. Please try again.'
+            upload.save_manifest()
+            return jsonify(upload_status(upload)), 500
+        upload, error = get_upload_or_404(upload_id)
+        if error:
+            return error
+    if upload.manifest.get('error'):
+        return jsonify(upload_status(upload)), 400
+    return jsonify(upload_status(upload)), 200 if upload.manifest['result'] else 202
+
+
+@uploads.route('/<upload_id>', methods=['DELETE'])
+@login_required
+@roles_required('is_student')
+def delete_upload(upload_id):
+    """Abandon an upload and free its staging space."""
+    upload, error = get_upload_or_404(upload_id)
+    if error:
+        return error
+    upload.discard()
+    return '', 204
@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+"""
+Synthetic school data for the SodLat Edu Solution project.
+
+``seed_school`` bulk inserts teachers, courses, assignments, students with
+their parents, enrolments, submissions and progress reports at any scale,
+so dashboards and benchmarks can be measured against realistic volumes
+instead of the handful of rows the tests use. Rows are written with Core
+executemany in chunks of students, one transaction per chunk.
+
+Every user gets the same password, hashed once. Generated usernames start
+with a prefix so a seeded school can be told apart from real accounts.
+Primary keys are handed out from the current maximum, so the database must
+not be written by anything else while seeding.
+"""
+
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.db import db
+from app.fragments import mark_changed
+from app.models import (
+    User, Course, Assignment, AssignmentSubmission, Progress, student_courses, allocate_versions, normalize_identifier
+)
+from app.passwords import password_hasher
+
+
+SeedReport = namedtuple('SeedReport', [
+    'teachers', 'parents', 'students', 'courses', 'enrolments', 'assignments', 'submissions', 'progress'
+])
+
+SUBJECTS = ('Algebra', 'Geometry', 'Biology', 'Chemistry', 'Physics', 'History', 'Geography', 'Literature',
+            'French', 'Spanish', 'Art', 'Music', 'Computer Science', 'Economics', 'Civics')
+
+GRADES = ('A', 'A', 'B', 'B', 'B', 'C', 'C', 'D', 'F')
+
+
+class SeedError(Exception):
+    """The school cannot be generated as requested."""
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _user(user_id, prefix, role, number, password_hash, parent_id=None):
+    username = f'{prefix}-{role}-{number:06d}'
+    email = f'{username}@example.com'
+    return {
+        'id': user_id,
+        'username': username,
+        'username_normalized': normalize_identifier(username),
+        'email': email,
+        'email_normalized': normalize_identifier(email),
+        'password_hash': password_hash,
+        'role': role,
+        'parent_id': parent_id,
+        'is_teacher': role == 'teacher',
+        'is_parent': role == 'parent',
+        'is_student': role == 'student',
+    }
+
+
+# Helper function to insert rows of a versioned table with fresh versions
+def _insert_versioned(model, rows):
+    if not rows:
+        return
+    for row, version in zip(rows, allocate_versions(db.session.connection(), model.__table__, len(rows))):
+        row['version'] = version
+    db.session.execute(model.__table__.insert(), rows)
+
+
+def seed_school(students=1000, students_per_course=30, courses_per_student=5, courses_per_teacher=3,
+                assignments_per_course=8, submission_rate=0.5, parent_rate=0.8, password='password',
+                prefix='seed', chunk_size=1000, seed=0, progress=None):
+    """
+    Generate a school and commit it.
+
+    :param students: Number of students.
+    :param students_per_course: Average class size, which sets the number of courses.
+    :param courses_per_student: Courses each student is enrolled in.
+    :param courses_per_teacher: Courses taught by each teacher.
+    :param assignments_per_course: Assignments set in every course.
+    :param submission_rate: Share of their assignments each student has submitted.
+    :param parent_rate: Share of students with a parent account; siblings share one.
+    :param password: Password of every generated user.
+    :param prefix: Prefix of the generated usernames.
+    :param chunk_size: Students written per transaction.
+    :param seed: Seed of the random generator, for repeatable schools.
+    :param progress: Optional callable receiving the number of students written so far.
+    :return: A SeedReport with the number of rows of each kind.
+    """
+    if User.query.filter(User.username_normalized.like(f'{normalize_identifier(prefix)}-%')).first():
+        raise SeedError(f'Users named {prefix}-* already exist; choose another prefix.')
+    if students < 1 or courses_per_student < 1:
+        raise SeedError('A school needs students, each taking at least one course.')
+
+    rng = random.Random(seed)
+    password_hash = password_hasher.hash(password)
+    now = datetime.utcnow()
+    course_count = max(courses_per_student, -(-students * courses_per_student // students_per_course))
+    teacher_count = -(-course_count // courses_per_teacher)
+
+    next_user = _next_id(User)
+    teachers = [_user(next_user + i, prefix, 'teacher', i + 1, password_hash) for i in range(teacher_count)]
+    next_user += teacher_count
+    db.session.execute(User.__table__.insert(), teachers)
+
+    first_course = _next_id(Course)
+    courses = [{
+        'id': first_course + i,
+        'course': f'{SUBJECTS[i % len(SUBJECTS)]} {i // len(SUBJECTS) + 1}',
+        'description': f'Synthetic course {i + 1}.',
+        'teacher_id': teachers[i // courses_per_teacher]['id'],
+    } for i in range(course_count)]
+    _insert_versioned(Course, courses)
+
+    first_assignment = _next_id(Assignment)
+    assignments = [{
+        'id': first_assignment + i * assignments_per_course + j,
+        'title': f'Assignment {j + 1}',
+        'description': 'Synthetic assignment.',
+        'due_date': now + timedelta(days=7 * (j - assignments_per_course // 2)),
+        'course_id': course['id'],
+    } for i, course in enumerate(courses) for j in range(assignments_per_course)]
+    _insert_versioned(Assignment, assignments)
+    mark_changed(db.session, 'User', 'Course', 'Assignment')
+    db.session.commit()
+
+    counts = dict(parents=0, enrolments=0, submissions=0, progress=0)
+    parent_number = 0
+    siblings_left = 0
+    parent_id = None
+    for start in range(0, students, chunk_size):
+        parents, users, enrolments, submissions, reports = [], [], [], [], []
+        for number in range(start + 1, min(start + chunk_size, students) + 1):
+            if siblings_left:
+                siblings_left -= 1
+            elif rng.random() < parent_rate:
+                parent_number += 1
+                parent_id = next_user
+                next_user += 1
+                parents.append(_user(parent_id, prefix, 'parent', parent_number, password_hash))
+                siblings_left = rng.choice((0, 0, 0, 1, 1, 2))
+            else:
+                parent_id = None
+            student_id = next_user
+            next_user += 1
+            users.append(_user(student_id, prefix, 'student', number, password_hash, parent_id))
+
+            for index in rng.sample(range(course_count), courses_per_student):
+                course = courses[index]
+                enrolments.append({'student_id': student_id, 'course_id': course['id']})
+                reports.append({
+                    'student_id': student_id,
+                    'course_id': course['id'],
+                    'teacher_id': course['teacher_id'],
+                    'grade': rng.choice(GRADES),
+                    'days_present': rng.randint(60, 90),
+                    'days_absent': rng.randint(0, 10),
+                    'overall_performance': 'Synthetic report.',
+                })
+                for j in range(assignments_per_course):
+                    if rng.random() < submission_rate:
+                        assignment = assignments[index * assignments_per_course + j]
+                        submissions.append({
+                            'submission_content': f'Answer of student {number}.',
+                            'submission_date': assignment['due_date'] - timedelta(hours=rng.randint(1, 72)),
+                            'student_id': student_id,
+                            'assignment_id': assignment['id'],
+                        })
+
+        if parents:
+            db.session.execute(User.__table__.insert(), parents)
+        db.session.execute(User.__table__.insert(), users)
+        db.session.execute(student_courses.insert(), enrolments)
+        _insert_versioned(AssignmentSubmission, submissions)
+        _insert_versioned(Progress, reports)
+        # Core inserts skip the flush events the fragment cache listens to
+        mark_changed(db.session, 'User', 'AssignmentSubmission', 'Progress')
+        db.session.commit()
+
+        counts['parents'] += len(parents)
+        counts['enrolments'] += len(enrolments)
+        counts['submissions'] += len(submissions)
+        counts['progress'] += len(reports)
+        if progress is not None:
+            progress(start + len(users))
+
+    return SeedReport(
+        teachers=teacher_count, parents=counts['parents'], students=students, courses=course_count,
+        enrolments=counts['enrolments'], assignments=len(assignments), submissions=counts['submissions'],
+        progress=counts['progress']
+    )
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+"""
+SQLite deployment profile for the SodLat Edu Solution project.
+
+Small schools run on a single SQLite file. Every new connection to a file
+database gets SQLITE_PRAGMAS, which defaults to DEFAULT_PRAGMAS:
+write-ahead logging so readers never block the writer,
+``synchronous=NORMAL`` (safe with WAL, fsyncing only at checkpoints), a
+larger page cache, memory mapped reads and a busy timeout so a writer
+waits for the lock instead of failing with "database is locked".
+
+SQLite still allows one writer at a time. With DB_SERIAL_WRITER set, the
+small writes of the submission and teacher forms are handed to a single
+writer thread per process through ``commit_write``; it commits the writes
+queued within DB_WRITER_BATCH_WAIT seconds together, so concurrent
+requests share one transaction and one sync instead of queueing on the
+lock. A request gives up on a write that has not run after
+DB_WRITER_TIMEOUT seconds, and a writer thread that died is replaced by
+the next write. Run ``flask bench writes`` to compare the modes on a
+scratch file.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from functools import partial
+from sqlalchemy import event, exc
+from app.db import db
+from app.replicas import note_primary_write
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,  # ms
+}
+
+
+def _apply_pragmas(pragmas, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+class SQLiteProfile:
+    """Applies SQLITE_PRAGMAS to the connections of SQLite file databases."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+        pragmas = app.config['SQLITE_PRAGMAS']
+        if not pragmas:
+            return
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+            engine = db.get_engine(app, bind)
+            if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+                event.listen(engine, 'connect', partial(_apply_pragmas, dict(pragmas)))
+
+
+class SerialWriter:
+    """
+    One thread committing queued writes in batches.
+
+    Each write is a function adding or changing rows through db.session on
+    the writer thread. When a batch fails, its writes are retried one per
+    transaction so only the failing one reports the error.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 50
+        self.batch_wait = 0.002
+        self.timeout = 30
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DB_SERIAL_WRITER', False)
+        app.config.setdefault('DB_WRITER_BATCH_SIZE', 50)
+        app.config.setdefault('DB_WRITER_BATCH_WAIT', 0.002)
+        app.config.setdefault('DB_WRITER_TIMEOUT', 30)
+        self.stop()
+        self.app = app if app.config['DB_SERIAL_WRITER'] else None
+        self.batch_size = app.config['DB_WRITER_BATCH_SIZE']
+        self.batch_wait = app.config['DB_WRITER_BATCH_WAIT']
+        self.timeout = app.config['DB_WRITER_TIMEOUT']
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def submit(self, fn):
+        """Queue fn and return a Future of its result."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is not None:
+                    logger.error('The database writer thread died, starting a new one')
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def stop(self):
+        """Finish the queued writes and stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        with self.app.app_context():
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.batch_wait
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                # Writes whose request gave up waiting are dropped
+                batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+                if batch:
+                    self._write(batch)
+                db.session.remove()
+
+    def _write(self, batch):
+        try:
+            results = [fn() for fn, _ in batch]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            logger.info('Batch of %d writes failed, retrying them one by one', len(batch))
+            for item in batch:
+                self._write([item])
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def commit_write(fn):
+    """
+    Run fn, which adds or changes rows through db.session, and commit it.
+
+    With the serial writer enabled fn runs on the writer thread, batched
+    with other writes, so it must not use the request or current_user and
+    should return plain values rather than ORM objects. Errors raised by fn
+    or the commit are raised here either way. A write that has not started
+    within DB_WRITER_TIMEOUT raises sqlalchemy.exc.TimeoutError and is
+    never run; one that started by then is waited for.
+    """
+    if not serial_writer.enabled:
+        result = fn()
+        db.session.commit()
+        return result
+    future = serial_writer.submit(fn)
+    try:
+        result = future.result(timeout=serial_writer.timeout)
+    except TimeoutError:
+        if future.cancel():
+            raise exc.TimeoutError(f'The database writer did not take the write within {serial_writer.timeout}s.')
+        result = future.result()
+    note_primary_write()
+    return result
+
+
+sqlite_profile = SQLiteProfile()
+serial_writer = SerialWriter()
@@ -0,0 +1,86 @@
+/* static/js/chunked_upload.js */
+
+/* Send large submission files through the resumable /uploads endpoints */
+document.addEventListener('DOMContentLoaded', function () {
+
+    async function sha256Hex(blob) {
+        const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function request(url, options) {
+        const response = await fetch(url, Object.assign({ credentials: 'same-origin' }, options));
+        const data = response.status === 204 ? {} : await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || 'Upload failed.');
+        }
+        return data;
+    }
+
+    // Upload the file chunk by chunk, skipping chunks the server already has
+    async function uploadInChunks(baseUrl, file, button) {
+        const upload = await request(baseUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        const uploadUrl = baseUrl + '/' + upload.upload_id;
+
+        for (let index = 0; index < upload.chunks; index++) {
+            const chunk = file.slice(index * upload.chunk_size, (index + 1) * upload.chunk_size);
+            const checksum = await sha256Hex(chunk);
+            for (let attempt = 1; ; attempt++) {
+                try {
+                    await request(uploadUrl + '/chunks/' + index, {
+                        method: 'PUT',
+                        headers: { 'X-Chunk-Sha256': checksum },
+                        body: chunk
+                    });
+                    break;
+                } catch (error) {
+                    if (attempt >= 3) {
+                        throw error;
+                    }
+                }
+            }
+            button.textContent = 'Uploading… ' + Math.round(100 * (index + 1) / upload.chunks) + '%';
+        }
+
+        // The file is assembled by a background job; wait for it
+        let status = await request(uploadUrl + '/complete', { method: 'POST' });
+        button.textContent = 'Processing…';
+        while (!status.result) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            status = await request(uploadUrl);
+            if (status.error) {
+                throw new Error(status.error);
+            }
+        }
+        return upload.upload_id;
+    }
+
+    document.querySelectorAll('form.chunked-upload-form').forEach(form => {
+        form.addEventListener('submit', async function (event) {
+            const fileInput = form.querySelector('input[type="file"]');
+            const threshold = parseInt(form.dataset.chunkThreshold, 10);
+            if (!fileInput || !fileInput.files.length || fileInput.files[0].size <= threshold) {
+                return;
+            }
+
+            event.preventDefault();
+            const button = form.querySelector('button[type="submit"]');
+            const label = button.textContent;
+            button.disabled = true;
+            try {
+                const uploadId = await uploadInChunks(form.dataset.uploadUrl, fileInput.files[0], button);
+                form.querySelector('input[name="upload_id"]').value = uploadId;
+                fileInput.value = '';
+                form.submit();
+            } catch (error) {
+                alert(error.message);
+                button.disabled = false;
+                button.textContent = label;
+            }
+        });
+    });
+});
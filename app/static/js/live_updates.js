@@ -0,0 +1,28 @@
+/* static/js/live_updates.js */
+
+/* Tell the user when new assignments or grades arrive while a dashboard is open */
+document.addEventListener('DOMContentLoaded', function () {
+
+    const banner = document.querySelector('.live-updates');
+    if (!banner || !window.EventSource) {
+        return;
+    }
+    const message = banner.querySelector('.live-updates-message');
+    const source = new EventSource(banner.dataset.url);
+
+    function show(text) {
+        message.textContent = text;
+        banner.hidden = false;
+    }
+
+    source.addEventListener('assignment', function (event) {
+        const assignment = JSON.parse(event.data);
+        show('New assignment: ' + assignment.title);
+    });
+    source.addEventListener('progress', function () {
+        show('A progress report was updated.');
+    });
+    source.addEventListener('resync', function () {
+        show('There are new updates.');
+    });
+});
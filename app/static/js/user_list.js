@@ -0,0 +1,54 @@
+/* static/js/user_list.js */
+
+/* Page through parents and students on the teacher dashboard */
+document.addEventListener('DOMContentLoaded', function () {
+
+    document.querySelectorAll('.user-list').forEach(function (container) {
+        const rows = container.querySelector('.user-list-rows');
+        const search = container.querySelector('.user-list-search');
+        const more = container.querySelector('.user-list-more');
+        let cursor = null;
+        let generation = 0;
+        let timer = null;
+
+        function addRow(user) {
+            const row = document.createElement('tr');
+            [user.username, user.email, user.role].forEach(function (value) {
+                const cell = document.createElement('td');
+                cell.textContent = value;
+                row.appendChild(cell);
+            });
+            rows.appendChild(row);
+        }
+
+        async function loadPage(reset) {
+            const current = reset ? ++generation : generation;
+            const params = new URLSearchParams();
+            if (search.value.trim()) {
+                params.set('q', search.value.trim());
+            }
+            if (!reset && cursor) {
+                params.set('after', cursor);
+            }
+            const response = await fetch(container.dataset.url + '?' + params, { credentials: 'same-origin' });
+            if (!response.ok || current !== generation) {
+                return;  // failed, or superseded by a newer search
+            }
+            const page = await response.json();
+            if (reset) {
+                rows.replaceChildren();
+            }
+            page.users.forEach(addRow);
+            cursor = page.next;
+            more.hidden = !cursor;
+        }
+
+        search.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { loadPage(true); }, 250);
+        });
+        more.addEventListener('click', function () { loadPage(false); });
+
+        loadPage(true);
+    });
+});
@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+"""
+Content-addressed storage for submission files.
+
+Files are stored once per distinct content under their sha256 digest in a
+sharded tree (``ab/cd/abcd...``), so a handout resubmitted by a whole class
+takes the space of one copy and same-named files can no longer overwrite
+each other. ``Blob`` rows track how many submissions reference each file;
+``collect_garbage`` removes the files nobody references any more.
+"""
+
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.db import db
+from app.models import Blob, AssignmentSubmission
+from app.uploads import copy_stream
+
+
+class BlobStore:
+    """A directory of files named by the sha256 of their content."""
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_root = os.path.join(root, 'tmp')
+
+    def path(self, digest):
+        """Location of the file with the given digest."""
+        return os.path.join(self.root, *self.relative_path(digest).split('/'))
+
+    def relative_path(self, digest):
+        """Location of the file relative to the store root, for front-end server offload."""
+        return f'{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def temp_path(self):
+        """A fresh path on the same filesystem as the store, for atomic moves."""
+        os.makedirs(self.tmp_root, exist_ok=True)
+        return os.path.join(self.tmp_root, uuid.uuid4().hex)
+
+    def put_stream(self, stream):
+        """
+        Store the content of a readable binary stream.
+
+        :return: Tuple of the hex digest and the size in bytes.
+        """
+        tmp_path = self.temp_path()
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, 'wb') as tmp_file:
+                size = copy_stream(stream, tmp_file, digest)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            self.put_file(tmp_path, digest.hexdigest())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest.hexdigest(), size
+
+    def put_file(self, path, digest):
+        """
+        Move a file whose digest is already known into the store.
+
+        The file is consumed: it is renamed into place, or removed when the
+        store already holds the same content.
+        """
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.remove(path)
+            # Refresh the mtime so the orphan sweep's grace period covers reuse
+            os.utime(target)
+            return target
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+        return target
+
+    def delete(self, digest):
+        """Remove the file with the given digest if present."""
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def digests(self):
+        """Yield (digest, mtime) for every stored file."""
+        for shard in os.listdir(self.root) if os.path.isdir(self.root) else ():
+            if len(shard) != 2:
+                continue
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, shard)):
+                for filename in filenames:
+                    yield filename, os.path.getmtime(os.path.join(dirpath, filename))
+
+
+def get_blob_store():
+    """Return the BlobStore configured for the current application."""
+    root = current_app.config.get('BLOB_STORAGE_FOLDER') or os.path.join(current_app.config['UPLOAD_FOLDER'], 'objects')
+    return BlobStore(root)
+
+
+def _insert_ignoring_duplicates(table, dialect):
+    """An INSERT that leaves an existing row with the same primary key alone."""
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return table.insert().prefix_with('IGNORE', dialect='mysql')
+
+
+def register_blob(digest, size):
+    """
+    Make sure a Blob row exists for a stored file and mark it as recently used.
+
+    Must be called in the transaction that adds the referencing submission,
+    so the garbage collector's grace period covers the new reference. The
+    row is upserted rather than inserted in a savepoint, which pysqlite
+    would commit on its own, so a rolled back submission leaves nothing
+    behind.
+    """
+    now = datetime.utcnow()
+    blob = Blob.__table__
+    insert = _insert_ignoring_duplicates(blob, db.engine.dialect.name)
+    db.session.execute(insert.values(digest=digest, size=size, ref_count=0, last_referenced_at=now))
+    db.session.execute(blob.update().where(blob.c.digest == digest).values(last_referenced_at=now))
+
+
+def recount_references():
+    """
+    Recompute every Blob.ref_count from the submissions table.
+
+    Repairs drift left by bulk deletes that bypass the ORM events.
+
+    :return: The number of blobs whose count changed.
+    """
+    counts = dict(db.session.query(
+        AssignmentSubmission.file_digest, func.count(AssignmentSubmission.id)
+    ).filter(AssignmentSubmission.file_digest.isnot(None)).group_by(AssignmentSubmission.file_digest))
+    changed = 0
+    for blob in Blob.query.yield_per(1000):
+        count = counts.get(blob.digest, 0)
+        if blob.ref_count != count:
+            blob.ref_count = count
+            changed += 1
+    db.session.commit()
+    return changed
+
+
+def collect_garbage(store, grace=24 * 3600, batch_size=500):
+    """
+    Delete blobs without references, and stored files without a Blob row.
+
+    Only entries untouched for longer than grace seconds are removed, so
+    files uploaded by requests that have not committed yet are left alone.
+
+    :return: Tuple of (unreferenced blobs removed, orphan files removed).
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    removed = 0
+    while True:
+        digests = [digest for digest, in db.session.query(Blob.digest).filter(
+            Blob.ref_count <= 0, Blob.last_referenced_at < cutoff
+        ).limit(batch_size)]
+        if not digests:
+            break
+        deleted = []
+        for digest in digests:
+            # Re-check the count in the DELETE itself in case a submission
+            # picked the blob up since it was selected.
+            result = db.session.execute(Blob.__table__.delete().where(
+                Blob.digest == digest, Blob.ref_count <= 0
+            ))
+            if result.rowcount:
+                deleted.append(digest)
+        db.session.commit()
+        if deleted:
+            # Keep files whose content was uploaded again since the delete
+            revived = {digest for digest, in db.session.query(Blob.digest).filter(Blob.digest.in_(deleted))}
+            for digest in deleted:
+                if digest not in revived:
+                    store.delete(digest)
+        removed += len(deleted)
+        if len(digests) < batch_size:
+            break
+
+    orphans = 0
+    file_cutoff = time.time() - grace
+    if os.path.isdir(store.tmp_root):
+        for name in os.listdir(store.tmp_root):
+            path = os.path.join(store.tmp_root, name)
+            if os.path.getmtime(path) < file_cutoff:
+                os.remove(path)
+
+    batch = []
+    for digest, mtime in store.digests():
+        if mtime < file_cutoff:
+            batch.append(digest)
+        if len(batch) >= batch_size:
+            orphans += _remove_orphans(store, batch)
+            batch = []
+    if batch:
+        orphans += _remove_orphans(store, batch)
+    return removed, orphans
+
+
+def _remove_orphans(store, digests):
+    known = {digest for digest, in db.session.query(Blob.digest).filter(Blob.digest.in_(digests))}
+    orphans = [digest for digest in digests if digest not in known]
+    for digest in orphans:
+        store.delete(digest)
+    return len(orphans)
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""
+Background tasks for the SodLat Edu Solution project.
+
+Imported by create_app so every task is registered before a route
+enqueues it or a worker picks it up. Tasks may run more than once and
+must tolerate it.
+"""
+
+import logging
+from flask import current_app
+from app.jobs import task
+from app.storage import get_blob_store, recount_references, collect_garbage
+from app.uploads import ChunkedUpload, UploadError, purge_stale_uploads
+
+
+logger = logging.getLogger(__name__)
+
+
+@task('uploads.complete', max_attempts=3)
+def complete_upload(upload_id, owner_id):
+    """
+    Assemble a chunked upload in the blob store.
+
+    Every failure is saved in its manifest for the client to see rather
+    than retried, so a polling client always gets an answer; completing
+    the upload again queues a new attempt.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    upload = ChunkedUpload.load(folder, upload_id, owner_id)
+    if upload is None:
+        return  # discarded in the meantime
+    try:
+        upload.complete(get_blob_store())
+        return
+    except UploadError as e:
+        error = str(e)
+    except Exception:
+        logger.exception('Could not assemble upload %s', upload_id)
+        error = 'The file could not be assembled. Please try again.'
+    # Reloaded, as a failed assembly may have left the manifest half updated
+    upload = ChunkedUpload.load(folder, upload_id, owner_id)
+    if upload is not None:
+        upload.manifest['queued'] = False
+        upload.manifest['error'] = error
+        upload.save_manifest()
+
+
+@task('storage.gc', max_attempts=1)
+def storage_gc(grace=None):
+    """The clean-up of ``flask storage gc``, for scheduling through the queue."""
+    grace = current_app.config['BLOB_GC_GRACE_SECONDS'] if grace is None else grace
+    recount_references()
+    collect_garbage(get_blob_store(), grace=grace)
+    purge_stale_uploads(current_app.config['UPLOAD_FOLDER'], grace)
@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+"""
+Resumable chunked uploads for assignment submission files.
+
+A client opens an upload with the final file name and size, sends the
+file as numbered chunks of at most ``UPLOAD_CHUNK_SIZE`` bytes (each one a
+separate, retryable request) and then completes the upload. Chunks are
+streamed to disk in small blocks and checksummed as they arrive, and the
+final file is assembled inside the blob store and moved into place with an
+atomic rename, so memory use stays bounded whatever the file size.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import uuid
+from werkzeug.utils import secure_filename
+
+
+BUFFER_SIZE = 64 * 1024
+MANIFEST = 'manifest.json'
+
+
+class UploadError(ValueError):
+    """Raised when an upload request cannot be honoured."""
+
+
+def staging_root(upload_folder):
+    """Directory holding the chunks of uploads in progress."""
+    return os.path.join(upload_folder, '.incoming')
+
+
+def copy_stream(source, destination, digest, limit=None):
+    """
+    Copy source to destination in BUFFER_SIZE blocks, updating digest.
+
+    :param limit: Maximum number of bytes accepted; UploadError past it.
+    :return: The number of bytes copied.
+    """
+    written = 0
+    while True:
+        block = source.read(BUFFER_SIZE)
+        if not block:
+            return written
+        written += len(block)
+        if limit is not None and written > limit:
+            raise UploadError('Chunk is larger than the announced size.')
+        digest.update(block)
+        destination.write(block)
+
+
+class ChunkedUpload:
+    """An upload in progress, stored as a manifest plus one file per chunk."""
+
+    def __init__(self, upload_folder, upload_id, manifest):
+        self.upload_folder = upload_folder
+        self.upload_id = upload_id
+        self.manifest = manifest
+        self.path = os.path.join(staging_root(upload_folder), upload_id)
+
+    @classmethod
+    def create(cls, upload_folder, owner_id, filename, size, chunk_size, max_size,
+               allowed_extensions=None, sha256=None):
+        """
+        Open a new upload.
+
+        :param owner_id: ID of the user allowed to send chunks and claim the file.
+        :param filename: Client file name, sanitised with secure_filename.
+        :param size: Total size of the file in bytes.
+        :param allowed_extensions: Optional set of accepted lowercase extensions.
+        :param sha256: Optional hex digest the assembled file must match.
+        """
+        filename = secure_filename(filename or '')
+        if not filename:
+            raise UploadError('A file name is required.')
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if allowed_extensions is not None and extension not in allowed_extensions:
+            raise UploadError(f'Files of type .{extension} are not accepted.')
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('The file size must be a positive integer.')
+        if size > max_size:
+            raise UploadError(f'Files may not be larger than {max_size} bytes.')
+
+        upload_id = uuid.uuid4().hex
+        manifest = {
+            'owner_id': owner_id,
+            'filename': filename,
+            'size': size,
+            'chunk_size': chunk_size,
+            'chunks': math.ceil(size / chunk_size),
+            'sha256': sha256.lower() if sha256 else None,
+            'created': time.time(),
+            'result': None,
+        }
+        upload = cls(upload_folder, upload_id, manifest)
+        os.makedirs(upload.path)
+        upload.save_manifest()
+        return upload
+
+    @classmethod
+    def load(cls, upload_folder, upload_id, owner_id):
+        """Return the upload with the given ID, or None if it does not belong to owner_id."""
+        if not upload_id or not upload_id.isalnum():
+            return None
+        path = os.path.join(staging_root(upload_folder), upload_id, MANIFEST)
+        try:
+            with open(path) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+        if manifest['owner_id'] != owner_id:
+            return None
+        return cls(upload_folder, upload_id, manifest)
+
+    def save_manifest(self):
+        tmp_path = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(tmp_path, 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+    def chunk_path(self, index):
+        return os.path.join(self.path, f'part-{index:06d}')
+
+    def expected_chunk_size(self, index):
+        """Size in bytes that chunk index must have."""
+        if index == self.manifest['chunks'] - 1:
+            return self.manifest['size'] - index * self.manifest['chunk_size']
+        return self.manifest['chunk_size']
+
+    def received(self):
+        """Indexes of the chunks already stored."""
+        return [index for index in range(self.manifest['chunks']) if os.path.exists(self.chunk_path(index))]
+
+    def missing(self):
+        """Indexes of the chunks not received yet."""
+        return sorted(set(range(self.manifest['chunks'])) - set(self.received()))
+
+    def write_chunk(self, index, stream, sha256=None):
+        """
+        Store chunk index from stream, replacing any earlier attempt.
+
+        :param sha256: Optional hex digest the chunk must match.
+        :return: Hex sha256 digest of the stored chunk.
+        """
+        if self.manifest['result']:
+            raise UploadError('This upload is already complete.')
+        if not 0 <= index < self.manifest['chunks']:
+            raise UploadError('Chunk index out of range.')
+
+        expected = self.expected_chunk_size(index)
+        digest = hashlib.sha256()
+        tmp_path = self.chunk_path(index) + f'.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'wb') as chunk_file:
+                written = copy_stream(stream, chunk_file, digest, limit=expected)
+            if written != expected:
+                raise UploadError(f'Chunk {index} must be {expected} bytes, got {written}.')
+            if sha256 and digest.hexdigest() != sha256.lower():
+                raise UploadError(f'Chunk {index} checksum mismatch.')
+            os.replace(tmp_path, self.chunk_path(index))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest.hexdigest()
+
+    def complete(self, store):
+        """
+        Assemble the chunks into the final file and move it into store.
+
+        Completing twice returns the same result.
+
+        :param store: The BlobStore receiving the file.
+        :return: Dict with the original file name, its size and sha256 digest.
+        """
+        if self.manifest['result']:
+            return self.manifest['result']
+
+        missing = self.missing()
+        if missing:
+            raise UploadError(f'Missing chunks: {missing[:20]}')
+
+        tmp_path = store.temp_path()
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, 'wb') as final_file:
+                for index in range(self.manifest['chunks']):
+                    with open(self.chunk_path(index), 'rb') as chunk_file:
+                        copy_stream(chunk_file, final_file, digest)
+                final_file.flush()
+                os.fsync(final_file.fileno())
+            if self.manifest['sha256'] and digest.hexdigest() != self.manifest['sha256']:
+                raise UploadError('File checksum mismatch.')
+            store.put_file(tmp_path, digest.hexdigest())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        for index in range(self.manifest['chunks']):
+            os.remove(self.chunk_path(index))
+        self.manifest['result'] = {
+            'filename': self.manifest['filename'],
+            'size': self.manifest['size'],
+            'sha256': digest.hexdigest(),
+        }
+        self.save_manifest()
+        return self.manifest['result']
+
+    def discard(self):
+        """Remove the staging directory of this upload."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def purge_stale_uploads(upload_folder, max_age):
+    """
+    Remove staging directories untouched for more than max_age seconds.
+
+    :return: The number of uploads removed.
+    """
+    root = staging_root(upload_folder)
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for upload_id in os.listdir(root):
+        path = os.path.join(root, upload_id)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -10,5 +10,131 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///sodlat_edu.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Read replicas, as comma separated URLs. GET requests read from one of
+    # them; writes, and reads of a client for DATABASE_STICKY_SECONDS after
+    # it wrote, use SQLALCHEMY_DATABASE_URI.
+    SQLALCHEMY_BINDS = {
+        f'replica{index}': url
+        for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))
+    }
+    DATABASE_REPLICAS = sorted(SQLALCHEMY_BINDS)
+    DATABASE_STICKY_SECONDS = int(os.environ.get('DATABASE_STICKY_SECONDS', 10))
+
+    # SQLite file databases: SQLITE_PRAGMAS, when set, replaces the pragmas
+    # run on every new connection (app.sqlite.DEFAULT_PRAGMAS; an empty dict
+    # leaves SQLite's defaults). DB_SERIAL_WRITER commits the form writes
+    # from one thread in batches gathered over DB_WRITER_BATCH_WAIT; a write
+    # still waiting after DB_WRITER_TIMEOUT seconds is abandoned.
+    DB_SERIAL_WRITER = os.environ.get('DB_SERIAL_WRITER', '').lower() in ('1', 'true', 'yes')
+    DB_WRITER_BATCH_SIZE = 50
+    DB_WRITER_BATCH_WAIT = 0.002
+    DB_WRITER_TIMEOUT = 30
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
-    MAX_CONTENT_LENGTH = 5 * 1024 * 1024
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 5 * 1024 * 1024
+
+    # Large files are sent through /uploads in chunks; MAX_CONTENT_LENGTH
+    # bounds each request, UPLOAD_MAX_FILE_SIZE the assembled file.
+    UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+    UPLOAD_MAX_FILE_SIZE = int(os.environ.get('UPLOAD_MAX_FILE_SIZE', 500 * 1024 * 1024))
+    UPLOAD_ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'png', 'jpg', 'jpeg', 'mp4', 'mov', 'webm'}
+
+    # Content-addressed submission files; defaults to UPLOAD_FOLDER/objects
+    BLOB_STORAGE_FOLDER = os.environ.get('BLOB_STORAGE_FOLDER')
+    BLOB_GC_GRACE_SECONDS = 24 * 3600
+
+    # Set to an nginx internal location aliased to BLOB_STORAGE_FOLDER to
+    # offload submission downloads with X-Accel-Redirect.
+    SEND_FILE_ACCEL_PREFIX = os.environ.get('SEND_FILE_ACCEL_PREFIX')
+
+    # Identity cache for the Flask-Login user loader. None keeps a per-process
+    # LRU; an import string selects a shared backend class. Role and flag
+    # changes only invalidate the process that made them, so with several
+    # workers and no shared backend the others may serve the old flags for
+    # up to IDENTITY_CACHE_TTL seconds; only raise it with a shared backend.
+    IDENTITY_CACHE_BACKEND = os.environ.get('IDENTITY_CACHE_BACKEND')
+    IDENTITY_CACHE_SIZE = 1024
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 5))
+
+    # Dashboard fragment cache, off unless FRAGMENT_CACHE_BACKEND names a
+    # backend shared by every worker (app.cache.LocalCache only suits a
+    # single process).
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND')
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 60))
+
+    # Cross-request cache of each teacher's course picker choices, off
+    # unless COURSE_CHOICES_CACHE_BACKEND names a backend shared by every
+    # worker; without it the choices are loaded once per request.
+    COURSE_CHOICES_CACHE_BACKEND = os.environ.get('COURSE_CHOICES_CACHE_BACKEND')
+    COURSE_CHOICES_CACHE_SIZE = 256
+    COURSE_CHOICES_CACHE_TTL = int(os.environ.get('COURSE_CHOICES_CACHE_TTL', 600))
+
+    # Password hashing. PASSWORD_POLICY may name another policy class; hashes
+    # made with other settings are upgraded at the next login. Hashes run on
+    # PASSWORD_HASH_WORKERS threads (None uses one per CPU, 0 hashes inline).
+    PASSWORD_POLICY = os.environ.get('PASSWORD_POLICY')
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None
+
+    # Bulk roster import: users inserted per transaction and password hashing
+    # processes (None uses one per CPU, 0 hashes in the request process).
+    ROSTER_CHUNK_SIZE = 500
+    ROSTER_HASH_WORKERS = int(os.environ['ROSTER_HASH_WORKERS']) if os.environ.get('ROSTER_HASH_WORKERS') else None
+
+    # Longest expected write transaction. Sync cursors only move past rows
+    # stamped at least this long ago, as row versions may commit out of order.
+    VERSION_SETTLE_SECONDS = 10
+
+    # Live dashboard updates over Server-Sent Events at /events. Each open
+    # dashboard keeps a connection for up to EVENTS_MAX_DURATION seconds, so
+    # only enable this when serving with an asynchronous worker class (e.g.
+    # gunicorn -k gevent), never with the default sync workers.
+    EVENTS_ENABLED = os.environ.get('EVENTS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    EVENTS_BROKER = os.environ.get('EVENTS_BROKER')
+    EVENTS_MAX_DURATION = 300
+
+    # Background jobs. By default they run inside the request that queued
+    # them; set JOBS_EAGER=0 only once a `flask jobs worker` process runs
+    # next to the web workers, or queued jobs are never picked up. Retries
+    # wait JOBS_BACKOFF_BASE seconds, doubling up to JOBS_BACKOFF_MAX; a
+    # running job untouched for JOBS_LOCK_TIMEOUT seconds is requeued.
+    JOBS_EAGER = os.environ.get('JOBS_EAGER', 'true').lower() in ('1', 'true', 'yes')
+    JOBS_CONCURRENCY = int(os.environ.get('JOBS_CONCURRENCY', 4))
+    JOBS_POLL_INTERVAL = 1.0
+    JOBS_MAX_ATTEMPTS = 5
+    JOBS_BACKOFF_BASE = 10
+    JOBS_BACKOFF_MAX = 3600
+    JOBS_LOCK_TIMEOUT = 600
+
+    # Per-request SQL, template and total timings, sent in a Server-Timing
+    # header; requests slower than PROFILING_SLOW_REQUEST_MS are logged with
+    # their SQL. Nothing is hooked into the app while disabled.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILING_SERVER_TIMING = True
+    PROFILING_SLOW_REQUEST_MS = int(os.environ.get('PROFILING_SLOW_REQUEST_MS', 500))
+    PROFILING_MAX_STATEMENTS = 50
+
+    # Prometheus metrics at /metrics, off by default since the endpoint is
+    # open unless METRICS_TOKEN is set (scrapers then send it as a bearer
+    # token). With several worker processes, point METRICS_DIR at a
+    # directory they share (emptied on deploy) so any of them answers with
+    # the totals of all.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 5
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+
+class TestConfig(Config):
+    """Configuration used by the test suite."""
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    ROSTER_HASH_WORKERS = 0
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    JOBS_EAGER = True
+    VERSION_SETTLE_SECONDS = 0
+    FRAGMENT_CACHE_BACKEND = 'app.cache.LocalCache'
+    COURSE_CHOICES_CACHE_BACKEND = 'app.cache.LocalCache'
@@ -0,0 +1,69 @@
+"""Normalized identity columns
+
+Revision ID: 0ac7f47e6995
+Revises: b01d0d0e290c
+Create Date: 2026-10-17 18:00:09.306891
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0ac7f47e6995'
+down_revision = 'b01d0d0e290c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backfill in Python so the result matches normalize_identifier exactly;
+    # SQL lower() only folds ASCII on some databases.
+    bind = op.get_bind()
+    user = sa.table('user', sa.column('id'), sa.column('username'), sa.column('email'),
+                    sa.column('username_normalized'), sa.column('email_normalized'))
+    rows = bind.execute(sa.select(user.c.id, user.c.username, user.c.email)).fetchall()
+    values = [{'user_id': user_id, 'new_username': username.strip().lower(), 'new_email': email.strip().lower()}
+              for user_id, username, email in rows]
+
+    # Accounts differing only in case, and usernames containing '@' (looked
+    # up as emails at login), must be merged or renamed by hand first;
+    # checked before any DDL since SQLite cannot roll it back
+    emails = [f'{user_id} ({username})' for user_id, username, _ in rows if '@' in username]
+    if emails:
+        raise RuntimeError('Usernames containing @, which can no longer log in: ' + ', '.join(emails))
+    for column in ('new_username', 'new_email'):
+        seen = {}
+        clashes = []
+        for row in values:
+            if row[column] in seen:
+                clashes.append(f'{seen[row[column]]} and {row["user_id"]} ({row[column]})')
+            seen.setdefault(row[column], row['user_id'])
+        if clashes:
+            raise RuntimeError(f'Users with the same {column[4:]} ignoring case: ' + ', '.join(clashes))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('username_normalized', sa.String(length=150), nullable=True))
+        batch_op.add_column(sa.Column('email_normalized', sa.String(length=120), nullable=True))
+
+    if values:
+        bind.execute(
+            user.update().where(user.c.id == sa.bindparam('user_id')).values(
+                username_normalized=sa.bindparam('new_username'), email_normalized=sa.bindparam('new_email')
+            ),
+            values
+        )
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('username_normalized', existing_type=sa.String(length=150), nullable=False)
+        batch_op.alter_column('email_normalized', existing_type=sa.String(length=120), nullable=False)
+        batch_op.create_index(batch_op.f('ix_user_username_normalized'), ['username_normalized'], unique=True)
+        batch_op.create_index(batch_op.f('ix_user_email_normalized'), ['email_normalized'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_email_normalized'))
+        batch_op.drop_index(batch_op.f('ix_user_username_normalized'))
+        batch_op.drop_column('email_normalized')
+        batch_op.drop_column('username_normalized')
@@ -0,0 +1,62 @@
+"""Row versions for incremental sync
+
+Revision ID: 3d628cc0c3b0
+Revises: 0ac7f47e6995
+Create Date: 2026-10-17 18:09:09.187393
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d628cc0c3b0'
+down_revision = '0ac7f47e6995'
+branch_labels = None
+depends_on = None
+
+
+VERSIONED_TABLES = ('course', 'assignment', 'assignment_submission', 'progress')
+
+
+def upgrade():
+    counter = op.create_table('change_counter',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+    for name in VERSIONED_TABLES:
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+            batch_op.add_column(sa.Column('version', sa.BigInteger(), nullable=True))
+
+    # Existing rows get their id as version, in creation order, and the
+    # counter continues from the highest one
+    bind = op.get_bind()
+    now = sa.func.current_timestamp()
+    counters = []
+    for name in VERSIONED_TABLES:
+        table = sa.table(name, sa.column('id'), sa.column('updated_at'), sa.column('version'))
+        bind.execute(table.update().values(updated_at=now, version=table.c.id))
+        highest = bind.execute(sa.select(sa.func.max(table.c.id))).scalar()
+        counters.append({'name': name, 'value': highest or 0})
+    op.bulk_insert(counter, counters)
+
+    for name in VERSIONED_TABLES:
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+            batch_op.alter_column('version', existing_type=sa.BigInteger(), nullable=False)
+            batch_op.create_index(batch_op.f(f'ix_{name}_updated_at'), ['updated_at'], unique=False)
+            batch_op.create_index(batch_op.f(f'ix_{name}_version'), ['version'], unique=False)
+
+
+def downgrade():
+    for name in reversed(VERSIONED_TABLES):
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{name}_version'))
+            batch_op.drop_index(batch_op.f(f'ix_{name}_updated_at'))
+            batch_op.drop_column('version')
+            batch_op.drop_column('updated_at')
+
+    op.drop_table('change_counter')
@@ -0,0 +1,32 @@
+"""Widen password hash column
+
+Revision ID: b01d0d0e290c
+Revises: ba743f4b6eba
+Create Date: 2026-10-17 17:58:51.193611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b01d0d0e290c'
+down_revision = 'ba743f4b6eba'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.VARCHAR(length=128),
+               type_=sa.String(length=255),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=255),
+               type_=sa.VARCHAR(length=128),
+               existing_nullable=False)
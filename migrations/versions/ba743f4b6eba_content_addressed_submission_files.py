@@ -0,0 +1,45 @@
+"""Content-addressed submission files
+
+Revision ID: ba743f4b6eba
+Revises: f9c446420190
+Create Date: 2026-10-17 11:40:27.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ba743f4b6eba'
+down_revision = 'f9c446420190'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blob',
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('last_referenced_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    with op.batch_alter_table('blob', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_blob_ref_count'), ['ref_count'], unique=False)
+
+    with op.batch_alter_table('assignment_submission', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('file_digest', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_assignment_submission_file_digest'), ['file_digest'], unique=False)
+        batch_op.create_foreign_key('fk_assignment_submission_file_digest_blob', 'blob', ['file_digest'], ['digest'])
+
+
+def downgrade():
+    with op.batch_alter_table('assignment_submission', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_assignment_submission_file_digest_blob', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_assignment_submission_file_digest'))
+        batch_op.drop_column('file_digest')
+
+    with op.batch_alter_table('blob', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blob_ref_count'))
+
+    op.drop_table('blob')
@@ -0,0 +1,83 @@
+"""Add indexes for dashboard filters
+
+Revision ID: f9c446420190
+Revises: f8dc97ba4918
+Create Date: 2026-10-17 09:12:04.518337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9c446420190'
+down_revision = 'f8dc97ba4918'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # student_courses had no key, so drop NULL and duplicate enrolments
+    # before it gets a composite primary key.
+    bind = op.get_bind()
+    student_courses = sa.table('student_courses', sa.column('student_id'), sa.column('course_id'))
+    rows = bind.execute(
+        sa.select(student_courses.c.student_id, student_courses.c.course_id).distinct().where(
+            student_courses.c.student_id.isnot(None), student_courses.c.course_id.isnot(None)
+        )
+    ).fetchall()
+    bind.execute(student_courses.delete())
+    if rows:
+        bind.execute(student_courses.insert(), [
+            {'student_id': student_id, 'course_id': course_id} for student_id, course_id in rows
+        ])
+
+    with op.batch_alter_table('student_courses', recreate='always') as batch_op:
+        batch_op.alter_column('student_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('course_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_primary_key('pk_student_courses', ['student_id', 'course_id'])
+        batch_op.create_index(batch_op.f('ix_student_courses_course_id'), ['course_id'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_parent_id'), ['parent_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_role'), ['role'], unique=False)
+
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_course_teacher_id'), ['teacher_id'], unique=False)
+
+    with op.batch_alter_table('assignment', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_assignment_course_id'), ['course_id'], unique=False)
+
+    with op.batch_alter_table('progress', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_progress_student_id'), ['student_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_progress_course_id'), ['course_id'], unique=False)
+
+    with op.batch_alter_table('assignment_submission', schema=None) as batch_op:
+        batch_op.create_index('ix_assignment_submission_student_id_assignment_id', ['student_id', 'assignment_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_assignment_submission_assignment_id'), ['assignment_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('assignment_submission', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_assignment_submission_assignment_id'))
+        batch_op.drop_index('ix_assignment_submission_student_id_assignment_id')
+
+    with op.batch_alter_table('progress', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_progress_course_id'))
+        batch_op.drop_index(batch_op.f('ix_progress_student_id'))
+
+    with op.batch_alter_table('assignment', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_assignment_course_id'))
+
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_course_teacher_id'))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_role'))
+        batch_op.drop_index(batch_op.f('ix_user_parent_id'))
+
+    with op.batch_alter_table('student_courses', recreate='always') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_student_courses_course_id'))
+        batch_op.drop_constraint('pk_student_courses', type_='primary')
+        batch_op.alter_column('course_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('student_id', existing_type=sa.Integer(), nullable=True)
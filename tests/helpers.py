@@ -0,0 +1,30 @@
+"""Helpers shared by the test modules."""
+
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import db
+from app.models import User
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement executed inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def make_user(username, **kwargs):
+    """Create and commit a user with the password 'password'."""
+    user = User(username=username, email=f'{username}@example.com', **kwargs)
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
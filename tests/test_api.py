@@ -0,0 +1,135 @@
+import json
+import unittest
+from flask_login import login_user
+from app import create_app, db
+from app.models import User, Course, Assignment, Progress
+from tests.helpers import make_user
+
+
+class ReadApiTestCase(unittest.TestCase):
+    """Tests for the read-only JSON API."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        other = make_user('otherteacher', role='teacher', is_teacher=True)
+        parent = make_user('parentuser', role='parent', is_parent=True)
+        child = make_user('childuser', role='student', is_student=True, parent_id=parent.id)
+        stranger = make_user('stranger', role='student', is_student=True)
+        algebra = Course(course='Algebra', teacher=teacher)
+        history = Course(course='History', teacher=other)
+        algebra.students.append(child)
+        history.students.append(stranger)
+        db.session.add_all([algebra, history])
+        db.session.commit()
+        db.session.add_all([
+            Assignment(title='Homework', course_id=algebra.id),
+            Assignment(title='Essay', course_id=history.id),
+            Progress(student_id=child.id, course_id=algebra.id, teacher_id=teacher.id, grade='B'),
+            Progress(student_id=stranger.id, course_id=history.id, teacher_id=other.id, grade='C'),
+        ])
+        db.session.commit()
+        self.ids = {user.username: user.id for user in User.query}
+        db.session.remove()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get(self, path, username, etag=None):
+        """Dispatch a GET request as the given user."""
+        headers = {'If-None-Match': etag} if etag else {}
+        with self.app.test_request_context(path, headers=headers):
+            login_user(User.query.get(self.ids[username]))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response
+
+    def rows(self, response):
+        payload = json.loads(response.get_data(as_text=True))
+        return [dict(zip(payload['fields'], row)) for row in payload['rows']]
+
+    def test_lists_are_scoped_to_the_user(self):
+        """Test that each role only sees its own courses, assignments and progress."""
+        courses = self.rows(self.get('/api/v1/courses', 'teacheruser'))
+        self.assertEqual([course['course'] for course in courses], ['Algebra'])
+        assignments = self.rows(self.get('/api/v1/assignments', 'childuser'))
+        self.assertEqual([assignment['title'] for assignment in assignments], ['Homework'])
+        progress = self.rows(self.get('/api/v1/progress', 'parentuser'))
+        self.assertEqual([(row['student_id'], row['grade']) for row in progress], [(self.ids['childuser'], 'B')])
+        children = self.rows(self.get('/api/v1/children', 'parentuser'))
+        self.assertEqual([child['username'] for child in children], ['childuser'])
+
+    def test_body_is_compact(self):
+        """Test that the JSON has no insignificant whitespace."""
+        body = self.get('/api/v1/courses', 'childuser').get_data(as_text=True)
+        self.assertTrue(body.startswith('{"fields":["id","course"'))
+        self.assertNotIn(', ', body)
+
+    def test_conditional_get(self):
+        """Test that a matching ETag gets an empty 304 until the data changes."""
+        first = self.get('/api/v1/progress', 'childuser')
+        etag = first.headers['ETag']
+        self.assertEqual(first.status_code, 200)
+
+        cached = self.get('/api/v1/progress', 'childuser', etag=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.get_data(), b'')
+        self.assertEqual(cached.headers['ETag'], etag)
+
+        Progress.query.filter_by(student_id=self.ids['childuser']).one().grade = 'A'
+        db.session.commit()
+        changed = self.get('/api/v1/progress', 'childuser', etag=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_changed_enrolment_changes_etag(self):
+        """Test that swapping courses with the same count and highest version is not answered with 304."""
+        child = User.query.get(self.ids['childuser'])
+        algebra, history = Course.query.order_by(Course.id).all()
+        child.enrolled_courses.append(Course(course='Biology', teacher_id=algebra.teacher_id))
+        db.session.commit()
+        algebra_id, history_id = algebra.id, history.id
+        etag = self.get('/api/v1/courses', 'childuser').headers['ETag']
+
+        child = User.query.get(self.ids['childuser'])
+        child.enrolled_courses.remove(Course.query.get(algebra_id))
+        child.enrolled_courses.append(Course.query.get(history_id))
+        db.session.commit()
+        response = self.get('/api/v1/courses', 'childuser', etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([course['course'] for course in self.rows(response)], ['History', 'Biology'])
+
+    def test_since_returns_only_changes(self):
+        """Test that a client passing its cursor back only gets rows changed after it."""
+        payload = json.loads(self.get('/api/v1/progress', 'teacheruser').get_data(as_text=True))
+        self.assertEqual(len(payload['rows']), 1)
+        cursor = payload['cursor']
+        self.assertEqual(self.rows(self.get(f'/api/v1/progress?since={cursor}', 'teacheruser')), [])
+
+        Progress.query.filter_by(student_id=self.ids['childuser']).one().grade = 'A'
+        db.session.commit()
+        changed = self.rows(self.get(f'/api/v1/progress?since={cursor}', 'teacheruser'))
+        self.assertEqual([row['grade'] for row in changed], ['A'])
+        self.assertGreater(changed[0]['version'], cursor)
+
+    def test_children_requires_parent(self):
+        """Test that only parents can list children."""
+        self.assertEqual(self.get('/api/v1/children', 'childuser').status_code, 403)
+
+    def test_anonymous_gets_401(self):
+        """Test that API clients are not redirected to the login page."""
+        with self.app.test_request_context('/api/v1/courses'):
+            response = self.app.full_dispatch_request()
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
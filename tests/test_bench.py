@@ -0,0 +1,78 @@
+import unittest
+from sqlalchemy import func
+from app import create_app, db
+from app.benchmark import SCENARIOS, InProcessDriver, compare, load_users, run_scenario
+from app.models import User, Course, Assignment, AssignmentSubmission, Progress, student_courses
+from app.seed import SeedError, seed_school
+
+
+class SeedTestCase(unittest.TestCase):
+    """Tests for the synthetic school generator and the benchmark harness."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.report = seed_school(students=60, students_per_course=20, courses_per_student=2,
+                                  assignments_per_course=3, chunk_size=25)
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_school_is_consistent(self):
+        """Test that the generated rows match the report and link up."""
+        report = self.report
+        self.assertEqual((report.students, report.courses, report.assignments), (60, 6, 18))
+        self.assertEqual(User.query.filter_by(is_student=True).count(), 60)
+        self.assertEqual(User.query.filter_by(is_teacher=True).count(), report.teachers)
+        self.assertEqual(User.query.filter_by(is_parent=True).count(), report.parents)
+        self.assertEqual(db.session.query(student_courses).count(), 120)
+        self.assertEqual(Progress.query.count(), 120)
+        self.assertEqual(AssignmentSubmission.query.count(), report.submissions)
+        self.assertEqual(Assignment.query.count(), 18)
+
+        parents = {user.id for user in User.query.filter_by(is_parent=True)}
+        children = {user.parent_id for user in User.query.filter(User.parent_id.isnot(None))}
+        self.assertEqual(children, parents)
+        # Each submission belongs to an assignment of a course the student takes
+        stray = AssignmentSubmission.query.join(Assignment).outerjoin(student_courses, db.and_(
+            student_courses.c.course_id == Assignment.course_id,
+            student_courses.c.student_id == AssignmentSubmission.student_id
+        )).filter(student_courses.c.student_id.is_(None)).count()
+        self.assertEqual(stray, 0)
+        self.assertEqual(db.session.query(func.count(func.distinct(Course.version))).scalar(), 6)
+
+        student = User.query.filter_by(username='seed-student-000001').one()
+        self.assertTrue(student.check_password('password'))
+        with self.assertRaises(SeedError):
+            seed_school(students=1)
+
+    def test_benchmark_reports_each_scenario(self):
+        """Test that every scenario runs without errors and reports percentiles and queries."""
+        driver = InProcessDriver(self.app)
+        try:
+            results = [
+                run_scenario(driver, scenario, load_users(scenario.role), 'password', requests=6)
+                for scenario in SCENARIOS.values()
+            ]
+        finally:
+            driver.close()
+        for result in results:
+            self.assertEqual((result.requests, result.errors), (6, 0), result.name)
+            self.assertLessEqual(result.p50, result.p95)
+            self.assertLessEqual(result.p95, result.p99)
+            self.assertGreater(result.queries, 0)
+        self.assertEqual(AssignmentSubmission.query.count(), self.report.submissions + 6)
+
+        self.assertEqual(compare(results, {result.name: result for result in results}), [])
+        worse = {result.name: result._replace(p95=result.p95 / 2, queries=result.queries - 2) for result in results}
+        self.assertEqual(len(compare(results, worse)), 2 * len(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from unittest import mock
+from flask_login import login_user
+from sqlalchemy import event
+from app import create_app, db
+from app.cache import LocalCache, identity_cache
+from app.models import User
+
+
+class LocalCacheTestCase(unittest.TestCase):
+    """Tests for the in-memory cache backend."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted first."""
+        cache = LocalCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        """Test that entries are dropped once their TTL has passed."""
+        cache = LocalCache(default_ttl=10)
+        with mock.patch('app.cache.time.monotonic', return_value=100.0):
+            cache.set('a', 1)
+        with mock.patch('app.cache.time.monotonic', return_value=105.0):
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('app.cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class IdentityCacheTestCase(unittest.TestCase):
+    """Tests for the cached Flask-Login user loader."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        parent = User(username='parentuser', email='parent@example.com', role='parent', is_parent=True)
+        student = User(username='studentuser', email='student@example.com', role='student', is_student=True)
+        for user in (parent, student):
+            user.set_password('password')
+        db.session.add_all([parent, student])
+        db.session.commit()
+        self.parent_id = parent.id
+        self.student_id = student.id
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record)
+
+    def tearDown(self):
+        """Tear down test environment."""
+        event.remove(db.engine, 'before_cursor_execute', self.record)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def test_second_load_skips_database(self):
+        """Test that a cached principal is served without a query."""
+        user = identity_cache.load(User, str(self.student_id))
+        self.assertEqual(len(self.statements), 1)
+        db.session.remove()
+
+        user = identity_cache.load(User, str(self.student_id))
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual(user.username, 'studentuser')
+        self.assertTrue(user.is_student)
+        self.assertIn(user, db.session)
+
+    def test_invalidate_forces_reload(self):
+        """Test that an invalidated principal is read again."""
+        identity_cache.load(User, self.student_id)
+        User.query.get(self.student_id).email = 'changed@example.com'
+        db.session.commit()
+        db.session.remove()
+
+        identity_cache.invalidate(self.student_id)
+        user = identity_cache.load(User, self.student_id)
+        self.assertEqual(user.email, 'changed@example.com')
+
+    def test_parent_link_invalidates_child(self):
+        """Test that linking a child drops its cached principal."""
+        identity_cache.load(User, self.student_id)
+        db.session.remove()
+
+        with self.app.test_request_context('/parent_dashboard', method='POST',
+                                           data={'student_username': 'studentuser'}):
+            login_user(User.query.get(self.parent_id))
+            response = self.app.full_dispatch_request()
+        self.assertEqual(response.status_code, 302)
+        db.session.remove()
+
+        self.assertIsNone(identity_cache.backend.get(identity_cache.key(self.student_id)))
+        self.assertEqual(identity_cache.load(User, self.student_id).parent_id, self.parent_id)
+
+    def test_password_hash_is_not_cached(self):
+        """Test that the cache holds no credentials and the hash still loads on demand."""
+        identity_cache.load(User, self.student_id)
+        self.assertNotIn('password_hash', identity_cache.backend.get(identity_cache.key(self.student_id)))
+        db.session.remove()
+
+        user = identity_cache.load(User, self.student_id)
+        self.assertEqual(len(self.statements), 1)
+        self.assertTrue(user.check_password('password'))
+        self.assertEqual(len(self.statements), 2)
+
+    def test_password_change_invalidates(self):
+        """Test that committing a new password drops the cached principal."""
+        identity_cache.load(User, self.student_id)
+        user = User.query.get(self.student_id)
+        user.set_password('new-password')
+        db.session.commit()
+        self.assertIsNone(identity_cache.backend.get(identity_cache.key(self.student_id)))
+
+    def test_role_change_elsewhere_expires_quickly(self):
+        """Test that a change another worker made is picked up within the short default TTL."""
+        self.assertLessEqual(identity_cache.ttl, 5)
+        with mock.patch('app.cache.time.monotonic', return_value=100.0):
+            identity_cache.load(User, self.student_id)
+        db.session.remove()
+        # Written without going through this process's invalidation
+        users = User.__table__
+        db.session.execute(users.update().where(users.c.id == self.student_id).values(is_student=False))
+        db.session.commit()
+        db.session.remove()
+
+        with mock.patch('app.cache.time.monotonic', return_value=100.0 + identity_cache.ttl + 1):
+            self.assertFalse(identity_cache.load(User, self.student_id).is_student)
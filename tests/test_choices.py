@@ -0,0 +1,111 @@
+import unittest
+from datetime import datetime, timedelta
+from flask_login import login_user
+from app import create_app, db
+from app.choices import course_choices
+from app.forms import AssignmentForm, ProgressForm, AttendanceForm
+from app.models import User, Course, Assignment
+from config import Config, TestConfig
+from tests.helpers import count_queries, make_user
+
+
+class CourseChoicesTestCase(unittest.TestCase):
+    """Tests for the scoped course choice provider and field."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        other = make_user('otherteacher', role='teacher', is_teacher=True)
+        db.session.add_all([Course(course='Math', teacher_id=teacher.id), Course(course='Art', teacher_id=teacher.id),
+                            Course(course='History', teacher_id=other.id)])
+        db.session.commit()
+        self.teacher_id = teacher.id
+        self.courses = {course.course: course.id for course in Course.query}
+        course_choices.backend.clear()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def request(self, path='/teacher_dashboard', method='GET', data=None):
+        with self.app.test_request_context(path, method=method, data=data):
+            login_user(User.query.get(self.teacher_id))
+            with count_queries() as statements:
+                response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response, [s for s in statements if 'FROM course' in s]
+
+    def test_loaded_once_per_request_and_cached_across_requests(self):
+        """Test all forms share one scoped load, and later requests hit the cache."""
+        with self.app.test_request_context('/teacher_dashboard'):
+            login_user(User.query.get(self.teacher_id))
+            forms = [AssignmentForm(), ProgressForm(), AttendanceForm()]
+            with count_queries() as statements:
+                rendered = [form.course_id() for form in forms]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('Art', rendered[0])
+        self.assertNotIn('History', rendered[0])
+        self.assertEqual(len(set(rendered)), 1)
+
+        response, statements = self.request()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<option value="%d">Math</option>' % self.courses['Math'], response.data)
+        # Only the dashboard's own course list; the pickers come from the cache
+        self.assertEqual(len(statements), 1)
+
+    def test_invalidate_reloads_choices(self):
+        """Test a new course shows up in the pickers once its teacher is invalidated."""
+        self.assertEqual([name for _, name in course_choices.for_teacher(self.teacher_id)], ['Art', 'Math'])
+        course_choices.invalidate(self.teacher_id)
+        db.session.add(Course(course='Biology', teacher_id=self.teacher_id))
+        db.session.commit()
+        with self.app.test_request_context():
+            names = [name for _, name in course_choices.for_teacher(self.teacher_id)]
+        self.assertEqual(names, ['Art', 'Biology', 'Math'])
+
+    def test_creating_a_course_refreshes_choices(self):
+        """Test a course created on the dashboard shows up in the cached pickers."""
+        self.assertEqual([name for _, name in course_choices.for_teacher(self.teacher_id)], ['Art', 'Math'])
+        response, _ = self.request(method='POST', data={
+            'create_course': '1', 'course': 'Biology', 'description': 'Cells'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Course.query.filter_by(course='Biology').one().teacher_id, self.teacher_id)
+        with self.app.test_request_context():
+            names = [name for _, name in course_choices.for_teacher(self.teacher_id)]
+        self.assertEqual(names, ['Art', 'Biology', 'Math'])
+
+    def test_cache_disabled_by_default(self):
+        """Test choices are only loaded per request unless a shared backend is configured."""
+        self.assertIsNone(Config.COURSE_CHOICES_CACHE_BACKEND)
+        create_app(type('NoChoicesCacheConfig', (TestConfig,), {'COURSE_CHOICES_CACHE_BACKEND': None}))
+        self.assertIsNone(course_choices.backend)
+        with self.app.app_context(), self.app.test_request_context():
+            self.assertEqual([name for _, name in course_choices.for_teacher(self.teacher_id)], ['Art', 'Math'])
+        db.session.add(Course(course='Biology', teacher_id=self.teacher_id))
+        db.session.commit()
+        with self.app.app_context(), self.app.test_request_context():
+            names = [name for _, name in course_choices.for_teacher(self.teacher_id)]
+        self.assertEqual(names, ['Art', 'Biology', 'Math'])
+
+    def test_validates_by_primary_key_and_owner(self):
+        """Test submitted IDs are looked up directly and limited to the teacher's courses."""
+        data = {'create_assignment': '1', 'title': 'Homework', 'description': 'Solve',
+                'due_date': (datetime.utcnow() + timedelta(days=7)).strftime('%Y-%m-%d')}
+
+        response, statements = self.request(method='POST', data=dict(data, course_id=str(self.courses['History'])))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Assignment.query.count(), 0)
+
+        response, statements = self.request(method='POST', data=dict(data, course_id=str(self.courses['Math'])))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Assignment.query.one().course_id, self.courses['Math'])
+        self.assertEqual(len(statements), 1)
+        self.assertIn('WHERE course.id = ?', statements[0])
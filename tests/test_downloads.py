@@ -0,0 +1,109 @@
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from flask_login import login_user
+from app import create_app, db
+from app.models import User, Course, Assignment, AssignmentSubmission
+from app.storage import get_blob_store, register_blob
+
+
+class DownloadTestCase(unittest.TestCase):
+    """Tests for the submission download endpoint."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.folder
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        users = {}
+        for username, role in [('parentuser', 'parent'), ('teacheruser', 'teacher'),
+                               ('studentuser', 'student'), ('otherstudent', 'student'), ('otherteacher', 'teacher')]:
+            user = User(username=username, email=f'{username}@example.com', role=role, password_hash='x')
+            setattr(user, f'is_{role}', True)
+            users[username] = user
+        db.session.add_all(users.values())
+        db.session.flush()
+        users['studentuser'].parent_id = users['parentuser'].id
+        course = Course(course='Math', teacher_id=users['teacheruser'].id)
+        db.session.add(course)
+        db.session.flush()
+        assignment = Assignment(title='Homework', course_id=course.id, due_date=datetime.utcnow() + timedelta(days=1))
+        db.session.add(assignment)
+        db.session.flush()
+
+        self.content = b'%PDF-1.4 ' + bytes(range(256)) * 4
+        digest, size = get_blob_store().put_stream(io.BytesIO(self.content))
+        register_blob(digest, size)
+        submission = AssignmentSubmission(student_id=users['studentuser'].id, assignment_id=assignment.id,
+                                          submission_file='essay.pdf', file_digest=digest)
+        db.session.add(submission)
+        db.session.commit()
+        self.ids = {username: user.id for username, user in users.items()}
+        self.digest = digest
+        self.path = f'/submissions/{submission.id}/file'
+        self.assignment_id = assignment.id
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.folder)
+
+    def get(self, username, path=None, headers=None):
+        with self.app.test_request_context(path or self.path, headers=headers):
+            login_user(User.query.get(self.ids[username]))
+            response = self.app.full_dispatch_request()
+            response.direct_passthrough = False
+            data = response.get_data()
+        db.session.remove()
+        return response, data
+
+    def test_authorised_users_can_download(self):
+        """Test the owner, their parent and the course teacher get the file."""
+        for username in ('studentuser', 'parentuser', 'teacheruser'):
+            response, data = self.get(username)
+            self.assertEqual(response.status_code, 200, username)
+            self.assertEqual(data, self.content)
+            self.assertEqual(response.get_etag()[0], self.digest)
+            self.assertEqual(response.mimetype, 'application/pdf')
+            self.assertIn('private', response.headers['Cache-Control'])
+        for username in ('otherstudent', 'otherteacher'):
+            response, _ = self.get(username)
+            self.assertEqual(response.status_code, 404, username)
+
+    def test_conditional_and_range_requests(self):
+        """Test If-None-Match revalidation and partial content."""
+        response, _ = self.get('studentuser', headers={'If-None-Match': f'"{self.digest}"'})
+        self.assertEqual(response.status_code, 304)
+
+        response, data = self.get('studentuser', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(data, self.content[10:20])
+        self.assertEqual(response.headers['Content-Range'], f'bytes 10-19/{len(self.content)}')
+
+    def test_accel_redirect_offload(self):
+        """Test that the transfer can be handed to the front-end server."""
+        self.app.config['SEND_FILE_ACCEL_PREFIX'] = '/protected/'
+        response, data = self.get('teacheruser')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data, b'')
+        self.assertEqual(response.headers['X-Accel-Redirect'],
+                         f'/protected/{self.digest[:2]}/{self.digest[2:4]}/{self.digest}')
+
+        response, _ = self.get('teacheruser', headers={'If-None-Match': f'"{self.digest}"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_submission_list(self):
+        """Test the teacher's submission list links to the file."""
+        response, data = self.get('teacheruser', path=f'/assignments/{self.assignment_id}/submissions')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.path.encode(), data)
+        response, _ = self.get('otherteacher', path=f'/assignments/{self.assignment_id}/submissions')
+        self.assertEqual(response.status_code, 404)
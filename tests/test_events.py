@@ -0,0 +1,147 @@
+import json
+import unittest
+from flask_login import login_user
+from app import create_app, db
+from app.events import LocalBroker, event_hub, course_channel, student_channel
+from app.forms import GradebookEntryForm
+from app.gradebook import save_gradebook
+from app.models import User, Course, Assignment, Progress
+from config import TestConfig
+from tests.helpers import make_user
+
+
+class EventsConfig(TestConfig):
+    EVENTS_ENABLED = True
+
+
+class BrokerTestCase(unittest.TestCase):
+    """Tests for the in-process broker."""
+
+    def test_publish_reaches_only_subscribed_channels(self):
+        """Test that events go to the subscribers of their channel."""
+        broker = LocalBroker()
+        first = broker.subscribe(['course:1'])
+        second = broker.subscribe(['course:2'])
+        broker.publish('course:1', 'event')
+        self.assertEqual(first.get(0), 'event')
+        self.assertIsNone(second.get(0))
+
+        first.close()
+        second.close()
+        self.assertEqual(broker._subscriptions, {})
+
+    def test_full_queue_drops_and_flags(self):
+        """Test that a slow subscriber never blocks the publisher."""
+        broker = LocalBroker()
+        subscription = broker.subscribe(['course:1'], maxsize=2)
+        for i in range(5):
+            broker.publish('course:1', i)
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual([subscription.get(0), subscription.get(0), subscription.get(0)], [0, 1, None])
+
+
+class EventPublishingTestCase(unittest.TestCase):
+    """Tests for events published from committed changes."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app(EventsConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        self.parent = make_user('parentuser', role='parent', is_parent=True)
+        self.student = make_user('studentuser', role='student', is_student=True, parent_id=self.parent.id)
+        self.course = Course(course='Algebra', teacher=self.teacher)
+        self.course.students.append(self.student)
+        db.session.add(self.course)
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_commit_publishes_and_rollback_does_not(self):
+        """Test that events are only published once their transaction commits."""
+        subscription = event_hub.subscribe([course_channel(self.course.id), student_channel(self.student.id)])
+
+        db.session.add(Assignment(title='Draft', course_id=self.course.id))
+        db.session.flush()
+        db.session.rollback()
+        self.assertIsNone(subscription.get(0))
+
+        db.session.add(Assignment(title='Homework', course_id=self.course.id))
+        db.session.commit()
+        event = subscription.get(0)
+        self.assertEqual((event.kind, event.data['title']), ('assignment', 'Homework'))
+
+        progress = Progress(student_id=self.student.id, course_id=self.course.id, teacher_id=self.teacher.id)
+        db.session.add(progress)
+        db.session.commit()
+        progress.grade = 'A'
+        db.session.commit()
+        grades = [subscription.get(0).data['grade'], subscription.get(0).data['grade']]
+        self.assertEqual(grades, [None, 'A'])
+        subscription.close()
+
+    def test_gradebook_bulk_save_publishes(self):
+        """Test that bulk gradebook writes publish progress events."""
+        subscription = event_hub.subscribe([student_channel(self.student.id)])
+        save_gradebook(self.course, self.teacher.id, [GradebookEntryForm(data={'student_name': 'studentuser', 'grade': 'B'})])
+        event = subscription.get(0)
+        self.assertEqual((event.kind, event.data['grade']), ('progress', 'B'))
+        subscription.close()
+
+    def test_parent_stream_receives_child_events(self):
+        """Test that the SSE stream of a parent follows the child's courses and reports."""
+        with self.app.test_request_context('/events'):
+            login_user(User.query.get(self.parent.id))
+            response = self.app.full_dispatch_request()
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), 'retry: 5000\n\n')
+
+        db.session.add(Assignment(title='Homework', course_id=self.course.id))
+        db.session.commit()
+        message = next(chunks)
+        self.assertTrue(message.startswith('id: '))
+        self.assertIn('event: assignment\n', message)
+        data = json.loads(message.split('data: ', 1)[1])
+        self.assertEqual(data['title'], 'Homework')
+        response.close()
+
+
+class EventsDisabledTestCase(unittest.TestCase):
+    """Tests for the default configuration without live updates."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.student = make_user('studentuser', role='student', is_student=True)
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_dashboard_omits_live_updates(self):
+        """Test that dashboards neither show the banner nor open a stream by default."""
+        with self.app.test_request_context('/student_dashboard'):
+            login_user(User.query.get(self.student.id))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'live_updates.js', response.data)
+        self.assertNotIn(b'live-updates', response.data)
+        self.assertNotIn('events.stream', self.app.view_functions)
+
+
+if __name__ == '__main__':
+    unittest.main()
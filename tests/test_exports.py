@@ -0,0 +1,87 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime, timedelta
+from flask_login import login_user
+from app import create_app, db
+from app.exports import stream_submissions_zip
+from app.models import User, Course, Assignment, AssignmentSubmission
+from app.storage import get_blob_store, register_blob
+from app.uploads import BUFFER_SIZE
+
+
+class SubmissionExportTestCase(unittest.TestCase):
+    """Tests for the streamed ZIP export of submissions."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.folder
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        teacher = User(username='teacheruser', email='teacher@example.com', role='teacher', password_hash='x',
+                       is_teacher=True)
+        alice = User(username='alice', email='alice@example.com', role='student', password_hash='x')
+        bob = User(username='bob/../x', email='bob@example.com', role='student', password_hash='x')
+        db.session.add_all([teacher, alice, bob])
+        db.session.flush()
+        course = Course(course='Math', teacher_id=teacher.id)
+        db.session.add(course)
+        db.session.flush()
+        assignment = Assignment(title='Homework', course_id=course.id, due_date=datetime.utcnow() + timedelta(days=1))
+        db.session.add(assignment)
+        db.session.flush()
+
+        self.big = os.urandom(5 * BUFFER_SIZE + 17)
+        digest, size = get_blob_store().put_stream(io.BytesIO(self.big))
+        register_blob(digest, size)
+        db.session.add_all([
+            AssignmentSubmission(student_id=alice.id, assignment_id=assignment.id, submission_content='First try',
+                                 submission_file='scan.pdf', file_digest=digest),
+            AssignmentSubmission(student_id=alice.id, assignment_id=assignment.id, submission_content='Second try'),
+            AssignmentSubmission(student_id=bob.id, assignment_id=assignment.id, submission_content='Mine',
+                                 submission_file='lost.pdf'),
+        ])
+        db.session.commit()
+        self.teacher_id = teacher.id
+        self.assignment_id = assignment.id
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.folder)
+
+    def test_archive_is_streamed_in_small_chunks(self):
+        """Test the archive content and that no chunk holds a whole file."""
+        chunks = list(stream_submissions_zip(self.assignment_id, get_blob_store(), self.folder))
+        self.assertGreater(len(chunks), 5)
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 2 * BUFFER_SIZE)
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), [
+            'alice/1-submission.txt', 'alice/1-scan.pdf', 'alice/2-submission.txt',
+            'bob_.._x/3-submission.txt', 'bob_.._x/3-MISSING.txt',
+        ])
+        self.assertEqual(archive.read('alice/1-scan.pdf'), self.big)
+        self.assertEqual(archive.read('alice/2-submission.txt'), b'Second try')
+
+    def test_export_route(self):
+        """Test the export endpoint returns a streamed archive."""
+        with self.app.test_request_context(f'/assignments/{self.assignment_id}/submissions.zip'):
+            login_user(User.query.get(self.teacher_id))
+            response = self.app.full_dispatch_request()
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_streamed)
+            self.assertEqual(response.mimetype, 'application/zip')
+            self.assertIn('Math-Homework-submissions.zip', response.headers['Content-Disposition'])
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.response)))
+        self.assertEqual(len(archive.namelist()), 5)
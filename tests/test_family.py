@@ -0,0 +1,82 @@
+import unittest
+from app import create_app, db
+from app.models import User
+from tests.helpers import count_queries
+
+
+class FamilyTreeTestCase(unittest.TestCase):
+    """Tests for the recursive family tree queries."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_chain(self, length):
+        """Create user0 <- user1 <- ... where each user's parent is the previous one."""
+        db.session.execute(User.__table__.insert(), [{
+            'id': i + 1, 'username': f'user{i}', 'username_normalized': f'user{i}',
+            'email': f'user{i}@example.com', 'email_normalized': f'user{i}@example.com',
+            'password_hash': 'x', 'role': 'parent', 'parent_id': i if i else None
+        } for i in range(length)])
+        db.session.commit()
+
+    def test_deep_chain_in_one_query(self):
+        """Test ancestry checks on a deep chain cost one query regardless of depth."""
+        self.make_chain(500)
+        top, bottom = 1, 500
+        with count_queries() as statements:
+            self.assertTrue(User.is_ancestor(top, bottom))
+        self.assertEqual(len(statements), 1)
+        self.assertIn('WITH RECURSIVE', statements[0])
+        self.assertFalse(User.is_ancestor(bottom, top))
+
+        with count_queries() as statements:
+            chain = User.ancestors(bottom)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual([user.id for user in chain], list(range(499, 0, -1)))
+
+        with count_queries() as statements:
+            tree = User.descendants(top)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual([(user.id, depth) for user, depth in tree][:3], [(2, 1), (3, 2), (4, 3)])
+        self.assertEqual(tree[-1], (User.query.get(bottom), 499))
+
+    def test_validate_parent_id_rejects_cycles(self):
+        """Test linking a user under one of its own descendants is refused."""
+        self.make_chain(50)
+        top = User.query.get(1)
+        with self.assertRaises(ValueError):
+            top.validate_parent_id(50)
+        with self.assertRaises(ValueError):
+            top.validate_parent_id(1)
+        self.assertEqual(User.query.get(50).validate_parent_id(1), 1)
+        self.assertIsNone(top.validate_parent_id(None))
+
+    def test_existing_cycle_terminates(self):
+        """Test the queries finish even if the data already contains a cycle."""
+        self.make_chain(4)
+        User.query.get(1).parent_id = 4
+        db.session.commit()
+        self.assertEqual([user.id for user in User.ancestors(1)], [4, 3, 2])
+        self.assertEqual([(user.id, depth) for user, depth in User.descendants(1)], [(2, 1), (3, 2), (4, 3)])
+        self.assertTrue(User.is_ancestor(3, 1))
+        self.assertFalse(User.is_ancestor(5, 1))
+
+    def test_siblings(self):
+        """Test descendants are listed breadth first with their depth."""
+        self.make_chain(2)
+        db.session.add_all([User(username=name, email=f'{name}@example.com', role='student',
+                                 password_hash='x', parent_id=parent) for name, parent in
+                            [('zoe', 1), ('amy', 1), ('kid', 2)]])
+        db.session.commit()
+        tree = [(user.username, depth) for user, depth in User.descendants(1)]
+        self.assertEqual(tree, [('amy', 1), ('user1', 1), ('zoe', 1), ('kid', 2)])
@@ -0,0 +1,142 @@
+import unittest
+from flask import render_template_string
+from flask_login import login_user
+from app import create_app, db
+from app.fragments import fragment_cache, mark_changed
+from app.forms import GradebookEntryForm
+from app.gradebook import save_gradebook
+from app.models import User, Course, Assignment, AssignmentSubmission, Progress
+from config import TestConfig
+from tests.helpers import count_queries, make_user
+
+
+class FragmentCacheTestCase(unittest.TestCase):
+    """Tests for versioned dashboard fragments."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        parent = make_user('parentuser', role='parent', is_parent=True)
+        teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        child = make_user('childuser', role='student', is_student=True, parent_id=parent.id)
+        course = Course(course='Algebra', teacher=teacher)
+        db.session.add(course)
+        db.session.commit()
+        db.session.add(Progress(student_id=child.id, course_id=course.id, teacher_id=teacher.id, grade='B'))
+        db.session.commit()
+        self.parent_id = parent.id
+        self.teacher_id = teacher.id
+        self.child_id = child.id
+        self.course_id = course.id
+        db.session.remove()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get(self, path, user_id):
+        """Dispatch a GET request as the given user and return the page with its query count."""
+        with self.app.test_request_context(path):
+            login_user(User.query.get(user_id))
+            with count_queries() as statements:
+                response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response.get_data(as_text=True), len(statements)
+
+    def test_second_view_skips_dashboard_queries(self):
+        """Test that a cached parent dashboard does not load the children again."""
+        first, first_queries = self.get('/parent_dashboard', self.parent_id)
+        second, second_queries = self.get('/parent_dashboard', self.parent_id)
+        self.assertIn('childuser', first)
+        self.assertEqual(first, second)
+        self.assertEqual(second_queries, first_queries - 2)
+
+    def test_commit_replaces_stale_fragment(self):
+        """Test that committing a student's progress shows on the parent's next view, and only there."""
+        self.get('/parent_dashboard', self.parent_id)
+        versions = [fragment_cache.version(name) for name in
+                    ('Progress', f'user:{self.child_id}', f'parent:{self.parent_id}', f'user:{self.teacher_id}')]
+
+        Progress.query.filter_by(course_id=self.course_id).one().grade = 'A+'
+        db.session.commit()
+        db.session.remove()
+
+        after = [fragment_cache.version(name) for name in
+                 ('Progress', f'user:{self.child_id}', f'parent:{self.parent_id}', f'user:{self.teacher_id}')]
+        self.assertEqual([old == new for old, new in zip(versions, after)], [True, False, False, True])
+        page, _ = self.get('/parent_dashboard', self.parent_id)
+        self.assertIn('A+', page)
+
+    def test_submission_only_replaces_its_students_fragments(self):
+        """Test that a submission leaves other students' cached dashboards alone."""
+        other = make_user('otherchild', role='student', is_student=True)
+        other_id = other.id
+        course = Course.query.get(self.course_id)
+        assignment = Assignment(title='Homework', course=course)
+        db.session.add(assignment)
+        course.students.extend([User.query.get(self.child_id), other])
+        db.session.commit()
+        assignment_id = assignment.id
+        db.session.remove()
+        self.get('/student_dashboard', other_id)
+        _, cached_queries = self.get('/student_dashboard', other_id)
+
+        db.session.add(AssignmentSubmission(student_id=self.child_id, assignment_id=assignment_id,
+                                            submission_content='Answer'))
+        db.session.commit()
+        db.session.remove()
+
+        _, queries = self.get('/student_dashboard', other_id)
+        self.assertEqual(queries, cached_queries)
+        page, _ = self.get('/student_dashboard', self.child_id)
+        self.assertIn('Submitted', page)
+
+    def test_disabled_without_a_shared_backend(self):
+        """Test that the per-process default is not used for fragments."""
+        create_app(type('NoFragmentConfig', (TestConfig,), {'FRAGMENT_CACHE_BACKEND': None}))
+        self.assertIsNone(fragment_cache.backend)
+
+    def test_rollback_keeps_version(self):
+        """Test that changes rolled back do not invalidate fragments."""
+        version = fragment_cache.version(f'user:{self.child_id}')
+        Progress.query.filter_by(course_id=self.course_id).one().grade = 'C'
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        self.assertEqual(fragment_cache.version(f'user:{self.child_id}'), version)
+
+    def test_bulk_gradebook_save_bumps_version(self):
+        """Test that bulk writes outside the flush are marked as changes."""
+        version = fragment_cache.version(f'parent:{self.parent_id}')
+        course = Course.query.get(self.course_id)
+        result = save_gradebook(course, self.teacher_id, [GradebookEntryForm(data={'student_name': 'childuser', 'grade': 'A'})])
+        self.assertEqual(result.updated, 1)
+        self.assertNotEqual(fragment_cache.version(f'parent:{self.parent_id}'), version)
+
+        version = fragment_cache.version('User')
+        mark_changed(db.session, 'User')
+        db.session.commit()
+        self.assertNotEqual(fragment_cache.version('User'), version)
+
+    def test_holes_filled_per_request(self):
+        """Test that per-request values are substituted into a cached fragment."""
+        template = (
+            "{% call cache_fragment('form', depends=['Course'], holes={'token': token}) %}"
+            "<form>{{ fragment_hole('token') }}{{ body }}</form>{% endcall %}"
+        )
+        with self.app.test_request_context('/'):
+            first = render_template_string(template, token='one', body='cached')
+        with self.app.test_request_context('/'):
+            second = render_template_string(template, token='two', body='changed')
+        self.assertEqual(first, '<form>onecached</form>')
+        self.assertEqual(second, '<form>twocached</form>')
+
+
+if __name__ == '__main__':
+    unittest.main()
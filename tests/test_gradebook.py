@@ -0,0 +1,112 @@
+import unittest
+from flask_login import login_user
+from app import create_app, db
+from app.models import User, Course, Progress, student_courses
+from tests.helpers import count_queries
+
+
+class GradebookTestCase(unittest.TestCase):
+    """Tests for the batch gradebook grid."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        teacher = User(username='teacheruser', email='teacher@example.com', role='teacher', is_teacher=True)
+        teacher.set_password('password')
+        db.session.add(teacher)
+        db.session.flush()
+        course = Course(course='Math', teacher_id=teacher.id)
+        db.session.add(course)
+        students = [User(username=f'student{i:02d}', email=f'student{i:02d}@example.com', role='student',
+                         is_student=True, password_hash='x') for i in range(30)]
+        db.session.add_all(students)
+        db.session.flush()
+        db.session.execute(student_courses.insert(), [
+            {'student_id': student.id, 'course_id': course.id} for student in students
+        ])
+        db.session.add(Progress(student_id=students[0].id, course_id=course.id, teacher_id=teacher.id, grade='C'))
+        db.session.commit()
+        self.teacher_id = teacher.id
+        self.course_id = course.id
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def request(self, method='GET', data=None):
+        with self.app.test_request_context(f'/courses/{self.course_id}/gradebook', method=method, data=data):
+            login_user(User.query.get(self.teacher_id))
+            with count_queries() as queries:
+                response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response, queries
+
+    def grid(self, rows):
+        data = {}
+        for index, row in enumerate(rows):
+            for name, value in row.items():
+                data[f'entries-{index}-{name}'] = value
+        return data
+
+    def test_grid_lists_enrolled_students(self):
+        """Test the grid is prefilled with the class and existing grades."""
+        response, queries = self.request()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'value="student29"', response.data)
+        self.assertIn(b'name="entries-0-grade" type="text" value="C"', response.data)
+        self.assertLessEqual(len(queries), 4)
+
+    def test_save_whole_class_in_one_transaction(self):
+        """Test grading thirty students costs a constant number of queries."""
+        rows = [{'student_name': f'student{i:02d}', 'grade': 'A', 'days_present': '20', 'days_absent': '1'}
+                for i in range(30)]
+        rows.append({'student_name': '', 'grade': '', 'days_present': '', 'days_absent': ''})
+        response, queries = self.request('POST', self.grid(rows))
+        self.assertEqual(response.status_code, 302)
+        # Includes the two statements reserving the row versions and the one
+        # finding the students' parents for the fragment cache
+        self.assertLessEqual(len(queries), 9)
+
+        self.assertEqual(Progress.query.count(), 30)
+        self.assertEqual({progress.grade for progress in Progress.query}, {'A'})
+        self.assertEqual({progress.teacher_id for progress in Progress.query}, {self.teacher_id})
+
+    def test_unknown_student_saves_nothing(self):
+        """Test every row error is reported and no partial grid is written."""
+        rows = [{'student_name': 'student01', 'grade': 'B'},
+                {'student_name': 'nobody', 'grade': 'A'},
+                {'student_name': 'student01', 'grade': 'A'},
+                {'student_name': '', 'grade': 'A'}]
+        response, _ = self.request('POST', self.grid(rows))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Student not found.', response.data)
+        self.assertIn(b'Student appears more than once.', response.data)
+        self.assertIn(b'Enter the student username.', response.data)
+        self.assertEqual(Progress.query.count(), 1)
+
+    def test_student_names_ignore_case(self):
+        """Test grid rows match usernames in any case, as login does."""
+        rows = [{'student_name': 'STUDENT01', 'grade': 'B'}, {'student_name': ' Student02 ', 'grade': 'A'}]
+        response, _ = self.request('POST', self.grid(rows))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Progress.query.count(), 3)
+
+        rows = [{'student_name': 'student03', 'grade': 'B'}, {'student_name': 'STUDENT03', 'grade': 'A'}]
+        response, _ = self.request('POST', self.grid(rows))
+        self.assertIn(b'Student appears more than once.', response.data)
+
+    def test_other_teacher_cannot_open_grid(self):
+        """Test the grid is limited to the course teacher."""
+        other = User(username='otherteacher', email='other@example.com', role='teacher', is_teacher=True,
+                     password_hash='x')
+        db.session.add(other)
+        db.session.commit()
+        self.teacher_id = other.id
+        response, _ = self.request()
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,105 @@
+import unittest
+from flask_login import login_user
+from app import create_app, db
+from app.forms import RegistrationForm, UserForm
+from app.models import User
+from app.queries import list_users
+from tests.helpers import count_queries, make_user
+
+
+class IdentityLookupTestCase(unittest.TestCase):
+    """Tests for case-insensitive username and email lookups."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = make_user('StudentUser', role='student', is_student=True)
+        self.user_id = self.user.id
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_normalized_columns_follow_changes(self):
+        """Test the lookup columns are kept in step with username and email."""
+        self.assertEqual(self.user.username_normalized, 'studentuser')
+        self.assertEqual(self.user.email_normalized, 'studentuser@example.com')
+        self.user.email = ' New@Example.COM '
+        db.session.commit()
+        self.assertEqual(self.user.email_normalized, 'new@example.com')
+
+    def test_find_by_identifier_is_one_probe(self):
+        """Test username or email lookup ignores case and issues a single query."""
+        for identifier in ('studentuser', 'STUDENTUSER', 'StudentUser@Example.com'):
+            db.session.expunge_all()
+            with count_queries() as statements:
+                user = User.find_by_identifier(identifier)
+            self.assertEqual(user.id, self.user_id, identifier)
+            self.assertEqual(len(statements), 1)
+        self.assertIsNone(User.find_by_identifier('nobody@example.com'))
+
+    def test_login_ignores_case(self):
+        """Test logging in with a differently cased username."""
+        with self.app.test_request_context('/login', method='POST', data={
+            'username_or_email': 'STUDENTUSER', 'password': 'password'
+        }):
+            response = self.app.full_dispatch_request()
+        self.assertEqual(response.status_code, 302)
+
+    def test_registration_rejects_case_variants(self):
+        """Test the registration validators catch case variants with one query each."""
+        with self.app.test_request_context('/register', method='POST', data={
+            'username': 'studentUSER', 'email': 'STUDENTUSER@example.com', 'password': 'password',
+            'confirm_password': 'password', 'role': 'student'
+        }):
+            form = RegistrationForm()
+            with count_queries() as statements:
+                self.assertFalse(form.validate())
+        self.assertEqual(len(statements), 2)
+        self.assertIn('Username is already taken.', form.username.errors)
+        self.assertIn('Email is already registered.', form.email.errors)
+
+    def test_usernames_cannot_look_like_emails(self):
+        """Test '@' is refused in usernames so login can tell the two apart."""
+        with self.app.test_request_context('/register', method='POST', data={
+            'username': 'a@b', 'email': 'ab@example.com', 'password': 'password',
+            'confirm_password': 'password', 'role': 'student'
+        }):
+            form = RegistrationForm()
+            self.assertFalse(form.validate())
+        self.assertIn('Usernames cannot contain @.', form.username.errors)
+
+    def test_user_form_keeps_own_email_and_refuses_at(self):
+        """Test editing a user may keep its email, but not take another's or put '@' in a username."""
+        make_user('otheruser', role='student', is_student=True)
+        cases = [
+            ({'username': 'StudentUser', 'email': 'studentuser@example.com'}, {}),
+            ({'username': 'studentuser', 'email': 'otheruser@example.com'}, {'email': ['Email is already registered.']}),
+            ({'username': 'student@user', 'email': 'studentuser@example.com'}, {'username': ['Usernames cannot contain @.']}),
+        ]
+        for data, errors in cases:
+            with self.app.test_request_context('/teacher_dashboard', method='POST', data=dict(data, id=self.user_id)):
+                form = UserForm()
+                self.assertEqual(form.validate(), not errors, data)
+            self.assertEqual(form.errors, errors)
+
+    def test_parent_links_child_ignoring_case(self):
+        """Test a parent can link a child by its username in any case."""
+        parent_id = make_user('parentuser', role='parent', is_parent=True).id
+        with self.app.test_request_context('/parent_dashboard', method='POST',
+                                           data={'student_username': 'STUDENTUSER'}):
+            login_user(User.query.get(parent_id))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(User.query.get(self.user_id).parent_id, parent_id)
+
+    def test_user_list_search_ignores_case(self):
+        """Test the teacher user list matches prefixes in any case."""
+        page = list_users(('student',), search='STUD')
+        self.assertEqual([user.username for user in page.users], ['StudentUser'])
@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from flask_login import login_user
+from app import create_app, db
+from app.jobs import TASKS, Worker, claim_jobs, enqueue, task
+from app.models import Job, User
+from config import TestConfig
+
+
+class QueuedConfig(TestConfig):
+    """Jobs go through the queue; a file database lets worker threads share it."""
+    JOBS_EAGER = False
+    JOBS_POLL_INTERVAL = 0.01
+    UPLOAD_CHUNK_SIZE = 1000
+
+
+calls = []
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+class JobQueueTestCase(unittest.TestCase):
+    """Tests for the background job queue."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.folder = tempfile.mkdtemp()
+        QueuedConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(self.folder, 'jobs.db')
+        QueuedConfig.UPLOAD_FOLDER = self.folder
+        self.app = create_app(QueuedConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        calls.clear()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.folder)
+
+    def test_job_runs_after_commit(self):
+        """Test that an enqueued job is stored and run by the worker."""
+        enqueue('tests.record', value=1)
+        db.session.commit()
+        self.assertEqual(calls, [])
+        self.assertEqual(Job.query.one().status, 'queued')
+
+        self.assertEqual(Worker(self.app).run(once=True), 1)
+        db.session.expire_all()
+        job = Job.query.one()
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+        self.assertEqual(calls, [1])
+
+    def test_failure_backs_off_then_fails(self):
+        """Test that a failing job is retried later and failed once its attempts run out."""
+        enqueue('tests.fail')
+        db.session.commit()
+        Worker(self.app).run(once=True)
+        db.session.expire_all()
+        job = Job.query.one()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, datetime.utcnow() + timedelta(seconds=4))
+        self.assertIn('boom', job.last_error)
+
+        job.run_at = datetime.utcnow()
+        db.session.commit()
+        Worker(self.app).run(once=True)
+        db.session.expire_all()
+        job = Job.query.one()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_claims_are_exclusive_and_stale_locks_expire(self):
+        """Test that a job is claimed once and requeued when its worker is lost."""
+        enqueue('tests.record', value=1)
+        db.session.commit()
+        self.assertEqual(len(claim_jobs('first', 10, 600)), 1)
+        self.assertEqual(claim_jobs('second', 10, 600), [])
+
+        Job.query.update({'locked_at': datetime.utcnow() - timedelta(seconds=601)})
+        db.session.commit()
+        self.assertEqual(len(claim_jobs('second', 10, 600)), 1)
+        self.assertEqual(Job.query.one().locked_by, 'second')
+
+    def test_concurrency_limit(self):
+        """Test that no more than concurrency jobs run at once."""
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        @task('tests.slow')
+        def slow():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+        try:
+            for _ in range(6):
+                enqueue('tests.slow')
+            db.session.commit()
+            self.assertEqual(Worker(self.app, concurrency=2).run(once=True), 6)
+        finally:
+            del TASKS['tests.slow']
+        self.assertEqual(max(peak), 2)
+
+    def test_upload_assembled_in_background(self):
+        """Test that completing an upload answers 202 until the worker has run."""
+        student = User(username='studentuser', email='student@example.com', role='student', is_student=True,
+                       password_hash='x')
+        db.session.add(student)
+        db.session.commit()
+        student_id = student.id
+        data = os.urandom(1500)
+
+        def request(path, method='GET', **kwargs):
+            with self.app.test_request_context(path, method=method, **kwargs):
+                login_user(User.query.get(student_id))
+                response = self.app.full_dispatch_request()
+            db.session.remove()
+            return response.status_code, json.loads(response.data)
+
+        _, upload = request('/uploads', 'POST', json={'filename': 'video.mp4', 'size': len(data)})
+        upload_id = upload['upload_id']
+        request(f'/uploads/{upload_id}/chunks/0', 'PUT', data=data[:1000])
+        self.assertEqual(request(f'/uploads/{upload_id}/complete', 'POST')[0], 400)
+        request(f'/uploads/{upload_id}/chunks/1', 'PUT', data=data[1000:])
+
+        status, body = request(f'/uploads/{upload_id}/complete', 'POST')
+        self.assertEqual((status, body['result']), (202, None))
+        self.assertEqual(request(f'/uploads/{upload_id}/complete', 'POST')[0], 202)
+        self.assertEqual(Job.query.count(), 1)
+
+        Worker(self.app).run(once=True)
+        status, body = request(f'/uploads/{upload_id}')
+        self.assertEqual(body['result']['size'], len(data))
+
+
+class EagerJobTestCase(unittest.TestCase):
+    """Tests for JOBS_EAGER."""
+
+    def test_eager_runs_inline(self):
+        """Test that eager jobs run at once without a queue row."""
+        app = create_app('config.TestConfig')
+        with app.app_context():
+            db.create_all()
+            calls.clear()
+            self.assertIsNone(enqueue('tests.record', value=2))
+            self.assertEqual(calls, [2])
+            self.assertEqual(Job.query.count(), 0)
+            with self.assertRaises(LookupError):
+                enqueue('tests.unknown')
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
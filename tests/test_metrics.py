@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from app import create_app, db
+from app.metrics import Metrics, metrics
+from config import TestConfig
+from tests.helpers import make_user
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Tests for recording and rendering metrics."""
+
+    def test_threads_record_without_losing_counts(self):
+        """Test that shards of concurrent and finished threads are all summed."""
+        registry = Metrics()
+        registry.counter('jobs_total', 'Jobs.')
+        registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+
+        def work():
+            for _ in range(1000):
+                registry.inc('jobs_total', kind='a')
+            registry.observe('latency_seconds', 0.05)
+            registry.observe('latency_seconds', 5)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE jobs_total counter', lines)
+        self.assertIn('jobs_total{kind="a"} 4000', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 4', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 4', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 8', lines)
+        self.assertIn('latency_seconds_sum 20.2', lines)
+        self.assertIn('latency_seconds_count 8', lines)
+        # Finished threads were folded into one shard
+        self.assertEqual(registry._shards, [])
+
+
+class MetricsEndpointTestCase(unittest.TestCase):
+    """Tests for /metrics."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.folder = tempfile.mkdtemp()
+        config = type('MetricsConfig', (TestConfig,), {'METRICS_ENABLED': True, 'METRICS_DIR': self.folder})
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        make_user('studentuser', role='student', is_student=True)
+        metrics.reset()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        metrics.reset()
+        metrics.directory = None
+        shutil.rmtree(self.folder)
+
+    def dispatch(self, path, method='GET', **kwargs):
+        with self.app.test_request_context(path, method=method, **kwargs):
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response
+
+    def scrape(self, **kwargs):
+        response = self.dispatch('/metrics', **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True).splitlines()
+
+    def test_requests_and_logins_are_counted(self):
+        """Test that requests per endpoint and login outcomes show up in the scrape."""
+        self.dispatch('/')
+        self.dispatch('/login', 'POST', data={'username_or_email': 'studentuser', 'password': 'password'})
+        self.dispatch('/login', 'POST', data={'username_or_email': 'studentuser', 'password': 'wrong'})
+
+        lines = self.scrape()
+        self.assertIn('http_requests_total{endpoint="main.index",method="GET",status="200"} 1', lines)
+        self.assertIn('http_requests_total{endpoint="auth.login",method="POST",status="302"} 1', lines)
+        self.assertIn('http_request_duration_seconds_count{endpoint="auth.login"} 2', lines)
+        self.assertIn('logins_total{result="success"} 1', lines)
+        self.assertIn('logins_total{result="failure"} 1', lines)
+
+    def test_totals_of_other_processes_are_added(self):
+        """Test that counters from other workers' files are summed and dead workers' gauges dropped."""
+        other = Metrics()
+        other.registry = metrics.registry
+        other.directory = self.folder
+        other.pid = 2 ** 22 + 1  # above the kernel's pid limit, so never alive
+        other.collectors = [lambda: [('db_pool_checked_out', {'bind': 'default'}, 7)]]
+        other.inc('upload_bytes_total', 1500)
+        other.inc('logins_total', result='failure')
+        other.flush()
+
+        metrics.inc('upload_bytes_total', 500)
+        lines = self.scrape()
+        self.assertIn('upload_bytes_total 2000', lines)
+        self.assertIn('logins_total{result="failure"} 1', lines)
+        self.assertFalse([line for line in lines if line.startswith('db_pool_checked_out{')])
+
+    def test_token_required_when_configured(self):
+        """Test that METRICS_TOKEN guards the endpoint."""
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        self.assertEqual(self.dispatch('/metrics').status_code, 401)
+        self.scrape(headers={'Authorization': 'Bearer secret'})
+
+    def test_disabled_by_default(self):
+        """Test that /metrics is not served unless METRICS_ENABLED is set."""
+        app = create_app('config.TestConfig')
+        self.assertFalse(app.config['METRICS_ENABLED'])
+        self.assertNotIn('metrics.export_metrics', app.view_functions)
+
+        metrics.reset()
+        metrics.inc('upload_bytes_total', 500)
+        self.assertEqual(metrics.collect()['counters'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from flask import Flask
+from app import create_app, db
+from app.models import User
+from app.passwords import PasswordHasher, WerkzeugPolicy
+from tests.helpers import make_user
+
+
+class PasswordPolicyTestCase(unittest.TestCase):
+    """Tests for the configurable hashing policy."""
+
+    def test_needs_rehash_when_settings_change(self):
+        """Test hashes are flagged when the method, cost or salt length differ."""
+        policy = WerkzeugPolicy('pbkdf2:sha256:1000')
+        password_hash = policy.hash('secret')
+        self.assertTrue(policy.verify(password_hash, 'secret'))
+        self.assertFalse(policy.verify(password_hash, 'wrong'))
+        self.assertFalse(policy.needs_rehash(password_hash))
+        self.assertTrue(WerkzeugPolicy('pbkdf2:sha256:2000').needs_rehash(password_hash))
+        self.assertTrue(WerkzeugPolicy('pbkdf2:sha512:1000').needs_rehash(password_hash))
+        self.assertTrue(WerkzeugPolicy('pbkdf2:sha256:1000', salt_length=20).needs_rehash(password_hash))
+        # The default iteration count is spelled out so it compares equal to stored hashes
+        self.assertFalse(WerkzeugPolicy('pbkdf2:sha256').needs_rehash(WerkzeugPolicy().hash('secret')))
+
+    def test_hasher_uses_configured_policy_on_pool(self):
+        """Test the hasher follows configuration and runs on its thread pool."""
+        app = Flask(__name__)
+        app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:1500', PASSWORD_HASH_WORKERS=2)
+        hasher = PasswordHasher(app)
+        self.addCleanup(hasher.executor.shutdown)
+        password_hash = hasher.hash('secret')
+        self.assertTrue(password_hash.startswith('pbkdf2:sha256:1500$'))
+        self.assertTrue(hasher.verify(password_hash, 'secret'))
+        self.assertEqual(hasher.executor._max_workers, 2)
+
+
+class PasswordRehashTestCase(unittest.TestCase):
+    """Tests for upgrading hashes at login."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, password):
+        with self.app.test_request_context('/login', method='POST', data={
+            'username_or_email': 'studentuser', 'password': password
+        }):
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response
+
+    def test_login_upgrades_old_hash(self):
+        """Test a hash made with old settings is replaced after a successful login only."""
+        student = make_user('studentuser', role='student', is_student=True)
+        student.password_hash = WerkzeugPolicy('pbkdf2:sha256:500').hash('password')
+        db.session.commit()
+        old_hash = student.password_hash
+
+        self.assertEqual(self.login('wrong').status_code, 200)
+        self.assertEqual(User.query.one().password_hash, old_hash)
+
+        self.assertEqual(self.login('password').status_code, 302)
+        new_hash = User.query.one().password_hash
+        self.assertTrue(new_hash.startswith(self.app.config['PASSWORD_HASH_METHOD'] + '$'))
+        self.assertTrue(User.query.one().check_password('password'))
@@ -0,0 +1,88 @@
+import unittest
+from flask_login import login_user
+from jinja2 import Template
+from app import create_app, db
+from app.models import User, Course
+from app.profiling import profiler
+from config import TestConfig
+from tests.helpers import count_queries, make_user
+
+
+class ProfilingConfig(TestConfig):
+    PROFILING_ENABLED = True
+
+
+class ProfilingTestCase(unittest.TestCase):
+    """Tests for per-request profiling."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app(ProfilingConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        student = make_user('studentuser', role='student', is_student=True)
+        course = Course(course='Algebra', teacher=make_user('teacheruser', role='teacher', is_teacher=True))
+        course.students.append(student)
+        db.session.add(course)
+        db.session.commit()
+        self.student_id = student.id
+        db.session.remove()
+        profiler.reset()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        profiler.reset()
+
+    def get(self, path):
+        """Dispatch a GET request as the student."""
+        with self.app.test_request_context(path):
+            login_user(User.query.get(self.student_id))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response
+
+    def test_server_timing_and_endpoint_stats(self):
+        """Test that SQL and template timings are reported per request and per endpoint."""
+        with self.app.test_request_context('/student_dashboard'):
+            login_user(User.query.get(self.student_id))
+            with count_queries() as statements:
+                response = self.app.full_dispatch_request()
+        db.session.remove()
+        self.assertEqual(response.status_code, 200)
+        timing = response.headers['Server-Timing']
+        self.assertIn(f'desc="{len(statements)} queries"', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        self.get('/api/v1/courses')
+        stats = profiler.snapshot()
+        self.assertEqual(stats['main.student_dashboard']['requests'], 1)
+        self.assertEqual(stats['main.student_dashboard']['query_count'], len(statements))
+        self.assertGreater(stats['main.student_dashboard']['template_time'], 0)
+        self.assertEqual(stats['api.courselist']['template_time'], 0)
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        """Test that a request over the threshold is logged with its statements."""
+        self.app.config['PROFILING_SLOW_REQUEST_MS'] = 0
+        with self.assertLogs('app.profiling', 'WARNING') as logs:
+            self.get('/api/v1/courses')
+        self.assertIn('Slow request GET /api/v1/courses', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_disabled_hooks_nothing(self):
+        """Test that a disabled profiler leaves the app untouched."""
+        app = create_app('config.TestConfig')
+        self.assertIs(app.jinja_env.template_class, Template)
+        self.assertNotIn(profiler._start, app.before_request_funcs.get(None, []))
+        self.assertIn(profiler._start, self.app.before_request_funcs[None])
+        with app.test_request_context('/'):
+            response = app.full_dispatch_request()
+        self.assertNotIn('Server-Timing', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+import json
+import unittest
+from flask_login import login_user
+from app import create_app, db
+from datetime import datetime, timedelta
+from app.models import User, Course, Assignment, AssignmentSubmission, Progress, student_courses
+from app.queries import load_parent_dashboard, load_student_dashboard, list_users
+from tests.helpers import count_queries, make_user
+
+
+class ParentDashboardQueryTestCase(unittest.TestCase):
+    """Tests for the parent dashboard read model."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        parent = make_user('parentuser', role='parent', is_parent=True)
+        teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        courses = [Course(course=f'Course {i}', teacher=teacher) for i in range(3)]
+        db.session.add_all(courses)
+        db.session.commit()
+        self.parent_id = parent.id
+        self.teacher_id = teacher.id
+        self.course_ids = [course.id for course in courses]
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_children(self, count):
+        existing = User.query.filter_by(parent_id=self.parent_id).count()
+        for i in range(existing, existing + count):
+            child = make_user(f'child{i}', role='student', is_student=True, parent_id=self.parent_id)
+            for course_id in self.course_ids:
+                db.session.add(Progress(student_id=child.id, course_id=course_id, teacher_id=self.teacher_id, grade='A'))
+        db.session.commit()
+        db.session.expire_all()
+
+    def get(self, path, user_id):
+        """Dispatch a GET request as the given user."""
+        with self.app.test_request_context(path):
+            login_user(User.query.get(user_id))
+            return self.app.full_dispatch_request()
+
+    def test_loads_children_progress_course_and_teacher(self):
+        """Test that every rendered attribute is loaded up front."""
+        self.add_children(2)
+        with count_queries() as statements:
+            dashboard = load_parent_dashboard(self.parent_id)
+            rows = [(row.student_name, row.course, row.teacher) for row in dashboard.progress_data]
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(len(rows), 6)
+        self.assertIn(('child1', 'Course 2', 'teacheruser'), rows)
+        self.assertEqual(sorted(dashboard.progress), [child.id for child in dashboard.children])
+
+    def test_no_children(self):
+        """Test that a parent without children costs a single query."""
+        with count_queries() as statements:
+            dashboard = load_parent_dashboard(self.parent_id)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(dashboard.progress_data, [])
+
+    def test_query_count_independent_of_child_count(self):
+        """Test that the dashboard page cost does not grow with children."""
+        self.add_children(1)
+        with count_queries() as few:
+            response = self.get('/parent_dashboard', self.parent_id)
+        self.assertEqual(response.status_code, 200)
+
+        self.add_children(5)
+        with count_queries() as many:
+            response = self.get('/parent_dashboard', self.parent_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'child4', response.data)
+        self.assertEqual(len(few), len(many))
+
+
+class StudentDashboardQueryTestCase(unittest.TestCase):
+    """Tests for the student dashboard read model."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        student = make_user('studentuser', role='student', is_student=True)
+        self.teacher_id = teacher.id
+        self.student_id = student.id
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_courses(self, count, enrolled=True):
+        due = datetime.utcnow() + timedelta(days=7)
+        existing = Course.query.count()
+        for i in range(existing, existing + count):
+            course = Course(course=f'Course {i}', teacher_id=self.teacher_id)
+            db.session.add(course)
+            db.session.flush()
+            if enrolled:
+                db.session.execute(student_courses.insert().values(student_id=self.student_id, course_id=course.id))
+            for j in range(2):
+                assignment = Assignment(title=f'Homework {i}.{j}', due_date=due, course_id=course.id)
+                db.session.add(assignment)
+                db.session.flush()
+                if j == 0:
+                    db.session.add(AssignmentSubmission(
+                        submission_content='done', student_id=self.student_id, assignment_id=assignment.id
+                    ))
+            db.session.add(Progress(student_id=self.student_id, course_id=course.id, teacher_id=self.teacher_id, grade='B'))
+        db.session.commit()
+        db.session.expire_all()
+
+    def get(self, path):
+        """Dispatch a GET request as the student."""
+        with self.app.test_request_context(path):
+            login_user(User.query.get(self.student_id))
+            return self.app.full_dispatch_request()
+
+    def test_loads_only_enrolled_courses_and_submission_status(self):
+        """Test that assignments come with the student's submission status."""
+        self.add_courses(2)
+        self.add_courses(1, enrolled=False)
+        with count_queries() as statements:
+            dashboard = load_student_dashboard(self.student_id)
+            courses = [report.course.course for report in dashboard.progress]
+        self.assertEqual(len(statements), 3)
+        self.assertEqual([course.course for course in dashboard.enrolled_courses], ['Course 0', 'Course 1'])
+        self.assertEqual(len(dashboard.assignments), 4)
+        submitted = sorted(a.title for a in dashboard.assignments if a.id in dashboard.submissions)
+        self.assertEqual(submitted, ['Homework 0.0', 'Homework 1.0'])
+        self.assertEqual(courses, ['Course 0', 'Course 1', 'Course 2'])
+
+    def test_query_count_independent_of_course_count(self):
+        """Test that the dashboard page cost does not grow with enrolments."""
+        self.add_courses(1)
+        with count_queries() as few:
+            response = self.get('/student_dashboard')
+        self.assertEqual(response.status_code, 200)
+
+        self.add_courses(6)
+        with count_queries() as many:
+            response = self.get('/student_dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Homework 6.1', response.data)
+        self.assertIn(b'Submitted', response.data)
+        self.assertEqual(len(few), len(many))
+
+
+class UserListQueryTestCase(unittest.TestCase):
+    """Tests for the keyset-paginated user list."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.teacher_id = make_user('teacheruser', role='teacher', is_teacher=True).id
+        db.session.add_all([
+            User(username=f'{role}{i:02d}', email=f'{role}{i:02d}@{domain}', role=role, password_hash='x')
+            for role, domain in (('student', 'school.org'), ('parent', 'home.org')) for i in range(12)
+        ])
+        db.session.add(User(username='pa%ent_', email='odd@home.org', role='parent', password_hash='x'))
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_pages_cover_every_user_once(self):
+        """Test that following cursors visits each parent and student once in order."""
+        seen, cursor = [], None
+        while True:
+            with count_queries() as statements:
+                page = list_users(('parent', 'student'), after=cursor, limit=5)
+            self.assertEqual(len(statements), 1)
+            seen.extend(user.username for user in page.users)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen))
+        self.assertNotIn('teacheruser', seen)
+
+    def test_prefix_search(self):
+        """Test prefix search on username and email, with wildcards taken literally."""
+        page = list_users(('parent', 'student'), search='student1')
+        self.assertEqual([user.username for user in page.users], ['student10', 'student11'])
+        page = list_users(('parent', 'student'), search='odd@')
+        self.assertEqual([user.username for user in page.users], ['pa%ent_'])
+        page = list_users(('parent', 'student'), search='pa%')
+        self.assertEqual([user.username for user in page.users], ['pa%ent_'])
+
+    def test_route(self):
+        """Test the JSON endpoint used by the teacher dashboard."""
+        with self.app.test_request_context('/teacher_dashboard/users?q=parent&limit=10'):
+            login_user(User.query.get(self.teacher_id))
+            response = self.app.full_dispatch_request()
+        data = json.loads(response.data)
+        self.assertEqual(len(data['users']), 10)
+        self.assertEqual(data['next'], 'parent09')
+        self.assertEqual(set(data['users'][0]), {'id', 'username', 'email', 'role'})
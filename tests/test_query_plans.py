@@ -0,0 +1,107 @@
+import unittest
+from datetime import datetime, timedelta
+from flask_login import login_user
+from app import create_app, db
+from app.models import User, Course, Assignment, AssignmentSubmission, Progress, student_courses
+from app.queryplan import capture_statements, find_full_scans
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Check that every query the routes issue is served by an index."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        users = {}
+        for username, role in [('parentuser', 'parent'), ('teacheruser', 'teacher'),
+                               ('studentuser', 'student'), ('otherstudent', 'student')]:
+            user = User(username=username, email=f'{username}@example.com', role=role)
+            setattr(user, f'is_{role}', True)
+            user.set_password('password')
+            users[username] = user
+        db.session.add_all(users.values())
+        db.session.flush()
+        users['studentuser'].parent_id = users['parentuser'].id
+
+        course = Course(course='Math', description='Algebra', teacher_id=users['teacheruser'].id)
+        db.session.add(course)
+        db.session.flush()
+        db.session.execute(student_courses.insert().values(student_id=users['studentuser'].id, course_id=course.id))
+        assignment = Assignment(title='Homework', description='Solve', course_id=course.id,
+                                due_date=datetime.utcnow() + timedelta(days=7))
+        db.session.add(assignment)
+        db.session.flush()
+        db.session.add(AssignmentSubmission(submission_content='done', student_id=users['studentuser'].id,
+                                            assignment_id=assignment.id))
+        db.session.add(Progress(student_id=users['studentuser'].id, course_id=course.id,
+                                teacher_id=users['teacheruser'].id, grade='A'))
+        db.session.commit()
+
+        self.ids = {username: user.id for username, user in users.items()}
+        self.course_id = course.id
+        self.assignment_id = assignment.id
+        self.tables = set(db.metadata.tables)
+        db.session.remove()
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def request(self, path, username=None, method='GET', data=None):
+        """Dispatch a request, optionally as a logged in user, and return its statements."""
+        with capture_statements(db.engine) as captured:
+            with self.app.test_request_context(path, method=method, data=data):
+                if username:
+                    login_user(User.query.get(self.ids[username]))
+                response = self.app.full_dispatch_request()
+            db.session.remove()
+        self.assertLess(response.status_code, 400, path)
+        return captured
+
+    def assertNoFullScans(self, captured, allow=()):
+        scans = find_full_scans(db.engine, captured, self.tables, allow=allow)
+        self.assertEqual(scans, [], '\n'.join(f'{scan.detail}: {scan.statement}' for scan in scans))
+
+    def test_auth_routes(self):
+        """Test login and registration lookups."""
+        self.assertNoFullScans(self.request('/login', method='POST', data={
+            'username_or_email': 'studentuser@example.com', 'password': 'password'
+        }))
+        self.assertNoFullScans(self.request('/register', method='POST', data={
+            'username': 'newuser', 'email': 'newuser@example.com', 'password': 'password',
+            'confirm_password': 'password', 'role': 'student'
+        }))
+
+    def test_parent_dashboard(self):
+        """Test the parent dashboard and child linking."""
+        self.assertNoFullScans(self.request('/parent_dashboard', 'parentuser'))
+        self.assertNoFullScans(self.request('/parent_dashboard', 'parentuser', method='POST', data={
+            'student_username': 'otherstudent'
+        }))
+
+    def test_student_dashboard(self):
+        """Test the student dashboard and assignment submission."""
+        self.assertNoFullScans(self.request('/dashboard', 'studentuser'))
+        self.assertNoFullScans(self.request('/student_dashboard', 'studentuser'))
+        self.assertNoFullScans(self.request(f'/submit_assignment/{self.assignment_id}', 'studentuser',
+                                            method='POST', data={'submission_content': 'again'}))
+
+    def test_teacher_dashboard(self):
+        """Test the teacher dashboard."""
+        self.assertNoFullScans(self.request('/teacher_dashboard', 'teacheruser'))
+        self.assertNoFullScans(self.request('/teacher_dashboard', 'teacheruser', method='POST', data={
+            'create_progress': '1', 'student_name': 'studentuser', 'course_id': str(self.course_id),
+            'grade': 'B', 'days_present': '10', 'days_absent': '1'
+        }))
+
+    def test_teacher_user_list(self):
+        """Test every page and search of the user list is an index range query."""
+        self.assertNoFullScans(self.request('/teacher_dashboard/users', 'teacheruser'))
+        self.assertNoFullScans(self.request('/teacher_dashboard/users?after=otherstudent', 'teacheruser'))
+        self.assertNoFullScans(self.request('/teacher_dashboard/users?q=stud', 'teacheruser'))
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from http.cookies import SimpleCookie
+from flask_login import login_user
+from sqlalchemy import func, select
+from app import create_app, db
+from app.models import User, Course
+from app.replicas import use_primary
+from config import TestConfig
+
+
+class ReplicaTestCase(unittest.TestCase):
+    """Tests for read replica routing, with two SQLite files standing in for the servers."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.folder = tempfile.mkdtemp()
+        config = type('ReplicaConfig', (TestConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(self.folder, 'primary.db'),
+            'SQLALCHEMY_BINDS': {'replica': 'sqlite:///' + os.path.join(self.folder, 'replica.db')},
+            'DATABASE_REPLICAS': ['replica'],
+        })
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.replica = db.get_engine(self.app, 'replica')
+        db.metadata.create_all(self.replica)
+
+        # The same teacher on both servers, and a course the replica has not received yet
+        teacher = {'id': 1, 'username': 'teacheruser', 'username_normalized': 'teacheruser',
+                   'email': 'teacher@example.com', 'email_normalized': 'teacher@example.com',
+                   'password_hash': 'x', 'role': 'teacher', 'is_teacher': True}
+        for engine in (db.engine, self.replica):
+            with engine.begin() as connection:
+                connection.execute(User.__table__.insert(), teacher)
+                connection.execute(Course.__table__.insert(), {'id': 1, 'course': 'Algebra', 'teacher_id': 1})
+        with db.engine.begin() as connection:
+            connection.execute(Course.__table__.insert(), {'id': 2, 'course': 'History', 'teacher_id': 1})
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.folder)
+
+    def dispatch(self, path, method='GET', cookie=None, **kwargs):
+        headers = {'Cookie': cookie} if cookie else {}
+        with self.app.test_request_context(path, method=method, headers=headers, **kwargs):
+            login_user(User.query.get(1))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response
+
+    def course_names(self, response):
+        payload = json.loads(response.get_data(as_text=True))
+        return [row[payload['fields'].index('course')] for row in payload['rows']]
+
+    def test_reads_go_to_the_replica_and_writes_to_the_primary(self):
+        """Test that GETs read the replica, while POSTs and commits use the primary."""
+        self.assertEqual(self.course_names(self.dispatch('/api/v1/courses')), ['Algebra'])
+
+        with self.app.test_request_context('/anything'):
+            self.app.preprocess_request()
+            self.assertEqual(Course.query.count(), 1)
+            with use_primary():
+                self.assertEqual(Course.query.count(), 2)
+            db.session.add(Course(course='Biology', teacher_id=1))
+            db.session.commit()
+            # Reads after the write follow it to the primary
+            self.assertEqual(Course.query.count(), 3)
+        db.session.remove()
+        # Outside a request, e.g. the job worker and the CLI
+        self.assertEqual(Course.query.count(), 3)
+        with self.replica.connect() as connection:
+            self.assertEqual(connection.execute(select(func.count()).select_from(Course.__table__)).scalar(), 1)
+
+    def test_client_sticks_to_the_primary_after_writing(self):
+        """Test that a client reads its own writes once it has committed one."""
+        response = self.dispatch('/register', 'POST', data={
+            'username': 'newuser', 'email': 'new@example.com', 'password': 'password',
+            'confirm_password': 'password', 'role': 'student'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(User.query.filter_by(username='newuser').count(), 1)
+        cookie = SimpleCookie(response.headers['Set-Cookie'])['db_primary_until']
+        self.assertEqual(cookie['max-age'], '10')
+
+        sticky = self.dispatch('/api/v1/courses', cookie=f'db_primary_until={cookie.value}')
+        self.assertEqual(self.course_names(sticky), ['Algebra', 'History'])
+        self.assertNotIn('db_primary_until', sticky.headers.get('Set-Cookie', ''))
+        self.assertEqual(self.course_names(self.dispatch('/api/v1/courses', cookie='db_primary_until=1')), ['Algebra'])
+
+
+if __name__ == '__main__':
+    unittest.main()
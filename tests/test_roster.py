@@ -0,0 +1,107 @@
+import io
+import unittest
+from flask_login import login_user
+from app import create_app, db
+from app.models import User, Course
+from app.roster import RosterError, import_roster, openpyxl
+from tests.helpers import count_queries
+
+
+ROSTER = """username,email,role,password,courses
+amy,amy@example.com,student,secret,{math};{art}
+ben,ben@example.com,student,secret,{math}
+existing,new@example.com,student,secret,
+carl,EXISTING@example.com,student,secret,
+amy,amy2@example.com,student,secret,
+dan,not-an-email,student,secret,
+eve,eve@example.com,student,secret,{other}
+pam,pam@example.com,parent,secret,
+,,,,
+fay,fay@example.com,teacher,secret,
+"""
+
+
+class RosterImportTestCase(unittest.TestCase):
+    """Tests for the bulk roster import."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        teacher = User(username='teacheruser', email='teacher@example.com', role='teacher', is_teacher=True)
+        other = User(username='otherteacher', email='other@example.com', role='teacher', is_teacher=True)
+        existing = User(username='existing', email='existing@example.com', role='student', is_student=True)
+        for user in (teacher, other, existing):
+            user.set_password('password')
+        db.session.add_all([teacher, other, existing])
+        db.session.flush()
+        courses = [Course(course='Math', teacher_id=teacher.id), Course(course='Art', teacher_id=teacher.id),
+                   Course(course='History', teacher_id=other.id)]
+        db.session.add_all(courses)
+        db.session.commit()
+        self.teacher_id = teacher.id
+        self.roster = ROSTER.format(math=courses[0].id, art=courses[1].id, other=courses[2].id).encode()
+        self.course_ids = [course.id for course in courses]
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_import_reports_errors_per_row(self):
+        """Test valid rows are created and every invalid row is reported with its line."""
+        with count_queries() as queries:
+            report = import_roster(io.BytesIO(self.roster), 'roster.csv', self.teacher_id, chunk_size=2, workers=0)
+
+        self.assertEqual(report.created, 3)
+        self.assertEqual(report.enrolled, 3)
+        self.assertEqual([(error.line, error.username) for error in report.errors], [
+            (4, 'existing'), (5, 'carl'), (6, 'amy'), (7, 'dan'), (8, 'eve'), (11, 'fay')
+        ])
+        # Two preloads, then insert, id lookup and enrolment insert per chunk
+        self.assertLessEqual(len(queries), 2 + 2 * 3)
+
+        amy = User.query.filter_by(username='amy').one()
+        self.assertTrue(amy.is_student)
+        self.assertTrue(amy.check_password('secret'))
+        self.assertEqual(sorted(course.id for course in amy.enrolled_courses), self.course_ids[:2])
+        pam = User.query.filter_by(username='pam').one()
+        self.assertTrue(pam.is_parent)
+        self.assertEqual(pam.enrolled_courses, [])
+
+    def test_hashes_in_process_pool(self):
+        """Test passwords hashed by worker processes verify normally."""
+        roster = b'username,email,password\nzed,zed@example.com,secret\nzoe,zoe@example.com,secret\n'
+        report = import_roster(io.BytesIO(roster), 'roster.csv', self.teacher_id, workers=2)
+        self.assertEqual((report.created, report.errors), (2, []))
+        self.assertTrue(User.query.filter_by(username='zoe').one().check_password('secret'))
+
+    def test_rejects_unreadable_files(self):
+        """Test unsupported formats and missing headers raise RosterError."""
+        with self.assertRaises(RosterError):
+            import_roster(io.BytesIO(b'a,b\n1,2\n'), 'roster.csv', self.teacher_id)
+        with self.assertRaises(RosterError):
+            import_roster(io.BytesIO(b''), 'roster.txt', self.teacher_id)
+
+    @unittest.skipIf(openpyxl is not None, 'openpyxl is installed')
+    def test_xlsx_without_openpyxl(self):
+        """Test a clear error when XLSX support is unavailable."""
+        with self.assertRaises(RosterError) as context:
+            import_roster(io.BytesIO(b''), 'roster.xlsx', self.teacher_id)
+        self.assertIn('openpyxl', str(context.exception))
+
+    def test_route(self):
+        """Test the teacher upload form."""
+        with self.app.test_request_context('/teacher_dashboard/roster', method='POST', data={
+            'roster_file': (io.BytesIO(self.roster), 'roster.csv')
+        }):
+            login_user(User.query.get(self.teacher_id))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Username is already taken.', response.data)
+        self.assertEqual(User.query.filter(User.username.in_(['amy', 'ben', 'pam'])).count(), 3)
@@ -0,0 +1,183 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from flask_login import login_user
+from sqlalchemy import event, exc
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import create_app, db
+from app.benchmark import measure_concurrent_writes
+from app.models import User, Course, Assignment, AssignmentSubmission, Progress
+from app.sqlite import commit_write, serial_writer
+from config import TestConfig
+from tests.helpers import make_user
+
+
+class SQLiteProfileTestCase(unittest.TestCase):
+    """Tests for the SQLite pragmas and the serial writer."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.folder = tempfile.mkdtemp()
+        config = type('SQLiteConfig', (TestConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(self.folder, 'school.db'),
+            'DB_SERIAL_WRITER': True,
+            'DB_WRITER_BATCH_WAIT': 0.05,
+        })
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        self.student = make_user('studentuser', role='student', is_student=True)
+
+    def tearDown(self):
+        """Tear down test environment."""
+        serial_writer.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.folder)
+
+    def test_pragmas_applied_to_file_databases_only(self):
+        """Test that connections to the file use WAL and the tuned settings."""
+        pragmas = [db.session.execute(f'PRAGMA {name}').scalar()
+                   for name in ('journal_mode', 'synchronous', 'busy_timeout')]
+        self.assertEqual(pragmas, ['wal', 1, 5000])
+
+        db.session.remove()
+        app = create_app('config.TestConfig')
+        with app.app_context():
+            self.assertEqual(db.session.execute('PRAGMA journal_mode').scalar(), 'memory')
+            db.session.remove()
+
+    def test_writes_are_batched_and_failures_isolated(self):
+        """Test that concurrent writes share commits and a failing one does not sink the rest."""
+        commits = []
+        listener = lambda session: commits.append(threading.current_thread().name)
+        event.listen(Session, 'after_commit', listener)
+        teacher_id = self.teacher.id
+        errors = []
+
+        def write(number):
+            try:
+                if number is None:
+                    commit_write(lambda: db.session.add(Course(course='No teacher')))
+                else:
+                    commit_write(lambda: db.session.add(Course(course=f'Course {number}', teacher_id=teacher_id)))
+            except IntegrityError as e:
+                errors.append(e)
+
+        def run(numbers):
+            threads = [threading.Thread(target=write, args=(number,)) for number in numbers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        try:
+            run(range(8))
+            self.assertEqual(set(commits), {'db-writer'})
+            self.assertLess(len(commits), 8)
+            run([8, None, 9])
+        finally:
+            event.remove(Session, 'after_commit', listener)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(Course.query.count(), 10)
+
+    def test_submission_goes_through_the_writer(self):
+        """Test that submitting an assignment commits on the writer thread."""
+        course = Course(course='Algebra', teacher_id=self.teacher.id)
+        db.session.add(course)
+        db.session.commit()
+        assignment = Assignment(title='Homework', course_id=course.id)
+        db.session.add(assignment)
+        db.session.commit()
+
+        with self.app.test_request_context(f'/submit_assignment/{assignment.id}', method='POST',
+                                           data={'submission_content': 'My answer'}):
+            login_user(User.query.get(self.student.id))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        self.assertEqual(response.status_code, 302)
+        submission = AssignmentSubmission.query.one()
+        self.assertEqual((submission.student_id, submission.submission_content), (self.student.id, 'My answer'))
+
+    def test_course_creation_goes_through_the_writer(self):
+        """Test that creating a course from the teacher dashboard commits on the writer thread."""
+        commits = []
+        listener = lambda session: commits.append(threading.current_thread().name)
+        event.listen(Session, 'after_commit', listener)
+        try:
+            with self.app.test_request_context('/teacher_dashboard', method='POST', data={
+                'course': 'Algebra', 'description': 'Linear equations', 'create_course': 'Submit'
+            }):
+                login_user(User.query.get(self.teacher.id))
+                response = self.app.full_dispatch_request()
+            db.session.remove()
+        finally:
+            event.remove(Session, 'after_commit', listener)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(commits, ['db-writer'])
+        course = Course.query.one()
+        self.assertEqual((course.course, course.description, course.teacher_id),
+                         ('Algebra', 'Linear equations', self.teacher.id))
+
+    def test_progress_goes_through_the_writer(self):
+        """Test that recording progress from the teacher dashboard commits on the writer thread."""
+        course = Course(course='Algebra', teacher_id=self.teacher.id)
+        db.session.add(course)
+        db.session.commit()
+        course_id = course.id
+
+        with self.app.test_request_context('/teacher_dashboard', method='POST', data={
+            'student_name': 'studentuser', 'course_id': course_id, 'grade': 'A', 'days_present': '20',
+            'days_absent': '1', 'create_progress': 'Submit'
+        }):
+            login_user(User.query.get(self.teacher.id))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        self.assertEqual(response.status_code, 302)
+        progress = Progress.query.one()
+        self.assertEqual((progress.student_id, progress.course_id, progress.teacher_id, progress.grade),
+                         (self.student.id, course_id, self.teacher.id, 'A'))
+
+    def test_stuck_writer_times_out(self):
+        """Test that a write not taken within DB_WRITER_TIMEOUT fails and is never run."""
+        serial_writer.timeout = 0.1
+        release = threading.Event()
+        ran = []
+        blocker = serial_writer.submit(release.wait)
+        time.sleep(0.2)
+        try:
+            with self.assertRaises(exc.TimeoutError):
+                commit_write(lambda: ran.append(True))
+        finally:
+            release.set()
+        blocker.result()
+        serial_writer.stop()
+        self.assertEqual(ran, [])
+
+    def test_dead_writer_is_replaced(self):
+        """Test that a write after the writer thread exited starts a new one."""
+        teacher_id = self.teacher.id
+        commit_write(lambda: db.session.add(Course(course='First', teacher_id=teacher_id)))
+        thread = serial_writer._thread
+        serial_writer._queue.put(None)
+        thread.join()
+        commit_write(lambda: db.session.add(Course(course='Second', teacher_id=teacher_id)))
+        self.assertIsNot(serial_writer._thread, thread)
+        self.assertEqual(Course.query.count(), 2)
+
+    def test_write_benchmark(self):
+        """Test that the write benchmark runs every write in the writer mode."""
+        result = measure_concurrent_writes(self.app.config, 'wal+writer', threads=2, writes=20)
+        self.assertEqual((result.writes, result.errors), (20, 0))
+        self.assertGreater(result.throughput, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import User, Course, Assignment, AssignmentSubmission, Blob
+from app.storage import BlobStore, register_blob, recount_references, collect_garbage
+
+
+class BlobStorageTestCase(unittest.TestCase):
+    """Tests for content-addressed submission storage."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.folder = tempfile.mkdtemp()
+        self.store = BlobStore(self.folder)
+
+        teacher = User(username='teacheruser', email='teacher@example.com', role='teacher', password_hash='x')
+        student = User(username='studentuser', email='student@example.com', role='student', password_hash='x')
+        db.session.add_all([teacher, student])
+        db.session.flush()
+        course = Course(course='Math', teacher_id=teacher.id)
+        db.session.add(course)
+        db.session.flush()
+        assignment = Assignment(title='Homework', course_id=course.id)
+        db.session.add(assignment)
+        db.session.commit()
+        self.student_id = student.id
+        self.assignment_id = assignment.id
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.folder)
+
+    def submit(self, content):
+        digest, size = self.store.put_stream(io.BytesIO(content))
+        register_blob(digest, size)
+        submission = AssignmentSubmission(student_id=self.student_id, assignment_id=self.assignment_id,
+                                          submission_file='handout.pdf', file_digest=digest)
+        db.session.add(submission)
+        db.session.commit()
+        return submission
+
+    def age(self, digest, seconds=7200):
+        """Backdate a blob so it falls outside the garbage collector's grace period."""
+        blob = Blob.query.get(digest)
+        if blob is not None:
+            blob.last_referenced_at = datetime.utcnow() - timedelta(seconds=seconds)
+            db.session.commit()
+        past = time.time() - seconds
+        os.utime(self.store.path(digest), (past, past))
+
+    def test_identical_files_are_stored_once(self):
+        """Test deduplication and reference counting."""
+        first = self.submit(b'same handout')
+        second = self.submit(b'same handout')
+        third = self.submit(b'other handout')
+        self.assertEqual(first.file_digest, second.file_digest)
+        self.assertEqual(len(list(self.store.digests())), 2)
+        self.assertEqual(first.file_digest[:2], os.path.basename(os.path.dirname(os.path.dirname(self.store.path(first.file_digest)))))
+        self.assertEqual(Blob.query.get(first.file_digest).ref_count, 2)
+        self.assertEqual(Blob.query.get(third.file_digest).ref_count, 1)
+
+        db.session.delete(second)
+        db.session.commit()
+        self.assertEqual(Blob.query.get(first.file_digest).ref_count, 1)
+
+        third.file_digest = first.file_digest
+        db.session.commit()
+        self.assertEqual(Blob.query.get(first.file_digest).ref_count, 2)
+        self.assertEqual(Blob.query.filter(Blob.digest != first.file_digest).one().ref_count, 0)
+
+    def test_failed_submission_leaves_no_blob(self):
+        """Test that the Blob row is rolled back with the submission that registered it."""
+        self.submit(b'kept handout')
+        digest, size = self.store.put_stream(io.BytesIO(b'lost handout'))
+        register_blob(digest, size)
+        db.session.add(AssignmentSubmission(student_id=self.student_id, assignment_id=self.assignment_id,
+                                            submission_file='handout.pdf', file_digest=digest))
+        db.session.flush()
+        db.session.rollback()
+        self.assertIsNone(Blob.query.get(digest))
+        self.assertEqual(Blob.query.count(), 1)
+
+    def test_garbage_collection(self):
+        """Test that only old, unreferenced blobs and orphan files are removed."""
+        kept = self.submit(b'kept')
+        dropped = self.submit(b'dropped')
+        recent = self.submit(b'recent')
+        digests = kept.file_digest, dropped.file_digest, recent.file_digest
+        orphan, _ = self.store.put_stream(io.BytesIO(b'never committed'))
+        for digest in digests[:2] + (orphan,):
+            self.age(digest)
+
+        AssignmentSubmission.query.filter(AssignmentSubmission.id.in_([dropped.id, recent.id])).delete(
+            synchronize_session=False)
+        db.session.commit()
+        self.assertEqual(recount_references(), 2)
+
+        self.assertEqual(collect_garbage(self.store, grace=3600), (1, 1))
+        self.assertTrue(self.store.exists(digests[0]))
+        self.assertFalse(self.store.exists(digests[1]))
+        self.assertTrue(self.store.exists(digests[2]))
+        self.assertFalse(self.store.exists(orphan))
+        self.assertEqual(sorted(blob.digest for blob in Blob.query), sorted([digests[0], digests[2]]))
@@ -0,0 +1,192 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+from flask_login import login_user
+from app import create_app, db
+from app.jobs import Worker
+from app.models import User, Course, Assignment, AssignmentSubmission
+from app.storage import BlobStore, get_blob_store
+from app.uploads import ChunkedUpload, UploadError
+
+
+class ChunkedUploadTestCase(unittest.TestCase):
+    """Tests for the chunked upload store."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.folder = tempfile.mkdtemp()
+        self.store = BlobStore(os.path.join(self.folder, 'objects'))
+        self.data = os.urandom(2500)
+
+    def tearDown(self):
+        """Tear down test environment."""
+        shutil.rmtree(self.folder)
+
+    def open_upload(self, **kwargs):
+        return ChunkedUpload.create(self.folder, owner_id=1, filename='../scan.pdf', size=len(self.data),
+                                    chunk_size=1000, max_size=10000, **kwargs)
+
+    def send(self, upload, index):
+        return upload.write_chunk(index, io.BytesIO(self.data[index * 1000:(index + 1) * 1000]))
+
+    def test_chunks_out_of_order_assemble_atomically(self):
+        """Test that chunks can arrive in any order and resume after a restart."""
+        upload = self.open_upload(sha256=hashlib.sha256(self.data).hexdigest())
+        self.send(upload, 2)
+        self.send(upload, 0)
+
+        upload = ChunkedUpload.load(self.folder, upload.upload_id, owner_id=1)
+        self.assertEqual(upload.received(), [0, 2])
+        with self.assertRaises(UploadError):
+            upload.complete(self.store)
+
+        self.send(upload, 1)
+        result = upload.complete(self.store)
+        self.assertEqual(result['sha256'], hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(result['filename'], 'scan.pdf')
+        with open(self.store.path(result['sha256']), 'rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertEqual(upload.complete(self.store), result)
+        self.assertEqual(os.listdir(self.store.tmp_root), [])
+
+    def test_rejects_bad_chunks(self):
+        """Test size and checksum validation of individual chunks."""
+        upload = self.open_upload()
+        with self.assertRaises(UploadError):
+            upload.write_chunk(0, io.BytesIO(self.data[:1001]))
+        with self.assertRaises(UploadError):
+            upload.write_chunk(2, io.BytesIO(self.data[2000:2400]))
+        with self.assertRaises(UploadError):
+            upload.write_chunk(0, io.BytesIO(self.data[:1000]), sha256='0' * 64)
+        with self.assertRaises(UploadError):
+            upload.write_chunk(3, io.BytesIO(b''))
+        self.assertEqual(upload.received(), [])
+
+    def test_rejects_whole_file_checksum_mismatch(self):
+        """Test that a corrupted file is never moved into place."""
+        upload = self.open_upload(sha256='0' * 64)
+        for index in range(3):
+            self.send(upload, index)
+        with self.assertRaises(UploadError):
+            upload.complete(self.store)
+        self.assertEqual(list(self.store.digests()), [])
+
+    def test_owner_and_limits(self):
+        """Test ownership checks and upfront validation."""
+        upload = self.open_upload()
+        self.assertIsNone(ChunkedUpload.load(self.folder, upload.upload_id, owner_id=2))
+        self.assertIsNone(ChunkedUpload.load(self.folder, '../etc', owner_id=1))
+        with self.assertRaises(UploadError):
+            ChunkedUpload.create(self.folder, 1, 'big.pdf', 10001, 1000, 10000)
+        with self.assertRaises(UploadError):
+            ChunkedUpload.create(self.folder, 1, 'run.exe', 10, 1000, 10000, allowed_extensions={'pdf'})
+
+
+class UploadRoutesTestCase(unittest.TestCase):
+    """Tests for the chunked upload routes."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.folder
+        self.app.config['UPLOAD_CHUNK_SIZE'] = 1000
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        teacher = User(username='teacheruser', email='teacher@example.com', role='teacher', is_teacher=True)
+        student = User(username='studentuser', email='student@example.com', role='student', is_student=True)
+        for user in (teacher, student):
+            user.set_password('password')
+        db.session.add_all([teacher, student])
+        db.session.flush()
+        course = Course(course='Math', teacher_id=teacher.id)
+        db.session.add(course)
+        db.session.flush()
+        assignment = Assignment(title='Homework', course_id=course.id, due_date=datetime.utcnow() + timedelta(days=1))
+        db.session.add(assignment)
+        db.session.commit()
+        self.student_id = student.id
+        self.assignment_id = assignment.id
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.folder)
+
+    def request(self, path, method='GET', **kwargs):
+        with self.app.test_request_context(path, method=method, **kwargs):
+            login_user(User.query.get(self.student_id))
+            response = self.app.full_dispatch_request()
+        db.session.remove()
+        return response
+
+    def test_upload_then_submit(self):
+        """Test a complete chunked upload attached to a submission."""
+        data = os.urandom(1500)
+        response = self.request('/uploads', 'POST', json={'filename': 'video.mp4', 'size': len(data)})
+        self.assertEqual(response.status_code, 201)
+        upload_id = json.loads(response.data)['upload_id']
+
+        response = self.request(f'/uploads/{upload_id}/chunks/1', 'PUT', data=data[1000:])
+        self.assertEqual(response.status_code, 200)
+        status = json.loads(self.request(f'/uploads/{upload_id}').data)
+        self.assertEqual(status['received'], [1])
+
+        response = self.request(f'/uploads/{upload_id}/chunks/0', 'PUT', data=data[:1000],
+                                headers={'X-Chunk-Sha256': hashlib.sha256(data[:1000]).hexdigest()})
+        self.assertEqual(response.status_code, 200)
+        response = self.request(f'/uploads/{upload_id}/complete', 'POST')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.request(f'/submit_assignment/{self.assignment_id}', 'POST', data={
+            'submission_content': 'See attached video', 'upload_id': upload_id
+        })
+        self.assertEqual(response.status_code, 302)
+        submission = AssignmentSubmission.query.one()
+        self.assertEqual(submission.submission_file, 'video.mp4')
+        self.assertEqual(submission.blob.ref_count, 1)
+        with open(get_blob_store().path(submission.file_digest), 'rb') as stored:
+            self.assertEqual(stored.read(), data)
+        self.assertEqual(self.request(f'/uploads/{upload_id}').status_code, 404)
+
+    def test_failed_assembly_is_reported(self):
+        """Test a store failure ends up in the manifest, eagerly or from the worker, and can be retried."""
+        data = os.urandom(500)
+        upload_id = json.loads(self.request('/uploads', 'POST', json={
+            'filename': 'video.mp4', 'size': len(data)
+        }).data)['upload_id']
+        self.request(f'/uploads/{upload_id}/chunks/0', 'PUT', data=data)
+
+        with mock.patch.object(BlobStore, 'put_file', side_effect=OSError('disk full')):
+            response = self.request(f'/uploads/{upload_id}/complete', 'POST')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('could not be assembled', json.loads(response.data)['error'])
+
+            self.app.config['JOBS_EAGER'] = False
+            self.assertEqual(self.request(f'/uploads/{upload_id}/complete', 'POST').status_code, 202)
+            Worker(self.app).run(once=True)
+            status = json.loads(self.request(f'/uploads/{upload_id}').data)
+            self.assertIsNone(status['result'])
+            self.assertIn('could not be assembled', status['error'])
+
+        self.app.config['JOBS_EAGER'] = True
+        response = self.request(f'/uploads/{upload_id}/complete', 'POST')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['result']['size'], len(data))
+
+    def test_rejects_unknown_upload(self):
+        """Test errors are reported as JSON."""
+        response = self.request('/uploads', 'POST', json={'filename': 'video.mp4', 'size': -1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', json.loads(response.data))
+        self.assertEqual(self.request('/uploads/abc/chunks/0', 'PUT', data=b'x').status_code, 404)
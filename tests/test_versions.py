@@ -0,0 +1,122 @@
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.forms import GradebookEntryForm
+from app.gradebook import save_gradebook
+from app.models import Course, Assignment, Progress, change_counter
+from app.queries import changes_since
+from tests.helpers import count_queries, make_user
+
+
+class RowVersionTestCase(unittest.TestCase):
+    """Tests for updated_at and version stamping."""
+
+    def setUp(self):
+        """Set up test environment."""
+        self.app = create_app('config.TestConfig')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.teacher = make_user('teacheruser', role='teacher', is_teacher=True)
+        self.student = make_user('studentuser', role='student', is_student=True)
+
+    def tearDown(self):
+        """Tear down test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_insert_and_update_stamp_versions(self):
+        """Test that every write moves the row past all versions handed out before."""
+        courses = [Course(course=f'Course {i}', teacher=self.teacher) for i in range(3)]
+        db.session.add_all(courses)
+        db.session.commit()
+        self.assertEqual(sorted(course.version for course in courses), [1, 2, 3])
+        self.assertIsNotNone(courses[0].updated_at)
+
+        courses[0].description = 'Updated'
+        db.session.commit()
+        self.assertEqual(courses[0].version, 4)
+
+        # Each table counts on its own
+        assignment = Assignment(title='Homework', course=courses[1])
+        db.session.add(assignment)
+        db.session.commit()
+        self.assertEqual(assignment.version, 1)
+
+    def test_unchanged_rows_keep_their_version(self):
+        """Test that collection changes and no-op flushes do not bump versions."""
+        course = Course(course='Algebra', teacher=self.teacher)
+        db.session.add(course)
+        db.session.commit()
+        version = course.version
+
+        course.students.append(self.student)
+        db.session.commit()
+        self.assertEqual(course.version, version)
+
+    def test_changes_since_pages_by_version(self):
+        """Test that changes_since returns changed rows oldest first with a cursor."""
+        courses = [Course(course=f'Course {i}', teacher=self.teacher) for i in range(5)]
+        db.session.add_all(courses)
+        db.session.commit()
+
+        page = changes_since(Course, 0, limit=3)
+        self.assertEqual(len(page.rows), 3)
+        self.assertTrue(page.more)
+        rest = changes_since(Course, page.cursor, limit=3)
+        self.assertEqual(len(rest.rows), 2)
+        self.assertFalse(rest.more)
+
+        courses[0].course = 'Renamed'
+        db.session.commit()
+        latest = changes_since(Course, rest.cursor)
+        self.assertEqual([course.course for course in latest.rows], ['Renamed'])
+        self.assertEqual(changes_since(Course, latest.cursor).rows, [])
+
+    def test_cursor_waits_for_rows_to_settle(self):
+        """Test that recent rows are returned without moving the cursor past them."""
+        old = Course(course='Old', teacher=self.teacher, updated_at=datetime.utcnow() - timedelta(minutes=5))
+        db.session.add(old)
+        db.session.commit()
+        db.session.add(Course(course='Recent', teacher=self.teacher))
+        db.session.commit()
+
+        self.app.config['VERSION_SETTLE_SECONDS'] = 60
+        page = changes_since(Course, 0)
+        self.assertEqual([course.course for course in page.rows], ['Old', 'Recent'])
+        self.assertEqual(page.cursor, old.version)
+        self.assertEqual([course.course for course in changes_since(Course, page.cursor).rows], ['Recent'])
+
+    def test_gradebook_bulk_writes_are_versioned(self):
+        """Test that bulk mappings take versions from the counter too."""
+        course = Course(course='Algebra', teacher=self.teacher)
+        course.students.append(self.student)
+        db.session.add(course)
+        db.session.commit()
+
+        save_gradebook(course, self.teacher.id, [GradebookEntryForm(data={'student_name': 'studentuser', 'grade': 'B'})])
+        progress = Progress.query.one()
+        self.assertEqual(progress.version, 1)
+        first_update = progress.updated_at
+
+        save_gradebook(course, self.teacher.id, [GradebookEntryForm(data={'student_name': 'studentuser', 'grade': 'A'})])
+        db.session.expire_all()
+        progress = Progress.query.one()
+        self.assertEqual(progress.version, 2)
+        self.assertGreaterEqual(progress.updated_at, first_update)
+        counter = db.session.query(change_counter.c.value).filter_by(name='progress').scalar()
+        self.assertEqual(counter, 2)
+
+    def test_one_counter_update_per_table_and_flush(self):
+        """Test that a flush of many rows reserves their versions together."""
+        db.session.add_all([Course(course=f'Course {i}', teacher=self.teacher) for i in range(10)])
+        with count_queries() as statements:
+            db.session.commit()
+        counter_statements = [statement for statement in statements if 'change_counter' in statement]
+        self.assertLessEqual(len(counter_statements), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()